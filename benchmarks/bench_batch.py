@@ -0,0 +1,39 @@
+"""
+Batch validation: `validate()` in a loop vs `validate_many()`, and peak memory of `validate_many()` over long inputs.
+"""
+import tracemalloc
+
+from hl7validator.validator import Validator
+
+from .common import make_message, make_rules, measure, report
+
+
+def _peak_memory(validator: Validator, msg: bytes, count: int) -> int:
+    tracemalloc.start()
+    for _ in validator.validate_many(msg for _ in range(count)):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    validator = Validator(rules=make_rules(50), parser="lalr")
+    validator.compile()
+    msg = make_message(10)
+    batch = [msg] * 200
+    report(
+        "200 messages: validate() loop",
+        measure(lambda: [validator.validate(m) for m in batch], number=1),
+    )
+    report(
+        "200 messages: validate_many()",
+        measure(lambda: list(validator.validate_many(batch)), number=1),
+    )
+    for count in (100, 1000, 10000):
+        peak = _peak_memory(validator, msg, count)
+        print(f"{count} messages: validate_many() peak memory {peak / 1024:10.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
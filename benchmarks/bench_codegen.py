@@ -0,0 +1,43 @@
+"""
+Field rules engines: rule objects (`CompiledRules`) vs generated code (`GeneratedRules`), over generated ORU messages
+and rules, with full and errors-only log. Code generation time is reported separately.
+"""
+import time
+
+import hl7
+
+from hl7validator.codegen import GeneratedRules
+from hl7validator.context import LOG_ERRORS, LOG_LEVELS, Context
+from hl7validator.generator import ORU, generate_messages, generate_rules
+from hl7validator.profile import compile_profile
+
+from .common import measure, report
+
+
+def _generate(profile) -> float:
+    start = time.perf_counter()
+    GeneratedRules(profile.rules).source
+    return time.perf_counter() - start
+
+
+def main():
+    msg = hl7.parse(next(generate_messages(1, ORU, groups=4, obx=4, nte=1, seed=0)))
+    for rule_count in (10, 100, 1000):
+        profile = compile_profile(generate_rules(ORU, rule_count, seed=0), parser="lalr")
+        name = f"{rule_count} rules"
+        report(f"{name}: code generation", _generate(profile))
+        generated = profile.generated_rules
+        for log_level in LOG_LEVELS:
+            suffix = ", errors only" if log_level == LOG_ERRORS else ""
+            interpreted = measure(
+                lambda: profile.compiled_rules.validate(Context(msg, log_level=log_level))
+            )
+            report(f"{name}{suffix}: interpreted", interpreted)
+            codegen = measure(
+                lambda: generated.validate(Context(msg, log_level=log_level))
+            )
+            report(f"{name}{suffix}: codegen {interpreted / codegen:.1f}x", codegen)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Columnar batch validation: `validate_many()` vs `validate_columnar()` over generated messages (100k by default, see
+`--count`), with errors-only log, end to end and field rules only (messages parsed and structure validated
+upfront). Requires NumPy.
+"""
+import argparse
+import time
+import typing
+
+import hl7
+
+from hl7validator.columnar import (
+    DEFAULT_BATCH_SIZE,
+    ColumnarRules,
+    validate_columnar,
+)
+from hl7validator.context import Context
+from hl7validator.generator import ORU, generate_messages, generate_rules
+from hl7validator.profile import CompiledProfile
+from hl7validator.validator import MESSAGE_ERRORS, Validator
+
+from .common import report
+
+
+def _timed(func: typing.Callable) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def _contexts(profile: CompiledProfile, messages: typing.List[hl7.Message]):
+    out = []
+    for msg in messages:
+        ctx = Context(message=msg, log_level="errors")
+        profile.compiled_structure.validate(ctx)
+        out.append(ctx)
+    return out
+
+
+def _scalar_fields(profile: CompiledProfile, contexts: typing.List[Context]):
+    for ctx in contexts:
+        try:
+            profile.compiled_rules.validate(ctx)
+        except MESSAGE_ERRORS:
+            pass
+
+
+def _field_times(
+    profile: CompiledProfile, messages: typing.List[str], batch_size: int
+) -> typing.Tuple[float, float]:
+    """
+    Returns times of field rules validation of all messages, with `CompiledRules` and `ColumnarRules`
+    """
+    columnar = ColumnarRules(profile.compiled_rules.rules)
+    scalar_time = columnar_time = 0.0
+    for start in range(0, len(messages), batch_size):
+        batch = [hl7.parse(msg) for msg in messages[start : start + batch_size]]
+        contexts = _contexts(profile, batch)
+        scalar_time += _timed(lambda: _scalar_fields(profile, contexts))
+        contexts = _contexts(profile, batch)
+        segments = [profile.compiled_rules.locate_segments(ctx) for ctx in contexts]
+        columnar_time += _timed(lambda: columnar.validate(contexts, segments))
+    return scalar_time, columnar_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=100000, help="number of messages")
+    parser.add_argument("--rules", type=int, default=100, help="number of field rules")
+    parser.add_argument(
+        "--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="batch size"
+    )
+    args = parser.parse_args()
+
+    messages = list(
+        generate_messages(args.count, ORU, groups=1, obx=3, nte=1, error_rate=0.1)
+    )
+    validator = Validator(
+        rules=generate_rules(ORU, args.rules), parser="lalr", log_level="errors"
+    )
+    profile = validator.compile()
+    name = f"{args.count} messages, {args.rules} rules"
+
+    scalar, columnar = _field_times(profile, messages, args.batch_size)
+    report(f"{name}: field rules, CompiledRules", scalar)
+    report(f"{name}: field rules, ColumnarRules {scalar / columnar:.1f}x", columnar)
+
+    scalar = _timed(lambda: all(True for _ in validator.validate_many(messages)))
+    report(f"{name}: validate_many()", scalar)
+    columnar = _timed(
+        lambda: all(
+            True for _ in validate_columnar(validator, messages, args.batch_size)
+        )
+    )
+    report(f"{name}: validate_columnar() {scalar / columnar:.1f}x", columnar)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Fail-fast validation on an invalid-heavy corpus: all checks vs stopping at the first error.
+"""
+from hl7validator.profile import compile_profile
+from hl7validator.validator import Validator
+
+from .common import make_message, make_rules, measure, report
+
+
+def make_corpus(count: int, invalid_ratio: float = 0.9):
+    """
+    Builds `count` messages, `invalid_ratio` of them with errors in the header and in the structure
+    """
+    valid = make_message(10)
+    # wrong sending application (first field rule) and repeated PV1 segment (structure)
+    invalid = valid.replace(b"SrcSystem", b"Other").replace(
+        b"PV1|1|I\r", b"PV1|1|I\rPV1|2|I\r"
+    )
+    invalid_count = int(count * invalid_ratio)
+    return [invalid] * invalid_count + [valid] * (count - invalid_count)
+
+
+def main():
+    corpus = make_corpus(200)
+    for rule_count in (10, 100):
+        profile = compile_profile(make_rules(rule_count), parser="lalr")
+        for fail_fast in (False, True):
+            validator = Validator(
+                rules=None, profile=profile, log_level="errors", fail_fast=fail_fast
+            )
+            report(
+                f"200 messages, 90% invalid, {rule_count} rules: fail_fast={fail_fast}",
+                measure(lambda: list(validator.validate_many(corpus)), number=1),
+            )
+
+
+if __name__ == "__main__":
+    main()
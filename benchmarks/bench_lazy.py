@@ -0,0 +1,29 @@
+"""
+Validation of large (1-5 MB) ORU messages: full `hl7.parse()` vs lazy parsing of referenced segments only.
+"""
+from hl7validator.validator import Validator
+
+from .common import make_message, make_rules, measure, report
+
+
+def main():
+    rules = make_rules(50)
+    lazy = Validator(rules=rules, parser="lalr")
+    full = Validator(rules=rules, parser="lalr", lazy=False)
+    lazy.compile()
+    full.compile()
+    for obx_count in (10000, 40000):
+        msg = make_message(obx_count)
+        size = len(msg) / 1e6
+        report(
+            f"{size:.1f} MB message: hl7.parse",
+            measure(lambda: full.validate(msg), number=1, repeat=3),
+        )
+        report(
+            f"{size:.1f} MB message: lazy parsing",
+            measure(lambda: lazy.validate(msg), number=1, repeat=3),
+        )
+
+
+if __name__ == "__main__":
+    main()
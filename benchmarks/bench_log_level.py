@@ -0,0 +1,39 @@
+"""
+Validation log cost: all checks logged vs errors only (`log_level="errors"`), and memory kept with validation result.
+"""
+import tracemalloc
+
+from hl7validator.profile import compile_profile
+from hl7validator.validator import Validator
+
+from .common import make_message, make_rules, measure, report
+
+
+def _allocated(validator: Validator, msg: bytes) -> int:
+    tracemalloc.start()
+    ctx = validator.validate(msg)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del ctx
+    return size
+
+
+def main():
+    msg = make_message(10)
+    for rule_count in (10, 100):
+        profile = compile_profile(make_rules(rule_count), parser="lalr")
+        for log_level in ("all", "errors"):
+            validator = Validator(rules=None, profile=profile, log_level=log_level)
+            report(
+                f"{rule_count} rules: log_level={log_level}",
+                measure(lambda: validator.validate(msg), number=50),
+            )
+            size = _allocated(validator, msg)
+            print(
+                f"{rule_count} rules: log_level={log_level}"
+                f" result size {size / 1024:10.1f} KiB"
+            )
+
+
+if __name__ == "__main__":
+    main()
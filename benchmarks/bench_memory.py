@@ -0,0 +1,61 @@
+"""
+Memory of a loaded compiled profile and validation time, for large profiles; `one of` checks with long lists.
+"""
+import pickle
+import tracemalloc
+
+from hl7validator.profile import compile_profile
+from hl7validator.validator import Validator
+from hl7validator.values import OneOfValues
+
+from .common import make_message, make_rules, measure, report
+
+ONE_OF = '"PID.{}.1" may be one of {}'
+
+
+def make_large_rules(rule_count: int) -> str:
+    """
+    Builds rules text with `rule_count` field rules, one in four with a long list of allowed values
+    """
+    rules = make_rules(rule_count)
+    values = ", ".join(f'"V{idx}"' for idx in range(50))
+    extra = [ONE_OF.format(idx % 20 + 1, values) for idx in range(rule_count // 4)]
+    return rules + "\n".join(extra) + "\n"
+
+
+def _loaded_size(data: bytes) -> int:
+    # memory kept by a profile loaded from the cache
+    tracemalloc.start()
+    profile = pickle.loads(data)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del profile
+    return size
+
+
+def main():
+    one_of = OneOfValues(*[f'"V{idx}"' for idx in range(50)])
+    report(
+        "one of 50 values, last value: check() (x10000)",
+        measure(lambda: one_of.check("V49"), number=10000) * 10000,
+    )
+    msg = make_message(10)
+    for rule_count in (100, 1000):
+        profile = compile_profile(make_large_rules(rule_count), parser="lalr")
+        size = _loaded_size(pickle.dumps(profile))
+        objects = len(profile.rules) + sum(
+            len(s.all_rules()) for s in profile.structure
+        )
+        print(
+            f"{rule_count} rules: loaded profile {size / 1024:10.1f} KiB,"
+            f" {size / objects:8.1f} B per rule"
+        )
+        validator = Validator(rules=None, profile=profile, log_level="errors")
+        report(
+            f"{rule_count} rules: validate()",
+            measure(lambda: validator.validate(msg), number=10),
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""
+Metrics cost: validation without metrics, with `MetricsCollector`, and rendering of collected metrics.
+"""
+from hl7validator.metrics import MetricsCollector
+from hl7validator.profile import compile_profile
+from hl7validator.validator import Validator
+
+from .common import make_message, make_rules, measure, report
+
+
+def main():
+    msg = make_message(10)
+    for rule_count in (10, 100):
+        profile = compile_profile(make_rules(rule_count), parser="lalr")
+        for metrics in (None, MetricsCollector()):
+            validator = Validator(
+                rules=None, profile=profile, log_level="errors", metrics=metrics
+            )
+            report(
+                f"{rule_count} rules: metrics={'on' if metrics else 'off'}",
+                measure(lambda: validator.validate(msg), number=50),
+            )
+        report(
+            f"{rule_count} rules: render_prometheus",
+            measure(metrics.render_prometheus),
+        )
+        report(f"{rule_count} rules: to_json", measure(metrics.to_json))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Batch validation scaling with the number of worker processes.
+"""
+import os
+import time
+
+from hl7validator.parallel import validate_parallel
+from hl7validator.validator import Validator
+
+from .common import make_message, make_rules, report
+
+MESSAGE_COUNT = 2000
+
+
+def main():
+    validator = Validator(rules=make_rules(50), parser="lalr")
+    validator.compile()
+    msg = make_message(50)
+    print(f"{os.cpu_count()} CPUs available")
+
+    start = time.perf_counter()
+    for _ in validator.validate_many(msg for _ in range(MESSAGE_COUNT)):
+        pass
+    report(f"{MESSAGE_COUNT} messages: validate_many()", time.perf_counter() - start)
+    for jobs in (1, 2, 4, 8):
+        start = time.perf_counter()
+        results = validate_parallel(
+            validator, (msg for _ in range(MESSAGE_COUNT)), jobs=jobs
+        )
+        for _ in results:
+            pass
+        report(
+            f"{MESSAGE_COUNT} messages: {jobs} worker(s)", time.perf_counter() - start
+        )
+
+
+if __name__ == "__main__":
+    main()
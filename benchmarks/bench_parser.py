@@ -0,0 +1,26 @@
+"""
+Rules compilation time with Earley and LALR parsers.
+"""
+from hl7validator.parser import PARSERS
+from hl7validator.transformer import make_transformer
+
+from .common import make_rules, measure, report
+
+
+def main():
+    for rule_count in (10, 100, 1000, 5000):
+        rules = make_rules(rule_count)
+        for parser in PARSERS:
+            number = 1 if rule_count >= 1000 else 5
+            report(
+                f"{rule_count} rules: compile with {parser}",
+                measure(
+                    lambda: make_transformer(rules, parser=parser),
+                    number=number,
+                    repeat=3,
+                ),
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Value checks: exception-based protocol (`.check_value()`, `.validate()` raising `NotValid`) vs result values
+(`.check()` returning `INVALID`).
+"""
+import hl7
+
+from hl7validator.context import Context
+from hl7validator.exceptions import NotValid
+from hl7validator.predicates import CannotBe, MayBe, MustBe
+from hl7validator.profile import compile_profile
+from hl7validator.selectors import FieldSelector
+from hl7validator.validator import Validator
+from hl7validator.values import ConstValue, IntValue
+
+from .common import make_message, measure, report
+
+NUMBER = 10000
+
+CHECKS = [
+    ("must be int, passing", MustBe(IntValue()), "12"),
+    ("must be int, failing", MustBe(IntValue()), "abc"),
+    ('must be "A", failing', MustBe(ConstValue('"A"')), "B"),
+    ('may be "A", failing', MayBe(ConstValue('"A"')), "B"),
+    ('cannot be "A", matching', CannotBe(ConstValue('"A"')), "A"),
+]
+
+
+def _report(name: str, func):
+    # single checks are too fast to report one by one
+    report(f"{name} (x{NUMBER})", measure(func, number=NUMBER) * NUMBER)
+
+
+def _raising(predicate, value):
+    def _run():
+        try:
+            return predicate.check_value(value)
+        except AssertionError:
+            return None
+
+    return _run
+
+
+def _validate_raising(predicate, sel, ctx):
+    def _run():
+        try:
+            return predicate.validate(sel, context=ctx)
+        except NotValid:
+            return None
+
+    return _run
+
+
+def _validate_result(predicate, sel, ctx):
+    def _run():
+        return predicate.check(predicate.select(sel, None, ctx))
+
+    return _run
+
+
+def main():
+    for name, predicate, value in CHECKS:
+        _report(f"{name}: check_value()", _raising(predicate, value))
+        _report(f"{name}: check()", lambda: predicate.check(value))
+
+    ctx = Context(message=hl7.parse(make_message(10)))
+    sel = FieldSelector("PID.5.1")
+    predicate = MustBe(ConstValue('"Other"'))
+    _report("failing field: validate()", _validate_raising(predicate, sel, ctx))
+    _report("failing field: select(), check()", _validate_result(predicate, sel, ctx))
+
+    # invalid message: most of the rules fail
+    rules = "".join(f'"PID.{idx % 5 + 1}.1" must be "x"\n' for idx in range(100))
+    validator = Validator(
+        rules=None, profile=compile_profile(rules, parser="lalr"), log_level="errors"
+    )
+    msg = make_message(10)
+    report(
+        "100 failing field rules: validate()",
+        measure(lambda: validator.validate(msg), number=50),
+    )
+
+
+if __name__ == "__main__":
+    main()
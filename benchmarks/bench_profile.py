@@ -0,0 +1,37 @@
+"""
+Per-message validation cost: compiling rules for every message vs reusing a compiled profile.
+"""
+import hl7
+
+from hl7validator.context import Context
+from hl7validator.profile import CompiledProfile
+from hl7validator.transformer import make_transformer
+from hl7validator.validator import Validator
+
+from .common import make_message, make_rules, measure, report
+
+
+def validate_recompiling(rules: str, msg: bytes):
+    # previous behaviour: rules were compiled in each .validate() call
+    profile = CompiledProfile.from_transformer(make_transformer(rules))
+    return profile.validate(Context(message=hl7.parse(msg)))
+
+
+def main():
+    msg = make_message(10)
+    for rule_count in (10, 50, 200):
+        rules = make_rules(rule_count)
+        validator = Validator(rules=rules)
+        validator.compile()
+        report(
+            f"{rule_count} rules: compile per message",
+            measure(lambda: validate_recompiling(rules, msg), number=3),
+        )
+        report(
+            f"{rule_count} rules: compiled profile",
+            measure(lambda: validator.validate(msg), number=20),
+        )
+
+
+if __name__ == "__main__":
+    main()
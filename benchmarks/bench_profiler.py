@@ -0,0 +1,26 @@
+"""
+Per-rule profiler cost: validation without a profiler, and with every rule and structure node timed.
+"""
+from hl7validator.profile import compile_profile
+from hl7validator.profiler import Profiler
+from hl7validator.validator import Validator
+
+from .common import make_message, make_rules, measure, report
+
+
+def main():
+    msg = make_message(10)
+    for rule_count in (10, 100):
+        profile = compile_profile(make_rules(rule_count), parser="lalr")
+        for profiler in (None, Profiler()):
+            validator = Validator(
+                rules=None, profile=profile, log_level="errors", profiler=profiler
+            )
+            report(
+                f"{rule_count} rules: profiler={'on' if profiler else 'off'}",
+                measure(lambda: validator.validate(msg), number=50),
+            )
+
+
+if __name__ == "__main__":
+    main()
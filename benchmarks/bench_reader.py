@@ -0,0 +1,46 @@
+"""
+Reading messages from large batch files: whole file with `hl7.parse_file()` vs streaming `read_messages()`.
+"""
+import io
+import tracemalloc
+
+import hl7
+
+from hl7validator.reader import read_messages
+
+from .common import make_message, measure, report
+
+
+def make_batch(message_count: int) -> bytes:
+    msg = make_message(5)
+    header = b"FHS|^~\\&\rBHS|^~\\&\r"
+    return header + msg * message_count + b"BTS|%d\rFTS|1\r" % message_count
+
+
+def _peak_memory(func) -> int:
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    for count in (1000, 10000):
+        data = make_batch(count)
+        report(
+            f"{count} messages: hl7.parse_file",
+            measure(lambda: hl7.parse_file(data), number=1, repeat=3),
+        )
+        report(
+            f"{count} messages: read_messages",
+            measure(
+                lambda: list(read_messages(io.BytesIO(data))), number=1, repeat=3
+            ),
+        )
+        peak = _peak_memory(lambda: sum(1 for _ in read_messages(io.BytesIO(data))))
+        print(f"{count} messages: read_messages peak memory {peak / 1024:10.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Field rules validation cost: each rule locating its segment vs rules grouped by segment.
+"""
+import hl7
+
+from hl7validator.context import Context
+from hl7validator.profile import compile_profile
+
+from .common import make_message, measure, report
+
+CHECKS = [
+    '"PID.{}.1" may be "x"',
+    '"PID.{}.1" cannot be "x" if "PID.1.1" is not empty',
+    '"OBR.{}.1" may be int',
+]
+
+
+def make_field_rules(rule_count: int) -> str:
+    lines = [""]
+    for idx in range(rule_count):
+        lines.append(CHECKS[idx % len(CHECKS)].format(idx % 20 + 1))
+    return "\n".join(lines) + "\n"
+
+
+def _validate_each(profile, msg):
+    # each rule finds its segment in the message
+    ctx = Context(message=msg)
+    for rule in profile.rules:
+        rule.set_context(ctx).validate()
+    return ctx
+
+
+def main():
+    msg = hl7.parse(make_message(100))
+    for rule_count in (30, 100, 300):
+        profile = compile_profile(make_field_rules(rule_count), parser="lalr")
+        report(
+            f"{rule_count} field rules: rule by rule",
+            measure(lambda: _validate_each(profile, msg), number=20),
+        )
+        report(
+            f"{rule_count} field rules: grouped by segment",
+            measure(
+                lambda: profile.compiled_rules.validate(Context(message=msg)),
+                number=20,
+            ),
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Single field lookup cost: hl7 accessor string vs pre-parsed selector path.
+"""
+import hl7
+
+from hl7validator.index import SegmentIndex
+from hl7validator.selectors import FieldSelector
+
+from .common import make_message, measure, report
+
+SELECTORS = ["MSH.9.1.1", "PID.5.1.2", "OBX.5.1", "NTE.3.1.1"]
+
+
+def get_with_accessor(index: SegmentIndex, sel: str):
+    # previous lookup: selector string parsed by hl7 on every call
+    accessor = hl7.Accessor.parse_key(sel)
+    segment = index.get_segment(accessor.segment, accessor.segment_num)
+    return segment.extract_field(*accessor[1:])
+
+
+def main():
+    msg = hl7.parse(make_message(100))
+    index = SegmentIndex(msg)
+    for sel in SELECTORS:
+        selector = FieldSelector(sel)
+        report(f"{sel}: msg[sel]", measure(lambda: msg[sel], number=10000))
+        report(
+            f"{sel}: selector path",
+            measure(lambda: selector.get_value(msg), number=10000),
+        )
+        report(
+            f"{sel}: hl7 accessor with index",
+            measure(lambda: get_with_accessor(index, sel), number=10000),
+        )
+        report(
+            f"{sel}: selector path with index",
+            measure(lambda: selector.get_value(msg, index), number=10000),
+        )
+
+
+if __name__ == "__main__":
+    main()
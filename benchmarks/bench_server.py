@@ -0,0 +1,57 @@
+"""
+MLLP server throughput and latency with concurrent client connections.
+"""
+import asyncio
+import statistics
+import time
+
+from hl7validator.server import FRAME_END, MLLPServer
+from hl7validator.validator import Validator
+
+from .common import make_message, make_rules
+
+MESSAGES_PER_CLIENT = 200
+
+
+async def _client(port: int, msg: bytes, latencies: list):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    frame = b"\x0b" + msg + FRAME_END
+    for _ in range(MESSAGES_PER_CLIENT):
+        start = time.perf_counter()
+        writer.write(frame)
+        await writer.drain()
+        await reader.readuntil(FRAME_END)
+        latencies.append(time.perf_counter() - start)
+    writer.close()
+
+
+async def _run(clients: int):
+    validator = Validator(rules=make_rules(50), parser="lalr")
+    server = MLLPServer(validator, port=0)
+    await server.start()
+    msg = make_message(10)
+    latencies = []
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(_client(server.port, msg, latencies) for _ in range(clients))
+        )
+        elapsed = time.perf_counter() - start
+    finally:
+        await server.close()
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1e3
+    p99 = latencies[int(len(latencies) * 0.99)] * 1e3
+    print(
+        f"{clients:3d} clients: {len(latencies) / elapsed:8.1f} msg/s,"
+        f" latency p50 {p50:.2f} ms, p99 {p99:.2f} ms"
+    )
+
+
+def main():
+    for clients in (1, 4, 16, 64):
+        asyncio.run(_run(clients))
+
+
+if __name__ == "__main__":
+    main()
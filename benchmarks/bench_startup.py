@@ -0,0 +1,50 @@
+"""
+Cold start time of `validate_hl7` cli (new interpreter for each run), with different parser options.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from .common import make_message, make_rules, report
+
+
+def run_cli(args, number: int = 5) -> float:
+    cmd = [sys.executable, "-m", "hl7validator.cli", "-q", *args]
+    best = None
+    for _ in range(number):
+        start = time.perf_counter()
+        subprocess.run(cmd, check=False, stdout=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        rules_file = os.path.join(tmp, "profile.rules")
+        msg_file = os.path.join(tmp, "message.hl7")
+        cache_file = os.path.join(tmp, "parser.cache")
+        with open(rules_file, "wt") as f:
+            f.write(make_rules(50))
+        with open(msg_file, "wb") as f:
+            f.write(make_message(10))
+
+        report(
+            "interpreter + imports only",
+            run_cli(["--help"]),
+        )
+        report("cli with earley parser", run_cli([rules_file, msg_file]))
+        report(
+            "cli with lalr parser",
+            run_cli(["--parser", "lalr", rules_file, msg_file]),
+        )
+        # first run creates serialized parser
+        cached = ["--parser", "lalr", "--parser-cache", cache_file, rules_file, msg_file]
+        run_cli(cached, number=1)
+        report("cli with serialized lalr parser", run_cli(cached))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Structure and field validation time on large ORU messages (thousands of OBX/NTE segments).
+"""
+import hl7
+
+from hl7validator.context import Context
+from hl7validator.validator import Validator
+
+from .common import make_message, make_rules, measure, report
+
+
+def _validate_with_rules(profile, msg):
+    # recursive validation with SegmentValidationRule objects, as before structure compilation
+    ctx = Context(message=msg)
+    for seg in profile.structure:
+        ctx.message = msg
+        seg.set_context(ctx).validate()
+    return ctx
+
+
+def main():
+    validator = Validator(rules=make_rules(50), parser="lalr")
+    profile = validator.profile
+    structure_only = Validator(rules=make_rules(0), parser="lalr").profile
+    for obx_count in (100, 1000, 5000):
+        msg = hl7.parse(make_message(obx_count))
+        number = 5 if obx_count <= 1000 else 1
+        report(
+            f"{obx_count} OBX/NTE: structure (rule objects)",
+            measure(
+                lambda: _validate_with_rules(structure_only, msg),
+                number=number,
+                repeat=3,
+            ),
+        )
+        report(
+            f"{obx_count} OBX/NTE: structure (compiled)",
+            measure(
+                lambda: structure_only.validate(Context(message=msg)),
+                number=number,
+                repeat=3,
+            ),
+        )
+        report(
+            f"{obx_count} OBX/NTE: structure and 50 field rules",
+            measure(
+                lambda: profile.validate(Context(message=msg)),
+                number=number,
+                repeat=3,
+            ),
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Shared helpers for hl7validator benchmarks.
+
+Benchmarks are plain scripts, run them from the repository root with the package installed, for example:
+
+    $ python -m benchmarks.bench_profile
+"""
+import timeit
+import typing
+
+MSH = b"MSH|^~\\&|SrcSystem||TargetSystem|LabName|200705271331||ORU^R01|12345|P|2.4\r"
+
+
+def make_message(obx_count: int = 10) -> bytes:
+    """
+    Builds ORU-like message with `obx_count` OBX/NTE pairs
+    """
+    segments = [MSH, b"PID|1|0000|||Last^First\r", b"PV1|1|I\r", b"OBR|1|||\r"]
+    for idx in range(obx_count):
+        segments.append(b"OBX|%d|NM|1234^Value||%d|mg||||F\r" % (idx + 1, idx))
+        segments.append(b"NTE|%d|P|note\r" % (idx + 1))
+    return b"".join(segments)
+
+
+def make_rules(rule_count: int = 10) -> str:
+    """
+    Builds rules text with a structure and `rule_count` field rules
+    """
+    lines = [
+        "",
+        "MSH",
+        "  PID",
+        "    PV1 0..1",
+        "  OBR 1..n",
+        "    OBX 0..n",
+        "    NTE 0..n",
+    ]
+    checks = [
+        '"MSH.3.1" must be "SrcSystem"',
+        '"MSH.7.1" must match r"[0-9]{12}"',
+        '"MSH.9.1.1" must be one of "ORU", "OML"',
+        '"MSH.12.1" must be not empty',
+        '"PID.2.1" must be int',
+        '"PV1.2.1" may be "I"',
+        '"OBX.2.1" cannot be "ST"',
+        '"OBX.5.1" must be int if "OBX.2.1" is of value "NM"',
+    ]
+    for idx in range(rule_count):
+        lines.append(checks[idx % len(checks)])
+    return "\n".join(lines) + "\n"
+
+
+def measure(func: typing.Callable, number: int = 20, repeat: int = 5) -> float:
+    """
+    Returns best time of a single `func()` call, in seconds
+    """
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def report(name: str, seconds: float):
+    print(f"{name:<60} {seconds * 1e3:10.3f} ms")
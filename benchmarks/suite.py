@@ -0,0 +1,268 @@
+"""
+Benchmark suite: rules parser creation, rules compilation, HL7 parsing, structure validation, field validation and
+end-to-end cli, over message sizes and rule counts. Messages and rules come from `hl7validator.generator`, with a
+fixed seed, so results of different versions can be compared:
+
+    $ python -m benchmarks.suite -o before.json
+    $ python -m benchmarks.suite -o after.json --compare before.json
+
+Use `--quick` to skip the largest sizes, and `-k NAME` to run only benchmarks with NAME in their name.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import typing
+
+import hl7
+
+import hl7validator
+from hl7validator.context import Context
+from hl7validator.generator import ORU, generate_messages, generate_rules
+from hl7validator.lazy import LazyMessage
+from hl7validator.parser import PARSERS, clear_parser_cache, create_parser
+from hl7validator.profile import compile_profile
+from hl7validator.transformer import make_transformer
+
+# message sizes in segments, and numbers of field rules
+SIZES = (10, 100, 1000, 10000)
+RULE_COUNTS = (10, 100, 1000, 5000)
+QUICK_LIMIT = 1000
+# size and rule count used when the other parameter varies
+DEFAULT_SIZE = 100
+DEFAULT_RULE_COUNT = 100
+# OBX and NTE segments in each OBR group of generated messages
+OBX_PER_GROUP = 4
+NTE_PER_OBX = 1
+SEED = 0
+
+
+class Case(typing.NamedTuple):
+    name: str
+    params: typing.Dict[str, typing.Any]
+    func: typing.Callable
+
+
+def make_message(size: int) -> str:
+    """
+    Returns ORU message with about `size` segments
+    """
+    groups = max(1, (size - 3) // (1 + OBX_PER_GROUP * (1 + NTE_PER_OBX)))
+    messages = generate_messages(
+        1, ORU, groups, OBX_PER_GROUP, NTE_PER_OBX, seed=SEED
+    )
+    return next(messages)
+
+
+def make_rules(rule_count: int) -> str:
+    return generate_rules(ORU, rule_count, depth=2, seed=SEED)
+
+
+def time_case(func: typing.Callable, min_time: float = 0.2, repeat: int = 3) -> dict:
+    """
+    Returns the best time of a single `func()` call, with the number of calls, calling `func` at least for
+    `min_time` in each of `repeat` rounds (once for calls longer than a second).
+    """
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    if elapsed / number > 1:
+        return {"seconds": elapsed / number, "number": 1, "repeat": 1}
+    while elapsed < min_time:
+        number *= 2
+        elapsed = timer.timeit(number)
+    best = min([elapsed] + timer.repeat(repeat=repeat - 1, number=number))
+    return {"seconds": best / number, "number": number, "repeat": repeat}
+
+
+def _parser_cases():
+    for parser in PARSERS:
+
+        def _create(parser=parser):
+            clear_parser_cache()
+            return create_parser(parser=parser)
+
+        yield Case("parser", {"parser": parser}, _create)
+
+
+def _compile_cases(rule_counts):
+    for rule_count in rule_counts:
+        rules = make_rules(rule_count)
+        for parser in PARSERS:
+            yield Case(
+                "compile",
+                {"parser": parser, "rules": rule_count},
+                lambda rules=rules, parser=parser: make_transformer(
+                    rules, parser=parser
+                ),
+            )
+
+
+def _parse_cases(sizes):
+    for size in sizes:
+        msg = make_message(size)
+        segments = msg.count("\r")
+        yield Case(
+            "hl7.parse", {"segments": segments}, lambda msg=msg: hl7.parse(msg)
+        )
+        yield Case(
+            "lazy_parse",
+            {"segments": segments},
+            lambda msg=msg: LazyMessage.parse(msg),
+        )
+
+
+def _structure_cases(sizes):
+    profile = compile_profile(make_rules(0), parser="lalr")
+    for size in sizes:
+        msg = hl7.parse(make_message(size))
+        yield Case(
+            "structure",
+            {"segments": len(msg)},
+            lambda msg=msg: profile.compiled_structure.validate(Context(message=msg)),
+        )
+
+
+def _field_cases(sizes, rule_counts):
+    params = [(DEFAULT_SIZE, rule_count) for rule_count in rule_counts]
+    params += [(size, DEFAULT_RULE_COUNT) for size in sizes if size != DEFAULT_SIZE]
+    for size, rule_count in params:
+        profile = compile_profile(make_rules(rule_count), parser="lalr")
+        msg = hl7.parse(make_message(size))
+        yield Case(
+            "fields",
+            {"segments": len(msg), "rules": rule_count},
+            lambda msg=msg, profile=profile: profile.compiled_rules.validate(
+                Context(message=msg)
+            ),
+        )
+        generated = profile.generated_rules
+        yield Case(
+            "fields_codegen",
+            {"segments": len(msg), "rules": rule_count},
+            lambda msg=msg, generated=generated: generated.validate(
+                Context(message=msg)
+            ),
+        )
+
+
+def _run_cli(args: typing.List[str]):
+    cmd = [sys.executable, "-m", "hl7validator.cli", "-q", *args]
+    subprocess.run(cmd, check=False, stdout=subprocess.DEVNULL)
+
+
+def _cli_cases(tmp: str, sizes, rule_counts):
+    params = [(DEFAULT_SIZE, rule_count) for rule_count in rule_counts]
+    params += [(size, DEFAULT_RULE_COUNT) for size in sizes if size != DEFAULT_SIZE]
+    for size, rule_count in params:
+        rules_file = os.path.join(tmp, f"{rule_count}.rules")
+        msg_file = os.path.join(tmp, f"{size}.hl7")
+        with open(rules_file, "wt") as f:
+            f.write(make_rules(rule_count))
+        msg = make_message(size)
+        with open(msg_file, "wt", newline="") as f:
+            f.write(msg)
+        yield Case(
+            "cli",
+            {"segments": msg.count("\r"), "rules": rule_count},
+            lambda args=["--parser", "lalr", rules_file, msg_file]: _run_cli(args),
+        )
+
+
+def get_cases(tmp: str, quick: bool = False) -> typing.Iterator[Case]:
+    sizes = [s for s in SIZES if not quick or s <= QUICK_LIMIT]
+    rule_counts = [r for r in RULE_COUNTS if not quick or r <= QUICK_LIMIT]
+    yield from _parser_cases()
+    yield from _compile_cases(rule_counts)
+    yield from _parse_cases(sizes)
+    yield from _structure_cases(sizes)
+    yield from _field_cases(sizes, rule_counts)
+    yield from _cli_cases(tmp, sizes, rule_counts)
+
+
+def case_key(name: str, params: dict) -> str:
+    return name + "".join(f" {key}={value}" for key, value in sorted(params.items()))
+
+
+def run(quick: bool = False, keyword: str = None) -> dict:
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for case in get_cases(tmp, quick):
+            if keyword and keyword not in case.name:
+                continue
+            timing = time_case(case.func)
+            results.append({"name": case.name, "params": case.params, **timing})
+            print(
+                f"{case_key(case.name, case.params):<50}"
+                f" {timing['seconds'] * 1e3:12.3f} ms"
+            )
+    return {
+        "version": hl7validator.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "results": results,
+    }
+
+
+def compare(old: dict, new: dict, threshold: float = None) -> bool:
+    """
+    Prints old and new times of benchmarks present in both results. Returns False if any benchmark is slower than
+    `threshold` times the old one.
+    """
+    old_times = {
+        case_key(r["name"], r["params"]): r["seconds"] for r in old["results"]
+    }
+    ok = True
+    print(f"\n{'':<50} {old['version']:>12} {new['version']:>12}")
+    for result in new["results"]:
+        key = case_key(result["name"], result["params"])
+        if key not in old_times:
+            continue
+        ratio = result["seconds"] / old_times[key]
+        slower = threshold is not None and ratio > threshold
+        ok = ok and not slower
+        print(
+            f"{key:<50} {old_times[key] * 1e3:9.3f} ms"
+            f" {result['seconds'] * 1e3:9.3f} ms"
+            f" {ratio:6.2f}x{' SLOWER' if slower else ''}"
+        )
+    return ok
+
+
+def main(argv: typing.List[str] = None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-o", "--output", help="save results as JSON to this file")
+    parser.add_argument("--compare", help="compare with results from this JSON file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=None,
+        help="with --compare, fail if any benchmark is THRESHOLD times slower",
+    )
+    parser.add_argument("--quick", action="store_true", help="skip the largest sizes")
+    parser.add_argument(
+        "-k", dest="keyword", help="run benchmarks with KEYWORD in name"
+    )
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    results = run(args.quick, args.keyword)
+    print(f"done in {time.perf_counter() - start:.1f} s")
+    if args.output:
+        with open(args.output, "wt") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare, "rt") as f:
+            old = json.load(f)
+        if not compare(old, results, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,7 @@ setup(
     setup_requires=["pytest-runner"],
     tests_require=["pytest"],
     install_requires=install_requires,
+    extras_require={"columnar": ["numpy"]},
     package_data={
         "hl7validator.resources": ["*.lark", "*.rules"],
         "hl7validator": ["*.txt", "*.md", "*.rst"],
@@ -27,6 +28,8 @@ setup(
     entry_points={
         "console_scripts": [
             "validate_hl7 = hl7validator.cli:main",
+            "validate_hl7_serve = hl7validator.cli:serve",
+            "generate_hl7 = hl7validator.cli:generate",
         ],
     },
 )
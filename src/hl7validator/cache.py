@@ -0,0 +1,114 @@
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+import typing
+
+from . import __version__
+from .parser import EARLEY, load_grammar
+from .profile import CompiledProfile, compile_profile
+
+log = logging.getLogger(__name__)
+
+CACHE_SUFFIX = ".profile"
+# bump when CompiledProfile layout changes
+CACHE_VERSION = "8"
+
+
+class ProfileCache:
+    """
+    On-disk cache of compiled profiles.
+
+    Entries are keyed by a hash of rules text, grammar, parser type and package version. Each entry keeps digests of
+    all sources imported by rules (directly or transitively), and is discarded when any of them has changed.
+
+    Entries are pickled, so the cache directory must not be writable by untrusted users.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+
+    def get_key(self, rules: str, grammar: str = None, parser: str = EARLEY) -> str:
+        digest = hashlib.sha256()
+        parts = (
+            __version__,
+            CACHE_VERSION,
+            parser,
+            load_grammar(grammar, parser),
+            rules,
+        )
+        for part in parts:
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}{CACHE_SUFFIX}")
+
+    def load(
+        self, rules: str, grammar: str = None, parser: str = EARLEY
+    ) -> typing.Optional[CompiledProfile]:
+        """
+        Returns cached profile for rules, or None if there's no valid entry
+        """
+        path = self.get_path(self.get_key(rules, grammar, parser))
+        try:
+            with open(path, "rb") as f:
+                profile = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError) as err:
+            log.warning(f"cannot load cached profile from {path}: {err}")
+            return None
+        if not isinstance(profile, CompiledProfile):
+            return None
+        for imported in profile.imports:
+            if not imported.is_current():
+                log.info(
+                    f"cached profile {path} is outdated: {imported.location} changed"
+                )
+                return None
+        return profile
+
+    def store(
+        self,
+        profile: CompiledProfile,
+        rules: str,
+        grammar: str = None,
+        parser: str = EARLEY,
+    ) -> str:
+        """
+        Stores compiled profile for rules, returns entry path
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.get_path(self.get_key(rules, grammar, parser))
+        # write to a temp file and replace, so concurrent readers never see partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(profile, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return path
+
+    def get_or_compile(
+        self,
+        rules: str,
+        grammar: str = None,
+        parser: str = EARLEY,
+        parser_cache: typing.Union[bool, str] = None,
+    ) -> CompiledProfile:
+        """
+        Returns cached profile for rules, compiles and stores it if needed
+        """
+        profile = self.load(rules, grammar, parser)
+        if profile is None:
+            profile = compile_profile(rules, grammar, parser, parser_cache)
+            self.store(profile, rules, grammar, parser)
+        return profile
+
+
+__all__ = ["ProfileCache"]
@@ -1,34 +1,412 @@
 import io
+import itertools
+import typing
 
 import click
 
+# server, worker pools and generator are imported by commands using them, to keep cli start up fast
+from .codegen import ENGINES, INTERPRETED
+from .constants import (
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_HOST,
+    DEFAULT_PORT,
+    MAX_DEPTH,
+    MESSAGE_TYPES,
+    ORU,
+)
+from .context import LOG_ERRORS
+from .parser import EARLEY, LALR, PARSERS
+from .profiler import DEFAULT_TOP, Profiler
+from .reader import MLLP_END, MLLP_START, read_messages
 from .validator import Validator
 
 
+def _validator_options(func):
+    """
+    Adds rules compilation options to a command
+    """
+    options = [
+        click.option(
+            "--parser",
+            type=click.Choice(PARSERS),
+            default=EARLEY,
+            show_default=True,
+            help="rules parser type",
+        ),
+        click.option(
+            "--parser-cache",
+            type=click.Path(dir_okay=False),
+            default=None,
+            help="serialized parser file (lalr parser only), created if missing",
+        ),
+        click.option(
+            "--cache-dir",
+            type=click.Path(file_okay=False),
+            default=None,
+            help="directory for compiled profiles cache",
+        ),
+        click.option(
+            "--engine",
+            type=click.Choice(ENGINES),
+            default=INTERPRETED,
+            show_default=True,
+            help="field rules engine: rule objects, or code generated from rules",
+        ),
+    ]
+    for option in reversed(options):
+        func = option(func)
+    return func
+
+
+def _create_validator(
+    rules: io.TextIOBase,
+    parser=EARLEY,
+    parser_cache=None,
+    cache_dir=None,
+    fail_fast=False,
+    profiler: Profiler = None,
+    engine=INTERPRETED,
+) -> Validator:
+    if parser_cache and parser != LALR:
+        raise click.UsageError(f"--parser-cache requires --parser {LALR}")
+    return Validator(
+        rules=rules.read(),
+        parser=parser,
+        parser_cache=parser_cache,
+        cache_dir=cache_dir,
+        # only errors are reported
+        log_level=LOG_ERRORS,
+        fail_fast=fail_fast,
+        profiler=profiler,
+        engine=engine,
+    )
+
+
 @click.command("validate_hl7")
 @click.argument("rules", type=click.File("rt"))
-@click.argument("message", type=click.File("rb"))
+@click.argument("messages", nargs=-1, required=True, type=click.File("rb"))
 @click.option("-q", "--quiet", is_flag=True, default=False)
+@_validator_options
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="number of worker processes validating messages",
+)
+@click.option(
+    "--chunk-size",
+    type=click.IntRange(min=1),
+    default=DEFAULT_CHUNK_SIZE,
+    show_default=True,
+    help="number of messages sent to a worker process at once",
+)
+@click.option(
+    "--fail-fast",
+    is_flag=True,
+    default=False,
+    help="stop validation of a message at the first error",
+)
+@click.option(
+    "--profile",
+    "profiling",
+    is_flag=True,
+    default=False,
+    help="time each rule, and print the slowest rules",
+)
+@click.option(
+    "--profile-top",
+    type=click.IntRange(min=1),
+    default=DEFAULT_TOP,
+    show_default=True,
+    help="number of rules printed with --profile",
+)
 @click.pass_context
 def main(
-    click_ctx: click.Context, rules: io.TextIOBase, message: io.BytesIO, quiet=False
+    click_ctx: click.Context,
+    rules: io.TextIOBase,
+    messages: typing.Tuple[io.BytesIO, ...],
+    quiet=False,
+    parser=EARLEY,
+    parser_cache=None,
+    cache_dir=None,
+    engine=INTERPRETED,
+    jobs=1,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    fail_fast=False,
+    profiling=False,
+    profile_top=DEFAULT_TOP,
 ):
-    v = Validator(rules=rules.read())
-    ctx = v.validate(message.read())
-    t = v.transformer
-    if not ctx.is_valid:
-        if not quiet:
-            click.echo("Message is invalid:")
-            for log_msg in ctx.log:
-                if log_msg.is_error:
+    if profiling and jobs > 1:
+        raise click.UsageError("--profile can't be used with --jobs")
+    profiler = Profiler() if profiling else None
+    v = _create_validator(
+        rules, parser, parser_cache, cache_dir, fail_fast, profiler, engine
+    )
+    profile = v.profile
+    items = _read_messages(messages)
+    # with many messages, each result is prefixed with message id
+    head = list(itertools.islice(items, 2))
+    many = len(head) > 1
+    items = itertools.chain(head, items)
+    if jobs > 1:
+        from .parallel import validate_parallel
+
+        results = validate_parallel(v, items, jobs=jobs, chunk_size=chunk_size)
+    else:
+        results = v.validate_many(items)
+
+    total = invalid = 0
+    for result in results:
+        total += 1
+        prefix = f"{result.id}: " if many else ""
+        if not result.is_valid:
+            invalid += 1
+            if not quiet:
+                click.echo(f"{prefix}Message is invalid:")
+                if result.error is not None:
+                    click.echo(f" * {result.error}")
+                for log_msg in result.context.get_errors():
                     click.echo(f" * {log_msg.msg} | {str(log_msg.rule)}")
-        click_ctx.exit(1)
+                if result.context.partial:
+                    click.echo(" (validation stopped at the first error)")
+        elif many and not quiet:
+            click.echo(f"{prefix}Message is valid.")
+
     if not quiet:
-        click.echo(f"processed {len(t.get_structure())} structure rules"
-                   f" with {sum(len(s.all_rules()) for s in t.get_structure())} selectors"
-                   f" and {len(t.get_rules())} value rules")
-        click.echo("Message is valid.")
-    click_ctx.exit(0)
+        if many:
+            click.echo(f"{total} messages, {total - invalid} valid, {invalid} invalid")
+        elif not invalid:
+            click.echo(f"processed {len(profile.structure)} structure rules"
+                       f" with {sum(len(s.all_rules()) for s in profile.structure)} selectors"
+                       f" and {len(profile.rules)} value rules")
+            click.echo("Message is valid.")
+    if profiler is not None:
+        click.echo(profiler.format_report(profile_top, source=rules.name))
+    click_ctx.exit(1 if invalid else 0)
+
+
+@click.command("validate_hl7_serve")
+@click.argument("rules", type=click.File("rt"))
+@click.option(
+    "--host", default=DEFAULT_HOST, show_default=True, help="address to listen on"
+)
+@click.option(
+    "--port", type=int, default=DEFAULT_PORT, show_default=True, help="port to listen on"
+)
+@_validator_options
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=None,
+    help="number of worker processes validating messages  [default: number of CPUs]",
+)
+@click.option(
+    "--fail-fast",
+    is_flag=True,
+    default=False,
+    help="stop validation of a message at the first error, ACK reports one error",
+)
+def serve(
+    rules: io.TextIOBase,
+    host=DEFAULT_HOST,
+    port=DEFAULT_PORT,
+    parser=EARLEY,
+    parser_cache=None,
+    cache_dir=None,
+    engine=INTERPRETED,
+    jobs=None,
+    fail_fast=False,
+):
+    """
+    Runs MLLP server, which validates received messages and replies with ACK (AA or AE with validation errors)
+    """
+    import asyncio
+
+    from .server import MLLPServer
+
+    v = _create_validator(
+        rules, parser, parser_cache, cache_dir, fail_fast, engine=engine
+    )
+    v.compile()
+    server = MLLPServer(v, host=host, port=port, jobs=jobs)
+
+    async def _serve():
+        await server.start()
+        click.echo(f"Listening on {server.host}:{server.port}")
+        await server.serve_forever()
+
+    try:
+        asyncio.run(_serve())
+    except KeyboardInterrupt:
+        pass
+
+
+@click.group("generate_hl7")
+def generate():
+    """
+    Generates synthetic messages and matching rules, for load tests and benchmarks
+    """
+
+
+@generate.command("messages")
+@click.option(
+    "-o", "--output", type=click.File("wb"), default="-", help="output file"
+)
+@click.option(
+    "-n",
+    "--count",
+    type=click.IntRange(min=1),
+    default=100,
+    show_default=True,
+    help="number of messages",
+)
+@click.option(
+    "-t",
+    "--type",
+    "message_type",
+    type=click.Choice(MESSAGE_TYPES),
+    default=ORU,
+    show_default=True,
+    help="message type",
+)
+@click.option(
+    "--groups",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="number of segment groups (OBR, ORC/OBR or DG1)",
+)
+@click.option(
+    "--obx",
+    type=click.IntRange(min=1),
+    default=3,
+    show_default=True,
+    help="number of OBX segments in a group",
+)
+@click.option(
+    "--nte",
+    type=click.IntRange(min=0),
+    default=1,
+    show_default=True,
+    help="number of NTE segments after each OBX segment",
+)
+@click.option(
+    "--fill-rate",
+    type=click.FloatRange(0, 1),
+    default=0.8,
+    show_default=True,
+    help="probability of an optional field being filled",
+)
+@click.option(
+    "--error-rate",
+    type=click.FloatRange(0, 1),
+    default=0.0,
+    show_default=True,
+    help="probability of a message being invalid",
+)
+@click.option("--seed", type=int, default=0, show_default=True, help="random seed")
+@click.option("--mllp", is_flag=True, default=False, help="write MLLP framed messages")
+def generate_messages(
+    output: typing.BinaryIO,
+    count=100,
+    message_type=ORU,
+    groups=1,
+    obx=3,
+    nte=1,
+    fill_rate=0.8,
+    error_rate=0.0,
+    seed=0,
+    mllp=False,
+):
+    """
+    Writes synthetic messages, one after another (or MLLP framed)
+    """
+    from . import generator
+
+    messages = generator.generate_messages(
+        count, message_type, groups, obx, nte, fill_rate, error_rate, seed
+    )
+    for msg in messages:
+        data = msg.encode("utf-8")
+        output.write(MLLP_START + data + MLLP_END + b"\r" if mllp else data)
+
+
+@generate.command("rules")
+@click.option(
+    "-o", "--output", type=click.File("wt"), default="-", help="output file"
+)
+@click.option(
+    "-n",
+    "--rules",
+    "rule_count",
+    type=click.IntRange(min=0),
+    default=50,
+    show_default=True,
+    help="number of field rules",
+)
+@click.option(
+    "-t",
+    "--type",
+    "message_type",
+    type=click.Choice(MESSAGE_TYPES),
+    default=ORU,
+    show_default=True,
+    help="message type",
+)
+@click.option(
+    "--depth",
+    type=click.IntRange(1, MAX_DEPTH),
+    default=2,
+    show_default=True,
+    help="structure rules depth",
+)
+@click.option(
+    "--conditional-rate",
+    type=click.FloatRange(0, 1),
+    default=0.1,
+    show_default=True,
+    help="probability of a rule having a condition",
+)
+@click.option("--seed", type=int, default=0, show_default=True, help="random seed")
+def generate_rules(
+    output: typing.TextIO,
+    rule_count=50,
+    message_type=ORU,
+    depth=2,
+    conditional_rate=0.1,
+    seed=0,
+):
+    """
+    Writes rules for generated messages of the same type
+    """
+    from . import generator
+
+    output.write(
+        generator.generate_rules(
+            message_type, rule_count, depth, conditional_rate, seed
+        )
+    )
+
+
+def _read_messages(
+    messages: typing.Iterable[io.BytesIO],
+) -> typing.Iterator[typing.Tuple[str, bytes]]:
+    """
+    Reads messages from message files, with message ids: file name, with message number for files with many messages
+    (batch files, MLLP dumps).
+    """
+    for message in messages:
+        file_messages = read_messages(message)
+        first = list(itertools.islice(file_messages, 2))
+        if len(first) < 2:
+            # empty file is reported as invalid message
+            yield message.name, first[0] if first else b""
+            continue
+        for num, msg in enumerate(itertools.chain(first, file_messages), start=1):
+            yield f"{message.name}:{num}", msg
 
 
 if __name__ == "__main__":
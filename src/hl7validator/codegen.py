@@ -0,0 +1,371 @@
+"""
+Code-generating engine: field rules of a profile compiled into generated Python source of a single function.
+"""
+import functools
+import hashlib
+import linecache
+import logging
+import types
+import typing
+
+import hl7
+from hl7.util import unescape
+
+from .context import Context, LogMessage
+from .exceptions import ValidationStopped
+from .predicates import CannotBe, MayBe, MustBe
+from .profiler import format_location
+from .rules import FieldValidationRule
+from .ruleset import CompiledRules, RuleCheck
+from .selectors import FieldPath, FieldSelector
+from .values import (
+    INVALID,
+    AnyValue,
+    ConstValue,
+    IntValue,
+    OneOfValues,
+    RegexpValue,
+    StringValue,
+)
+
+log = logging.getLogger(__name__)
+
+# field rules engines: rule objects, or generated code
+INTERPRETED = "interpreted"
+CODEGEN = "codegen"
+ENGINES = (INTERPRETED, CODEGEN)
+
+FUNCTION_NAME = "validate_rules"
+INDENT = "    "
+
+# predicates with checks generated inline
+_PREDICATES = (MustBe, MayBe, CannotBe)
+
+
+class _SourceBuilder:
+    """
+    Builds source of the validation function and the namespace it's executed in.
+
+    Values and check results shared by many rules (see `ruleset.share_checks()`) are kept in local variables: value
+    slot N is read into `vN` by the first rule using it, result slot N is computed into `cN`.
+    """
+
+    def __init__(self):
+        self.lines: typing.List[str] = []
+        # objects referenced by generated code
+        self.namespace: typing.Dict[str, typing.Any] = {
+            "INVALID": INVALID,
+            "LogMessage": LogMessage,
+            "Component": hl7.Component,
+            "Repetition": hl7.Repetition,
+            "unescape": unescape,
+            "log": log,
+            "INFO": logging.INFO,
+        }
+        # segment key -> name of the variable with located segment
+        self.segments: typing.Dict[tuple, str] = {}
+        # value and result slots already computed
+        self.values: typing.Set[int] = set()
+        self.results: typing.Set[int] = set()
+        # number of checks using each result slot
+        self.result_uses: typing.Dict[int, int] = {}
+        # some rules are validated with their own `.validate()`, which needs located segments
+        self.delegated = False
+        self.count = 0
+
+    def emit(self, depth: int, line: str):
+        self.lines.append(INDENT * depth + line)
+
+    def add_rule(self, check: RuleCheck, depth: int, top: bool = True):
+        rule = check.rule
+        num = self.count
+        self.count += 1
+        self.namespace[f"R{num}"] = rule
+        self.namespace[f"S{num}"] = rule.selector
+        self.namespace[f"P{num}"] = rule.predicate
+        if top:
+            description = f"{rule.selector.sel} {rule.predicate}".replace("\n", " ")
+            self.emit(depth, f"# {format_location(rule)} {description}")
+            self.emit(depth, "if info:")
+            self.emit(depth + 1, f'log.info("validating %s in payload", R{num})')
+        if check.value_slot is None:
+            # custom rule, predicate or selector classes
+            self.delegated = True
+            self.emit(depth, f"R{num}.validate(segments, ctx)")
+            return
+        if check.test is not None:
+            self.add_rule(check.test, depth, top=False)
+        var = f"v{check.value_slot}"
+        if check.value_slot not in self.values:
+            self.values.add(check.value_slot)
+            self.add_select(rule.selector, num, var, depth)
+        self.add_check(check, num, var, depth)
+
+    def add_select(self, selector: FieldSelector, num: int, var: str, depth: int):
+        """
+        Emits code reading `selector` value into `var`, same as `BasePredicate.select()`
+        """
+        if selector.path is None:
+            self.emit(depth, f"{var} = S{num}.get_value(message, index)")
+            return
+        segment = self.segments[selector.segment_key]
+        self.emit(depth, f"if {segment} is None:")
+        self.emit(depth + 1, f"{var} = S{num}.get_value(message, index)")
+        # FieldPath.extract(), any branch which raises is delegated to the selector
+        path = selector.path
+        raises = f"{var} = S{num}.get_segment_value({segment}, message)"
+        self.emit(
+            depth,
+            f"elif {path.field} < len({segment})"
+            f" and {path.repeat} < len({segment}[{path.field}]):",
+        )
+        self.emit(depth + 1, f"{var} = {segment}[{path.field}][{path.repeat}]")
+        self.emit(depth + 1, f"if isinstance({var}, Repetition):")
+        self.add_component(path, segment, var, raises, depth + 2)
+        self.emit(depth + 1, "else:")
+        if path.component or path.subcomponent:
+            self.emit(depth + 2, raises)
+        elif not path.raw:
+            self.emit(depth + 2, f"{var} = unescape({segment}, {var})")
+        else:
+            self.emit(depth + 2, "pass")
+        if not (path.repeat or path.component or path.subcomponent):
+            # non-present optional value
+            self.emit(depth, f"elif {path.field} >= len({segment}):")
+            self.emit(depth + 1, f'{var} = ""')
+        self.emit(depth, "else:")
+        self.emit(depth + 1, raises)
+
+    def add_component(
+        self, path: FieldPath, segment: str, var: str, raises: str, depth: int
+    ):
+        self.emit(depth, f"if {path.component} < len({var}):")
+        self.emit(depth + 1, f"{var} = {var}[{path.component}]")
+        self.emit(depth + 1, f"if isinstance({var}, Component):")
+        self.emit(
+            depth + 2,
+            f"{var} = unescape({segment}, {var}[{path.subcomponent}])"
+            f' if {path.subcomponent} < len({var}) else ""',
+        )
+        self.emit(depth + 1, "else:")
+        if path.subcomponent:
+            self.emit(depth + 2, raises)
+        else:
+            self.emit(depth + 2, f"{var} = unescape({segment}, {var})")
+        self.emit(depth, "else:")
+        self.emit(depth + 1, raises if path.subcomponent else f'{var} = ""')
+
+    def add_condition(
+        self, check: RuleCheck, num: int, var: str, depth: int
+    ) -> typing.Optional[str]:
+        """
+        Emits code needed to check `var`, returns an expression which is true if the check passed (None if it
+        always passes)
+        """
+        predicate = check.rule.predicate
+        expected = predicate.expected
+        slot = check.result_slot
+        result = f"c{slot}" if slot is not None else "ok"
+        if slot in self.results:
+            return result
+        if type(predicate) is CannotBe:
+            return None
+        if type(predicate) not in _PREDICATES:
+            condition = f"P{num}.check({var}) is not INVALID"
+        elif type(expected) is IntValue:
+            # int() accepts signs and whitespace, only int() itself tells if the value is an int
+            if type(predicate) is MayBe:
+                self.emit(depth, f"{result} = True")
+                self.emit(depth, f"if {var}:")
+                depth += 1
+            self.emit(depth, "try:")
+            self.emit(depth + 1, f"int({var})")
+            if type(predicate) is MustBe:
+                self.emit(depth + 1, f"{result} = True")
+            self.emit(depth, "except (ValueError, TypeError):")
+            self.emit(depth + 1, f"{result} = False")
+            if slot is not None:
+                self.results.add(slot)
+            return result
+        else:
+            condition = _value_condition(expected, num, var)
+            if type(expected) is RegexpValue:
+                self.namespace[f"M{num}"] = expected.re.match
+            if condition is not None and type(predicate) is MayBe:
+                condition = f"not {var} or {condition}"
+        if condition is None or self.result_uses.get(slot, 0) < 2:
+            return condition
+        # shared with other rules
+        self.emit(depth, f"{result} = {condition}")
+        self.results.add(slot)
+        return result
+
+    def add_check(self, check: RuleCheck, num: int, var: str, depth: int):
+        """
+        Emits the check of `var`, and logging of its result, same as `FieldValidationRule.validate()`
+        """
+        rule = check.rule
+        condition = self.add_condition(check, num, var, depth)
+        ok = [
+            "if log_passed:",
+            f"{INDENT}add_msg(LogMessage({f'Rule {rule}: ok'!r}, R{num}, S{num}))",
+            "else:",
+            f"{INDENT}passed += 1",
+        ]
+        if condition is None:
+            for line in ok:
+                self.emit(depth, line)
+            return
+        self.emit(depth, f"if {condition}:")
+        for line in ok:
+            self.emit(depth + 1, line)
+        self.emit(depth, "else:")
+        error = f"validation error for {rule.selector} value "
+        error = "f" + repr(error.replace("{", "{{").replace("}", "}}") + f"{{{var}}}")
+        self.emit(depth + 1, f"add_msg(LogMessage({error}, R{num}, S{num}, True))")
+
+    def build(self, rules: typing.Sequence[FieldValidationRule]) -> str:
+        compiled = CompiledRules(rules)
+        # segments are located in the same order as by `CompiledRules.locate_segments()`
+        for group in compiled.groups:
+            self.segments[group.segment_key] = f"g{len(self.segments)}"
+        for check in compiled.checks:
+            for c in (check, check.test):
+                if c is not None and c.result_slot is not None:
+                    self.result_uses[c.result_slot] = (
+                        self.result_uses.get(c.result_slot, 0) + 1
+                    )
+        body_start = len(self.lines)
+        for check in compiled.checks:
+            self.add_rule(check, 2)
+        body = self.lines[body_start:]
+        self.lines = [
+            f"def {FUNCTION_NAME}(ctx):",
+            f"{INDENT}message = ctx.message",
+            f"{INDENT}index = ctx.get_index()",
+            f"{INDENT}add_msg = ctx.add_msg",
+            f"{INDENT}log_passed = ctx.log_passed",
+            f"{INDENT}info = log.isEnabledFor(INFO)",
+            f"{INDENT}passed = 0",
+        ]
+        for (segment_id, segment_num), name in self.segments.items():
+            self.emit(1, "try:")
+            self.emit(2, f"{name} = index.get_segment({segment_id!r}, {segment_num!r})")
+            self.emit(1, "except (KeyError, IndexError):")
+            self.emit(2, f"{name} = None")
+        if self.delegated:
+            located = ", ".join(f"{key!r}: {name}" for key, name in self.segments.items())
+            self.emit(1, f"segments = {{{located}}}")
+            self.emit(
+                1, "segments = {k: g for k, g in segments.items() if g is not None}"
+            )
+        self.emit(1, "try:")
+        self.lines.extend(body or [INDENT * 2 + "pass"])
+        self.emit(1, "finally:")
+        self.emit(2, "ctx.passed += passed")
+        return "\n".join(self.lines) + "\n"
+
+
+def _value_condition(expected, num: int, var: str) -> typing.Optional[str]:
+    """
+    Returns an expression which is true if `var` matches `expected`, None if any value matches
+    """
+    kind = type(expected)
+    if kind is ConstValue:
+        return f"{var} == {expected.const!r}"
+    if kind is OneOfValues:
+        if not expected._values:
+            return f"{var} in frozenset()"
+        return f"{var} in {{%s}}" % ", ".join(map(repr, sorted(expected._values)))
+    if kind is AnyValue:
+        return var
+    if kind is StringValue:
+        return None
+    if kind is RegexpValue:
+        return f"M{num}({var})"
+    # custom values
+    return f"P{num}.check({var}) is not INVALID"
+
+
+def generate_source(
+    rules: typing.Sequence[FieldValidationRule],
+) -> typing.Tuple[str, typing.Dict[str, typing.Any]]:
+    """
+    Generates source of a function validating `rules`, returns the source and the namespace (rule objects and
+    helpers referenced by the source) it should be executed in.
+
+    The function takes a validation context, and validates its message the same way as `CompiledRules.validate()`
+    (without catching `ValidationStopped`).
+    """
+    builder = _SourceBuilder()
+    source = builder.build(rules)
+    return source, builder.namespace
+
+
+@functools.lru_cache(maxsize=64)
+def _compile_source(source: str) -> types.CodeType:
+    digest = hashlib.sha256(source.encode("utf-8")).hexdigest()[:16]
+    filename = f"<hl7validator-rules-{digest}>"
+    # source lines for tracebacks and `inspect.getsource()`
+    linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+    return compile(source, filename, "exec")
+
+
+class GeneratedRules(CompiledRules):
+    """
+    Field rules compiled into a single generated Python function.
+
+    The function checks rules one after another, in rules file order, with selector paths, `must be`/`may be`
+    constants, `one of`, `not empty`, `int` and regular expression checks inlined, and conditions checked just
+    before their rules. Rule objects are used only in the validation log, so results are the same as with
+    `CompiledRules`. Rules with custom predicates, values or selectors are validated with their `.validate()`.
+
+    Source is generated on first use, and compiled code is cached by source, in each process. Generated source is
+    available in `.source` (and in tracebacks). Profiled validations (`Context.profiler`) are done by
+    `CompiledRules`.
+    """
+
+    __slots__ = ("_source", "_function")
+
+    def __init__(self, rules: typing.Sequence[FieldValidationRule]):
+        super().__init__(rules)
+        self._source = None
+        self._function = None
+
+    def __reduce__(self):
+        # generated function can't be pickled, it's generated again
+        return self.__class__, (self.rules,)
+
+    @property
+    def source(self) -> str:
+        if self._source is None:
+            self._generate()
+        return self._source
+
+    def _generate(self) -> typing.Callable[[Context], None]:
+        source, namespace = generate_source(self.rules)
+        exec(_compile_source(source), namespace)
+        self._source = source
+        # set last, so validations in other threads use the function once it's complete
+        self._function = namespace[FUNCTION_NAME]
+        return self._function
+
+    def validate(self, ctx: Context) -> Context:
+        if ctx.profiler is not None:
+            return super().validate(ctx)
+        function = self._function or self._generate()
+        try:
+            function(ctx)
+        except ValidationStopped:
+            # fail-fast validation, ctx is marked as partial
+            pass
+        return ctx
+
+
+__all__ = [
+    "CODEGEN",
+    "ENGINES",
+    "INTERPRETED",
+    "GeneratedRules",
+    "generate_source",
+]
@@ -0,0 +1,340 @@
+"""
+Columnar batch validation of field rules, for bulk validation of message archives. Requires NumPy
+(`pip install hl7-validator[columnar]`).
+"""
+import logging
+import typing
+
+import numpy as np
+
+from .context import Context, LogMessage, ValidationResult
+from .exceptions import ValidationStopped
+from .predicates import BasePredicate, CannotBe, MayBe, MustBe
+from .rules import FieldValidationRule
+from .validator import MESSAGE_ERRORS, MessageItem, Validator, message_chunks
+from .values import (
+    INVALID,
+    AnyValue,
+    BaseValue,
+    ConstValue,
+    IntValue,
+    OneOfValues,
+    StringValue,
+)
+
+log = logging.getLogger(__name__)
+
+# parsed messages of a batch are kept in memory until the batch is done, large batches make garbage collection slower
+DEFAULT_BATCH_SIZE = 100
+
+# checks values of a column: array of selected strings -> array of check results
+_Evaluate = typing.Callable[[np.ndarray], np.ndarray]
+
+
+def _unique_check(check: typing.Callable[[str], typing.Any]) -> _Evaluate:
+    """
+    Returns a column check calling `check` once for each distinct value in the column
+    """
+
+    def evaluate(values: np.ndarray) -> np.ndarray:
+        unique, inverse = np.unique(values, return_inverse=True)
+        results = np.fromiter(
+            (check(value) is not INVALID for value in unique.tolist()),
+            dtype=bool,
+            count=len(unique),
+        )
+        return results[inverse.reshape(-1)]
+
+    return evaluate
+
+
+def _all_passed(values: np.ndarray) -> np.ndarray:
+    return np.ones(len(values), dtype=bool)
+
+
+def _value_check(expected: BaseValue) -> _Evaluate:
+    """
+    Returns a column check equivalent to `expected.check()` for string values
+    """
+    kind = type(expected)
+    if kind is ConstValue:
+        const = expected.const
+        return lambda values: values == const
+    if kind is OneOfValues:
+        one_of = np.array(sorted(expected._values), dtype=str)
+        return lambda values: np.isin(values, one_of)
+    if kind is AnyValue:
+        return lambda values: values != ""
+    if kind is StringValue:
+        return _all_passed
+    if kind is IntValue:
+        others = _unique_check(expected.check)
+
+        def evaluate(values: np.ndarray) -> np.ndarray:
+            # decimal digits are always accepted by int(), other values (signs, whitespace) are checked one by one
+            passed = np.char.isdecimal(values)
+            rest = np.flatnonzero(~passed)
+            if len(rest):
+                passed[rest] = others(values[rest])
+            return passed
+
+        return evaluate
+    # RegexpValue (one match per distinct value), and custom values
+    return _unique_check(expected.check)
+
+
+def _predicate_check(predicate: BasePredicate) -> _Evaluate:
+    """
+    Returns a column check equivalent to `predicate.check()` for string values
+    """
+    kind = type(predicate)
+    if kind is CannotBe:
+        return _all_passed
+    if kind is MustBe:
+        return _value_check(predicate.expected)
+    if kind is MayBe:
+        check = _value_check(predicate.expected)
+        return lambda values: (values == "") | check(values)
+    return _unique_check(predicate.check)
+
+
+class _Check:
+    """
+    Field rule (or a test rule), with its check compiled for columns
+    """
+
+    __slots__ = ("rule", "evaluate", "ok_msg", "error_prefix")
+
+    # None for rules validated message by message, with their own `.validate()`
+    evaluate: typing.Optional[_Evaluate]
+
+    def __init__(self, rule: FieldValidationRule):
+        self.rule = rule
+        if type(rule) is FieldValidationRule:
+            self.evaluate = _predicate_check(rule.predicate)
+        else:
+            self.evaluate = None
+        self.ok_msg = f"Rule {rule}: ok"
+        self.error_prefix = f"validation error for {rule.selector} value "
+
+
+class _Column:
+    """
+    Values of one selector in a batch of messages, by position of the message in the batch
+    """
+
+    __slots__ = ("values", "errors", "strings")
+
+    # selected values, None for messages the selector wasn't read from
+    values: typing.List[typing.Any]
+    # errors raised by the selector, by message position
+    errors: typing.Dict[int, Exception]
+    # values as a string array, None if any value isn't a string
+    strings: typing.Optional[np.ndarray]
+
+    def __init__(self, values: typing.List[typing.Any], errors: dict, read: list):
+        self.values = values
+        self.errors = errors
+        # numpy strips trailing NUL characters from strings
+        if all(type(values[pos]) is str and not values[pos].endswith("\0") for pos in read):
+            self.strings = np.array(
+                [v if v is not None else "" for v in values], dtype=str
+            )
+        else:
+            self.strings = None
+
+
+class ColumnarRules:
+    """
+    Field rules evaluated column-wise over a batch of messages.
+
+    Each selector's values are read from all messages of the batch once, into a column, and each rule is checked
+    on the whole column: `must be`/`may be` checks of constants, `one of` and `not empty` checks as array
+    comparisons and set membership, `int` checks as a decimal digits test (other values are checked with `int()`),
+    regular expressions and other checks once per distinct value of the column. Rules of `FieldValidationRule`
+    subclasses are validated message by message, with their own `.validate()`. Rules are still evaluated in rules
+    order, and each message gets the same log (and the same error, for malformed messages) as with `CompiledRules`.
+    """
+
+    __slots__ = ("checks",)
+
+    checks: typing.Tuple[_Check, ...]
+
+    def __init__(self, rules: typing.Sequence[FieldValidationRule]):
+        checks = []
+        for rule in rules:
+            check = _Check(rule)
+            # rules validated with `.validate()` validate their test rules themselves
+            if rule.test_rule is not None and check.evaluate is not None:
+                checks.append(_Check(rule.test_rule))
+            checks.append(check)
+        self.checks = tuple(checks)
+
+    def validate(
+        self,
+        contexts: typing.Sequence[Context],
+        segments: typing.Sequence[typing.Dict[tuple, typing.Any]],
+    ) -> typing.List[typing.Optional[Exception]]:
+        """
+        Validates messages of `contexts` (with segments located by `CompiledRules.locate_segments()`). Results are
+        added to the contexts. Returns the error which stopped validation of each message (or None).
+        """
+        count = len(contexts)
+        errors: typing.List[typing.Optional[Exception]] = [None] * count
+        active = np.ones(count, dtype=bool)
+        passed = np.zeros(count, dtype=np.int64)
+        log_passed = bool(contexts) and contexts[0].log_passed
+        columns: typing.Dict[str, _Column] = {}
+        for check in self.checks:
+            positions = np.flatnonzero(active)
+            if not len(positions):
+                break
+            rule = check.rule
+            log.info("validating %s in payload", rule)
+            if check.evaluate is None:
+                self._validate_rule(rule, positions, contexts, segments, errors, active)
+                continue
+            column = columns.get(rule.selector.sel)
+            if column is None:
+                column = columns[rule.selector.sel] = self._read_column(
+                    rule, positions, contexts, segments
+                )
+                if column.errors:
+                    for pos, err in column.errors.items():
+                        errors[pos] = err
+                        active[pos] = False
+                    positions = np.flatnonzero(active)
+
+            if column.strings is not None:
+                results = check.evaluate(column.strings[positions])
+            else:
+                results = np.fromiter(
+                    (
+                        rule.predicate.check(column.values[pos]) is not INVALID
+                        for pos in positions.tolist()
+                    ),
+                    dtype=bool,
+                    count=len(positions),
+                )
+
+            for pos in positions[~results].tolist():
+                try:
+                    contexts[pos].add_msg(
+                        LogMessage(
+                            msg=f"{check.error_prefix}{column.values[pos]}",
+                            rule=rule,
+                            selector=rule.selector,
+                            is_error=True,
+                        )
+                    )
+                except ValidationStopped:
+                    # fail-fast validation, ctx is marked as partial
+                    active[pos] = False
+            if log_passed:
+                for pos in positions[results].tolist():
+                    contexts[pos].add_msg(
+                        LogMessage(msg=check.ok_msg, rule=rule, selector=rule.selector)
+                    )
+            else:
+                passed[positions[results]] += 1
+
+        if not log_passed:
+            for ctx, ctx_passed in zip(contexts, passed.tolist()):
+                ctx.passed += ctx_passed
+        return errors
+
+    @staticmethod
+    def _validate_rule(
+        rule: FieldValidationRule,
+        positions: np.ndarray,
+        contexts: typing.Sequence[Context],
+        segments: typing.Sequence[typing.Dict[tuple, typing.Any]],
+        errors: typing.List[typing.Optional[Exception]],
+        active: np.ndarray,
+    ):
+        for pos in positions.tolist():
+            try:
+                rule.validate(segments[pos], contexts[pos])
+            except MESSAGE_ERRORS as err:
+                errors[pos] = err
+                active[pos] = False
+            except ValidationStopped:
+                # fail-fast validation, ctx is marked as partial
+                active[pos] = False
+
+    @staticmethod
+    def _read_column(
+        rule: FieldValidationRule,
+        positions: np.ndarray,
+        contexts: typing.Sequence[Context],
+        segments: typing.Sequence[typing.Dict[tuple, typing.Any]],
+    ) -> _Column:
+        values: typing.List[typing.Any] = [None] * len(contexts)
+        errors = {}
+        read = []
+        select = rule.predicate.select
+        selector = rule.selector
+        for pos in positions.tolist():
+            try:
+                values[pos] = select(selector, segments[pos], contexts[pos])
+            except MESSAGE_ERRORS as err:
+                errors[pos] = err
+            else:
+                read.append(pos)
+        return _Column(values, errors, read)
+
+
+def validate_columnar(
+    validator: Validator,
+    messages: typing.Iterable[MessageItem],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> typing.Iterator[ValidationResult]:
+    """
+    Validates messages in batches, with field rules evaluated column-wise (see `ColumnarRules`), yielding a result
+    for each message, in input order.
+
+    Works like `Validator.validate_many()`, with the same results. Structure rules are validated message by
+    message, field rules of `batch_size` messages at once, so results are yielded batch by batch, and memory use
+    depends on the batch size. `validator.profiler` and `validator.metrics` are not used.
+
+    Reading field values from messages costs the same as with `validate_many()`, so the gain depends on the number
+    of rules per selector and on the share of field rules in validation time: field rules of generated ORU messages
+    with 100 rules are validated about 3 times faster, whole messages (with parsing) about 1.2 times faster.
+
+    :param validator: validator with rules to check
+    :param messages: iterable of messages or (correlation id, message) tuples
+    :param batch_size: number of messages validated at once
+    :return:
+    """
+    profile = validator.profile
+    rules = ColumnarRules(profile.compiled_rules.rules)
+    for batch in message_chunks(messages, batch_size):
+        results = []
+        # messages which passed structure validation
+        pending: typing.List[ValidationResult] = []
+        segments = []
+        for correlation_id, msg in batch:
+            ctx = Context(
+                message=msg,
+                log_level=validator.log_level,
+                fail_fast=validator.fail_fast,
+            )
+            result = ValidationResult(id=correlation_id, context=ctx)
+            results.append(result)
+            try:
+                validator._prepare_context(ctx)
+                profile.compiled_structure.validate(ctx)
+                if ctx.partial:
+                    continue
+                segments.append(profile.compiled_rules.locate_segments(ctx))
+            except MESSAGE_ERRORS as err:
+                result.error = err
+            else:
+                pending.append(result)
+        errors = rules.validate([r.context for r in pending], segments)
+        for result, error in zip(pending, errors):
+            result.error = error
+        yield from results
+
+
+__all__ = ["ColumnarRules", "validate_columnar"]
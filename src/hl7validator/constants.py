@@ -0,0 +1,20 @@
+"""
+Defaults shared by the command line interface and the modules implementing its commands. Kept in a module without
+dependencies, so `validate_hl7` doesn't import the server or worker pools to show its options.
+"""
+
+# parallel validation
+DEFAULT_CHUNK_SIZE = 100
+
+# MLLP server
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 2575
+
+# generated messages
+ADT = "ADT"
+ORM = "ORM"
+ORU = "ORU"
+MESSAGE_TYPES = (ADT, ORM, ORU)
+
+# generated structure rules
+MAX_DEPTH = 3
@@ -4,12 +4,22 @@ import typing
 import attrs
 import hl7
 
+from .exceptions import ValidationStopped
+from .index import SegmentIndex
+from .lazy import LazyMessage
+
 if typing.TYPE_CHECKING:
+    from .profiler import Profiler
     from .selectors import BaseSelector
     from .rules import BasePredicate
 
 log = logging.getLogger(__name__)
 
+# log levels: all checks (with passed ones), or errors only
+LOG_ALL = "all"
+LOG_ERRORS = "errors"
+LOG_LEVELS = (LOG_ALL, LOG_ERRORS)
+
 
 @attrs.define(auto_attribs=True)
 class LogMessage:
@@ -25,16 +35,74 @@ class Context:
     Container for keeping data related to the validation process.
 
     This will be returned from validation. You should check .is_valid for validation result.
+
+    With `log_level="errors"`, passed checks are only counted in `.passed`, and `.log` contains errors only.
+
+    With `fail_fast`, validation stops at the first error, and `.partial` is set: the remaining checks were not
+    done, so `.log` and `.passed` don't cover the whole profile.
+
+    With `profiler`, validation of each rule is timed and counted (see `profiler.Profiler`).
     """
 
     # payload to validate
-    message: hl7.Message
+    message: typing.Union[hl7.Message, LazyMessage]
     # list of validation messages (not all may be errors)
     log: typing.List[LogMessage] = attrs.field(factory=list)
+    # which checks are logged: LOG_ALL or LOG_ERRORS
+    log_level: str = attrs.field(
+        default=LOG_ALL, validator=attrs.validators.in_(LOG_LEVELS)
+    )
+    # stop validation at the first error
+    fail_fast: bool = False
+    # per-rule profiler, validation isn't profiled without one
+    profiler: typing.Optional["Profiler"] = attrs.field(default=None, repr=False)
+    # validation was stopped before all checks were done
+    partial: bool = attrs.field(init=False, default=False)
+    # error messages from .log
+    errors: typing.List[LogMessage] = attrs.field(init=False, repr=False)
+    # number of passed checks (logged or not)
+    passed: int = attrs.field(init=False, default=0)
+    # segments index for current .message, built on demand
+    _index: typing.Optional[SegmentIndex] = attrs.field(
+        default=None, init=False, repr=False
+    )
+
+    def __attrs_post_init__(self):
+        self.errors = [l for l in self.log if l.is_error]
+        self.passed = len(self.log) - len(self.errors)
+
+    @property
+    def log_passed(self) -> bool:
+        """
+        True if passed checks should be added to the log
+        """
+        return self.log_level == LOG_ALL
+
+    def get_index(self) -> SegmentIndex:
+        """
+        Returns segments index for current message. Index is rebuilt when .message changes.
+        """
+        if self._index is None or self._index.segments is not self.message:
+            self._index = SegmentIndex(self.message)
+        return self._index
 
     def add_msg(self, log_msg: LogMessage) -> "Context":
-        log.debug(f"adding message: {log_msg}")
+        log.debug("adding message: %s", log_msg)
         self.log.append(log_msg)
+        if log_msg.is_error:
+            self.errors.append(log_msg)
+            if self.fail_fast:
+                self.partial = True
+                raise ValidationStopped()
+        else:
+            self.passed += 1
+        return self
+
+    def add_passed(self) -> "Context":
+        """
+        Counts a passed check without logging it
+        """
+        self.passed += 1
         return self
 
     def add_error(self, log_msg: str):
@@ -43,7 +111,25 @@ class Context:
 
     @property
     def is_valid(self) -> bool:
-        return not bool(self.get_errors())
+        return not self.errors
+
+    def get_errors(self) -> typing.List[LogMessage]:
+        return list(self.errors)
+
+
+@attrs.define(auto_attribs=True)
+class ValidationResult:
+    """
+    Result of validation of one message from a batch (see `Validator.validate_many()`)
+    """
+
+    # correlation id of the message: given by the caller, or the position of the message in the input
+    id: typing.Any
+    # validation context
+    context: Context
+    # error which stopped validation of the message (message not parseable, malformed etc)
+    error: typing.Optional[Exception] = None
 
-    def get_errors(self):
-        return [l for l in self.log if l.is_error]
+    @property
+    def is_valid(self) -> bool:
+        return self.error is None and self.context.is_valid
@@ -15,6 +15,12 @@ class NotValid(BaseException):
         return f"<NotValid(rule={self.rule}, selector={self.selector}, value={self.value} {self.msg or ''})>"
 
 
+class ValidationStopped(BaseException):
+    """
+    Raised when the first error is logged in fail-fast validation, to skip the remaining checks
+    """
+
+
 class RuleImportError(BaseValidatorError):
     pass
 
@@ -24,5 +30,8 @@ class MessageMalformedError(BaseValidatorError):
         self.message = message
         self.original_error = original_error
 
+    def __reduce__(self):
+        return self.__class__, (self.selector, self.message, self.original_error)
+
     def __str__(self):
         return f"<MessageMalformed={self.selector}, error={self.original_error}>"
\ No newline at end of file
@@ -0,0 +1,382 @@
+import datetime
+import random
+import typing
+
+from .constants import ADT, MAX_DEPTH, MESSAGE_TYPES, ORM, ORU
+
+# segments repeated in each group of a message: OBX, each followed by NTE segments
+OBX = "OBX"
+NTE = "NTE"
+
+# field kinds
+SEQ = "seq"
+INT = "int"
+ID = "id"
+CODE = "code"
+TEXT = "text"
+NAME = "name"
+DATE = "date"
+TIMESTAMP = "timestamp"
+MESSAGE_TYPE = "message_type"
+
+NAMES = ("Smith", "Jones", "Garcia", "Miller", "Davis", "Lopez", "Wilson", "Anderson")
+FIRST_NAMES = ("Anna", "John", "Maria", "James", "Linda", "Robert", "Eva", "Adam")
+TEXTS = ("Ward 1", "Room 12", "See notes", "Main St 1", "Fasting", "Repeat test")
+
+# condition added to conditional rules: the field is always filled, so the condition holds in valid messages
+CONDITION = '"PID.3.1" is not empty'
+
+
+class FieldSpec(typing.NamedTuple):
+    """
+    Generated field of a segment, and the kind of values it holds
+    """
+
+    field: int
+    kind: str
+    # allowed values, for CODE fields
+    values: typing.Tuple[str, ...] = ()
+    # optional fields are filled with `fill_rate` probability, and checked with `may be` rules
+    required: bool = True
+
+
+class MessageTemplate(typing.NamedTuple):
+    """
+    Segments of a message type: MSH, header segments with their cardinality, then groups of segments, each
+    followed by OBX/NTE segments
+    """
+
+    message_type: str
+    trigger: str
+    header: typing.Tuple[typing.Tuple[str, str], ...]
+    group: typing.Tuple[str, ...]
+
+
+TEMPLATES = {
+    ADT: MessageTemplate(
+        ADT,
+        "A01",
+        (("EVN", "1"), ("PID", "1"), ("NK1", "1..n"), ("PV1", "1")),
+        ("DG1",),
+    ),
+    ORM: MessageTemplate(ORM, "O01", (("PID", "1"), ("PV1", "1")), ("ORC", "OBR")),
+    ORU: MessageTemplate(ORU, "R01", (("PID", "1"), ("PV1", "1")), ("OBR",)),
+}
+
+FIELDS = {
+    "MSH": (
+        FieldSpec(3, CODE, ("LAB", "RIS", "ADMIT")),
+        FieldSpec(4, CODE, ("MAIN", "NORTH", "SOUTH")),
+        FieldSpec(5, CODE, ("HIS",), required=False),
+        FieldSpec(7, TIMESTAMP),
+        FieldSpec(9, MESSAGE_TYPE),
+        FieldSpec(10, ID),
+        FieldSpec(11, CODE, ("P",)),
+        FieldSpec(12, CODE, ("2.5",)),
+    ),
+    "EVN": (FieldSpec(1, CODE, ("A01",)), FieldSpec(2, TIMESTAMP)),
+    "PID": (
+        FieldSpec(1, SEQ),
+        FieldSpec(3, INT),
+        FieldSpec(5, NAME),
+        FieldSpec(7, DATE),
+        FieldSpec(8, CODE, ("F", "M", "O", "U")),
+        FieldSpec(11, TEXT, required=False),
+        FieldSpec(13, INT, required=False),
+    ),
+    "NK1": (
+        FieldSpec(1, SEQ),
+        FieldSpec(2, NAME),
+        FieldSpec(3, CODE, ("SPO", "PAR", "CHD"), required=False),
+    ),
+    "PV1": (
+        FieldSpec(1, SEQ),
+        FieldSpec(2, CODE, ("I", "O", "E")),
+        FieldSpec(3, TEXT, required=False),
+        FieldSpec(19, INT, required=False),
+        FieldSpec(44, TIMESTAMP, required=False),
+    ),
+    "DG1": (
+        FieldSpec(1, SEQ),
+        FieldSpec(3, CODE, ("I10", "E11.9", "J45.0", "K21.9")),
+        FieldSpec(6, CODE, ("A", "W", "F")),
+    ),
+    "ORC": (
+        FieldSpec(1, CODE, ("NW",)),
+        FieldSpec(2, ID),
+        FieldSpec(5, CODE, ("SC", "IP", "CM"), required=False),
+    ),
+    "OBR": (
+        FieldSpec(1, SEQ),
+        FieldSpec(2, ID),
+        FieldSpec(4, CODE, ("CBC", "BMP", "LIP", "TSH")),
+        FieldSpec(7, TIMESTAMP),
+        FieldSpec(25, CODE, ("F", "P", "C")),
+    ),
+    OBX: (
+        FieldSpec(1, SEQ),
+        FieldSpec(2, CODE, ("NM",)),
+        FieldSpec(3, CODE, ("GLU", "HGB", "WBC", "K", "NA")),
+        FieldSpec(5, INT),
+        FieldSpec(6, CODE, ("mg/dL", "g/L", "mmol/L"), required=False),
+        FieldSpec(11, CODE, ("F", "P")),
+        FieldSpec(14, TIMESTAMP, required=False),
+    ),
+    NTE: (
+        FieldSpec(1, SEQ),
+        FieldSpec(2, CODE, ("P", "L")),
+        FieldSpec(3, TEXT),
+    ),
+}
+
+
+def _timestamp(rnd: random.Random) -> str:
+    start = datetime.datetime(2020, 1, 1)
+    seconds = rnd.randrange(3 * 365 * 86400)
+    return (start + datetime.timedelta(seconds=seconds)).strftime("%Y%m%d%H%M%S")
+
+
+def _field_value(
+    rnd: random.Random, template: MessageTemplate, spec: FieldSpec, seq: int
+) -> str:
+    kind = spec.kind
+    if kind == SEQ:
+        return str(seq)
+    if kind == INT:
+        return str(rnd.randrange(1, 10 ** 6))
+    if kind == ID:
+        return "ID%08d" % rnd.randrange(10 ** 8)
+    if kind == CODE:
+        return rnd.choice(spec.values)
+    if kind == TEXT:
+        return rnd.choice(TEXTS)
+    if kind == NAME:
+        return f"{rnd.choice(NAMES)}^{rnd.choice(FIRST_NAMES)}"
+    if kind == DATE:
+        return _timestamp(rnd)[:8]
+    if kind == TIMESTAMP:
+        return _timestamp(rnd)
+    if kind == MESSAGE_TYPE:
+        return f"{template.message_type}^{template.trigger}"
+    raise ValueError(f"Invalid field kind: {kind}")
+
+
+def _segment(
+    rnd: random.Random,
+    template: MessageTemplate,
+    segment_id: str,
+    seq: int,
+    fill_rate: float,
+    empty: int = None,
+) -> str:
+    """
+    Returns segment text. Optional fields are filled with `fill_rate` probability, `empty` field is left empty.
+    """
+    specs = FIELDS[segment_id]
+    fields = [""] * max(spec.field for spec in specs)
+    for spec in specs:
+        if spec.field != empty and (spec.required or rnd.random() < fill_rate):
+            fields[spec.field - 1] = _field_value(rnd, template, spec, seq)
+    if segment_id == "MSH":
+        # MSH.1 is the field separator itself, MSH.2 are encoding characters
+        return "MSH|^~\\&|" + "|".join(fields[2:])
+    return segment_id + "|" + "|".join(fields)
+
+
+def generate_message(
+    rnd: random.Random,
+    message_type: str = ORU,
+    groups: int = 1,
+    obx: int = 1,
+    nte: int = 1,
+    fill_rate: float = 0.8,
+    error_rate: float = 0.0,
+) -> str:
+    """
+    Generates one message, see `generate_messages()`
+    """
+    template = TEMPLATES[message_type]
+    segments = [("MSH", 1)]
+    for segment_id, cardinality in template.header:
+        count = rnd.randint(1, 2) if cardinality == "1..n" else 1
+        segments.extend((segment_id, seq) for seq in range(1, count + 1))
+    for group in range(1, groups + 1):
+        segments.extend((segment_id, group) for segment_id in template.group)
+        for obx_seq in range(1, obx + 1):
+            segments.append((OBX, obx_seq))
+            segments.extend((NTE, nte_seq) for nte_seq in range(1, nte + 1))
+
+    empty = {}
+    if rnd.random() < error_rate:
+        if rnd.random() < 0.5:
+            # structure error: second PID segment
+            pid = segments.index(("PID", 1))
+            segments.insert(pid + 1, ("PID", 2))
+        else:
+            # field error: required field of a segment checked by rules left empty
+            segment_id = rnd.choice(
+                [h for h, _ in template.header] + list(template.group) + [OBX]
+            )
+            empty[segment_id] = rnd.choice(
+                [spec.field for spec in FIELDS[segment_id] if spec.required]
+            )
+
+    lines = []
+    for segment_id, seq in segments:
+        # rules check the first segment of each type only
+        field = empty.pop(segment_id, None)
+        lines.append(_segment(rnd, template, segment_id, seq, fill_rate, field))
+    return "\r".join(lines) + "\r"
+
+
+def generate_messages(
+    count: int,
+    message_type: str = ORU,
+    groups: int = 1,
+    obx: int = 1,
+    nte: int = 1,
+    fill_rate: float = 0.8,
+    error_rate: float = 0.0,
+    seed: int = 0,
+) -> typing.Iterator[str]:
+    """
+    Generates synthetic messages of `message_type` (ADT^A01, ORM^O01 or ORU^R01).
+
+    A message contains MSH, header segments (e.g. PID, PV1) and `groups` groups of segments (DG1 for ADT, ORC/OBR
+    for ORM, OBR for ORU). Each group is followed by `obx` OBX segments, each with `nte` NTE segments. Messages
+    are valid for rules from `generate_rules()` with any depth and rule count, unless an error is injected: with
+    `error_rate` probability a message gets a structure error (a second PID segment), or a field error (empty
+    required field).
+
+    Messages are the same for the same arguments and `seed`.
+
+    :param count: number of messages
+    :param message_type: one of MESSAGE_TYPES
+    :param groups: number of segment groups (at least one)
+    :param obx: number of OBX segments in a group (at least one)
+    :param nte: number of NTE segments after each OBX segment
+    :param fill_rate: probability of an optional field being filled
+    :param error_rate: probability of a message being invalid
+    :param seed: random seed
+    :return: messages, with segments terminated with CR
+    """
+    if message_type not in TEMPLATES:
+        raise ValueError(f"Invalid message type: {message_type}")
+    if groups < 1 or obx < 1:
+        raise ValueError("A message needs at least one group and one OBX segment")
+    rnd = random.Random(seed)
+    for _ in range(count):
+        yield generate_message(
+            rnd, message_type, groups, obx, nte, fill_rate, error_rate
+        )
+
+
+def message_size(message_type: str, groups: int, obx: int, nte: int) -> int:
+    """
+    Returns the number of segments in a generated message (with one NK1 segment in ADT messages)
+    """
+    template = TEMPLATES[message_type]
+    return 1 + len(template.header) + groups * (len(template.group) + obx * (1 + nte))
+
+
+def _structure(template: MessageTemplate, depth: int) -> typing.List[str]:
+    group_head, *group_rest = template.group
+    lines = ["MSH"]
+    for segment_id, cardinality in template.header:
+        lines.append(f"  {segment_id} {cardinality}")
+    if depth == 1:
+        # all segments are checked in the whole message
+        lines.extend(f"  {segment_id} 1..n" for segment_id in template.group)
+        lines.extend((f"  {OBX} 1..n", f"  {NTE} 0..n"))
+        return lines
+    # each group is checked separately
+    lines.append(f"  {group_head} 1..n")
+    lines.extend(f"    {segment_id}" for segment_id in group_rest)
+    lines.append(f"    {OBX} 1..n")
+    if depth == 2:
+        lines.append(f"    {NTE} 0..n")
+    else:
+        lines.append(f"      {NTE} 0..n")
+    return lines
+
+
+def _field_rules(template: MessageTemplate, segment_id: str) -> typing.List[str]:
+    out = []
+    for spec in FIELDS[segment_id]:
+        sel = f"{segment_id}.{spec.field}.1"
+        must = "must" if spec.required else "may"
+        if spec.kind in (SEQ, INT):
+            out.append(f'"{sel}" {must} be int')
+        elif spec.kind in (ID, TEXT) and spec.required:
+            out.append(f'"{sel}" must be not empty')
+        elif spec.kind in (ID, TEXT):
+            out.append(f'"{sel}" may be string')
+        elif spec.kind == NAME:
+            out.append(f'"{sel}.1" must be not empty')
+            out.append(f'"{sel}.2" may be string')
+        elif spec.kind == DATE:
+            out.append(f'"{sel}" must match r"[0-9]{{8}}"')
+        elif spec.kind == TIMESTAMP:
+            if spec.required:
+                out.append(f'"{sel}" must match r"[0-9]{{14}}"')
+            else:
+                out.append(f'"{sel}" may be int')
+        elif spec.kind == MESSAGE_TYPE:
+            out.append(f'"{sel}.1" must be "{template.message_type}"')
+            out.append(f'"{sel}.2" must be "{template.trigger}"')
+        elif len(spec.values) == 1:
+            out.append(f'"{sel}" {must} be "{spec.values[0]}"')
+        else:
+            values = ", ".join(f'"{v}"' for v in spec.values)
+            out.append(f'"{sel}" {must} be one of {values}')
+    return out
+
+
+def generate_rules(
+    message_type: str = ORU,
+    rule_count: int = 50,
+    depth: int = 2,
+    conditional_rate: float = 0.1,
+    seed: int = 0,
+) -> str:
+    """
+    Generates rules for messages from `generate_messages()`: structure rules and `rule_count` field rules.
+
+    Structure rules are nested up to `depth` levels: 1 checks segments in the whole message, 2 checks each group
+    of segments, 3 also checks NTE segments of each OBX segment. Field rules check segments present in every
+    message. All fields are checked once before any rule is repeated, in random order. With `conditional_rate`
+    probability a rule has a condition (always met in generated messages).
+
+    :param message_type: one of MESSAGE_TYPES
+    :param rule_count: number of field rules
+    :param depth: structure depth, 1 to MAX_DEPTH
+    :param conditional_rate: probability of a rule having a condition
+    :param seed: random seed
+    :return: rules text
+    """
+    if message_type not in TEMPLATES:
+        raise ValueError(f"Invalid message type: {message_type}")
+    if not 1 <= depth <= MAX_DEPTH:
+        raise ValueError(f"Invalid structure depth: {depth}")
+    rnd = random.Random(seed)
+    template = TEMPLATES[message_type]
+    segment_ids = ["MSH", *(h for h, _ in template.header), *template.group, OBX]
+    checks = [rule for s in segment_ids for rule in _field_rules(template, s)]
+    rnd.shuffle(checks)
+
+    lines = ["", *_structure(template, depth), ""]
+    for idx in range(rule_count):
+        rule = checks[idx % len(checks)]
+        if rnd.random() < conditional_rate:
+            rule = f"{rule} if {CONDITION}"
+        lines.append(rule)
+    return "\n".join(lines) + "\n"
+
+
+__all__ = [
+    "MESSAGE_TYPES",
+    "generate_message",
+    "generate_messages",
+    "generate_rules",
+    "message_size",
+]
@@ -0,0 +1,77 @@
+import bisect
+import typing
+
+import hl7
+
+from .lazy import LazyMessage
+
+
+class SegmentIndex:
+    """
+    Index of segments in a message (or a chunk of a message), by segment id.
+
+    Index is built with one pass over segments, and allows to count or find segments without scanning the message
+    again.
+    """
+
+    segments: typing.Sequence[hl7.Segment]
+    # segment id for each position
+    ids: typing.List[str]
+    # segment id -> sorted positions of segments with that id
+    positions: typing.Dict[str, typing.List[int]]
+
+    def __init__(self, segments: typing.Sequence[hl7.Segment]):
+        self.segments = segments
+        if isinstance(segments, LazyMessage):
+            # segment ids without parsing segments
+            self.ids = segments.segment_ids
+        else:
+            self.ids = [seg[0][0] for seg in segments]
+        self.positions = {}
+        for idx, seg_id in enumerate(self.ids):
+            try:
+                self.positions[seg_id].append(idx)
+            except KeyError:
+                self.positions[seg_id] = [idx]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def get_positions(self, segment_id: str) -> typing.List[int]:
+        return self.positions.get(segment_id, [])
+
+    def count(self, segment_id: str, start: int = 0, end: int = None) -> int:
+        """
+        Returns number of `segment_id` segments within [start, end) positions
+        """
+        positions = self.get_positions(segment_id)
+        if not start and end is None:
+            return len(positions)
+        if end is None:
+            end = len(self.ids)
+        return bisect.bisect_left(positions, end) - bisect.bisect_left(positions, start)
+
+    def find(self, segment_id: str, start: int = 0) -> typing.Optional[int]:
+        """
+        Returns position of the first `segment_id` segment at or after `start` position, or None
+        """
+        positions = self.get_positions(segment_id)
+        idx = bisect.bisect_left(positions, start)
+        if idx < len(positions):
+            return positions[idx]
+        return None
+
+    def get_segment(self, segment_id: str, segment_num: int = 1) -> hl7.Segment:
+        """
+        Returns `segment_num`-th (1-based) `segment_id` segment, with the same errors as `hl7.Message.segments()`
+        """
+        try:
+            positions = self.positions[segment_id]
+        except KeyError:
+            raise KeyError("No %s segments" % segment_id)
+        # hl7.Sequence 1-based indexing
+        idx = segment_num - 1 if segment_num >= 1 else segment_num
+        return self.segments[positions[idx]]
+
+
+__all__ = ["SegmentIndex"]
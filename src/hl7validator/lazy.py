@@ -0,0 +1,148 @@
+import typing
+
+import hl7
+from hl7.parser import _split, create_parse_plan
+
+
+class LazyMessage:
+    """
+    HL7 message split into segments, with segments parsed on first access.
+
+    Creating a lazy message only splits the text on segment terminators. Segment ids are read from segments text,
+    so structure checks don't parse segments at all. A segment is parsed into `hl7.Segment` (fields, repetitions,
+    components) when it's accessed by position, for example by a field selector, and parsed segments are kept
+    for later lookups.
+
+    Parsed segments are the same as segments of a message parsed with `hl7.parse()`. Lookups (`.segments()`,
+    `.segment()`, `msg["PID.3.1"]`) work like in `hl7.Message`; use `.to_message()` for a fully parsed message.
+    """
+
+    # segments text
+    lines: typing.List[str]
+    # parse plan for a segment (from MSH separators)
+    plan: typing.Any
+    _segments: typing.List[typing.Optional[hl7.Segment]]
+    _ids: typing.Optional[typing.List[str]]
+
+    def __init__(self, lines: typing.List[str], plan):
+        self.lines = lines
+        self.plan = plan
+        self._segments = [None] * len(lines)
+        self._ids = None
+
+    @classmethod
+    def parse(
+        cls, msg: typing.Union[str, bytes], encoding: str = "utf-8"
+    ) -> "LazyMessage":
+        """
+        Splits message text into segments, like `hl7.parse()` does before parsing segments.
+        """
+        if isinstance(msg, bytes):
+            msg = msg.decode(encoding)
+        strmsg = msg.strip()
+        plan = create_parse_plan(strmsg)
+        return cls(strmsg.split(plan.separator), plan.next())
+
+    @property
+    def segment_ids(self) -> typing.List[str]:
+        """
+        Segment id for each segment (the same as `segment[0][0]` of parsed segment)
+        """
+        if self._ids is None:
+            self._ids = [self._get_segment_id(idx) for idx in range(len(self.lines))]
+        return self._ids
+
+    def _get_segment_id(self, idx: int) -> str:
+        line = self.lines[idx]
+        separators = self.plan.separators
+        segment_id, sep, _ = line.partition(self.plan.separator)
+        # plain segment id followed by fields: no need to parse the segment
+        if sep and not any(s in segment_id for s in separators):
+            return segment_id
+        return self.get_segment(idx)[0][0]
+
+    def get_segment(self, idx: int) -> hl7.Segment:
+        """
+        Returns parsed segment at `idx` position
+        """
+        segment = self._segments[idx]
+        if segment is None:
+            segment = self._segments[idx] = _split(self.lines[idx], self.plan)
+        return segment
+
+    def is_parsed(self, idx: int) -> bool:
+        return self._segments[idx] is not None
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __iter__(self):
+        for idx in range(len(self.lines)):
+            yield self.get_segment(idx)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.__class__(self.lines[key], self.plan)
+        if isinstance(key, str):
+            if len(key) == 3:
+                return self.segments(key)
+            return self.extract_field(*hl7.Accessor.parse_key(key))
+        if isinstance(key, hl7.Accessor):
+            return self.extract_field(*key)
+        if key < 0:
+            key += len(self.lines)
+        if not 0 <= key < len(self.lines):
+            raise IndexError("segment index out of range")
+        return self.get_segment(key)
+
+    def segments(self, segment_id: str) -> hl7.Sequence:
+        """
+        Same as `hl7.Message.segments()`, only `segment_id` segments are parsed
+        """
+        matches = hl7.Sequence(
+            self.get_segment(idx)
+            for idx, seg_id in enumerate(self.segment_ids)
+            if seg_id == segment_id
+        )
+        if len(matches) == 0:
+            raise KeyError("No %s segments" % segment_id)
+        return matches
+
+    def segment(self, segment_id: str) -> hl7.Segment:
+        return self.segments(segment_id)[0]
+
+    def extract_field(
+        self,
+        segment,
+        segment_num=1,
+        field_num=1,
+        repeat_num=1,
+        component_num=1,
+        subcomponent_num=1,
+    ):
+        """
+        Same as `hl7.Message.extract_field()`
+        """
+        return self.segments(segment)(segment_num).extract_field(
+            segment_num, field_num, repeat_num, component_num, subcomponent_num
+        )
+
+    def to_message(self) -> hl7.Message:
+        """
+        Returns fully parsed message
+        """
+        plan = self.plan
+        return plan.factory.create_message(
+            sequence=list(self),
+            esc=plan.esc,
+            separators=plan.separators,
+            factory=plan.factory,
+        )
+
+    def __str__(self):
+        # same as str(hl7.Message): segments are terminated, not separated
+        terminator = self.plan.separators[0]
+        return "".join(line + terminator for line in self.lines)
+
+
+__all__ = ["LazyMessage"]
@@ -0,0 +1,274 @@
+import bisect
+import json
+import threading
+import typing
+
+from .context import Context
+from .profiler import format_location
+
+# validation stages
+STAGE_PARSE = "parse"
+STAGE_STRUCTURE = "structure"
+STAGE_FIELDS = "fields"
+STAGES = (STAGE_PARSE, STAGE_STRUCTURE, STAGE_FIELDS)
+
+# message results
+RESULT_VALID = "valid"
+RESULT_INVALID = "invalid"
+# message not validated: not parseable, malformed etc
+RESULT_ERROR = "error"
+RESULTS = (RESULT_VALID, RESULT_INVALID, RESULT_ERROR)
+
+# histogram buckets upper bounds, in seconds
+DEFAULT_BUCKETS = (
+    0.00001,
+    0.000025,
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+)
+
+PREFIX = "hl7validator_"
+
+
+class BaseMetrics:
+    """
+    Metrics interface: receives validation events from `Validator`.
+
+    Methods do nothing, subclasses override those they need, e.g. to send events to an external metrics library.
+    Methods are called from threads validating messages, so implementations should be thread-safe and cheap.
+    """
+
+    def observe_stage(self, stage: str, seconds: float):
+        """
+        Called after a validation stage of a message is done
+
+        :param stage: one of `STAGES`
+        :param seconds: stage time
+        """
+
+    def message_validated(
+        self, ctx: Context, error: typing.Optional[Exception], seconds: float
+    ):
+        """
+        Called after a message is validated, or its validation failed with an error
+
+        :param ctx: validation context, with errors in `.errors`
+        :param error: error which stopped validation (see `ValidationResult.error`), None if message was validated
+        :param seconds: validation time, with parsing
+        """
+
+
+class Histogram:
+    """
+    Histogram of observed values in fixed buckets
+    """
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    buckets: typing.Tuple[float, ...]
+    # observations in each bucket (not cumulative), the last one is for values above all buckets
+    counts: typing.List[int]
+    sum: float
+    count: int
+
+    def __init__(self, buckets: typing.Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> typing.List[typing.Tuple[str, int]]:
+        """
+        Returns (upper bound, number of values up to the bound) pairs, the last bound is `+Inf`
+        """
+        out = []
+        total = 0
+        for bound, count in zip([*map(repr, self.buckets), "+Inf"], self.counts):
+            total += count
+            out.append((bound, total))
+        return out
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": dict(self.cumulative()),
+        }
+
+
+def _rule_labels(rule) -> typing.Tuple[str, str]:
+    """
+    Returns (selector, location) of the rule which logged an error
+    """
+    selector = getattr(rule, "selector", None)
+    if selector is None:
+        return "", ""
+    return selector.sel, format_location(rule)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels: str) -> str:
+    return "{%s}" % ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+
+
+class MetricsCollector(BaseMetrics):
+    """
+    In-process metrics collector: counts validated messages by result and errors by rule, and keeps histograms of
+    stage times and message validation time.
+
+    Metrics are rendered on demand, in Prometheus text format with `.render_prometheus()` (e.g. for a `/metrics`
+    endpoint of the service), or as a JSON-serializable snapshot with `.snapshot()`. Updates are plain counters,
+    kept under a lock taken once per event, so the collector can be kept enabled in production.
+
+    With lazy parsing (`Validator(lazy=True)`, default) segments are parsed when they're first read, so most of the
+    parsing time is counted in structure and fields stages.
+    """
+
+    buckets: typing.Tuple[float, ...]
+    messages: typing.Dict[str, int]
+    # errors by rule object, labels are read when metrics are rendered
+    rule_errors: typing.Dict[typing.Any, int]
+    stages: typing.Dict[str, Histogram]
+    validation: Histogram
+
+    def __init__(self, buckets: typing.Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.messages = dict.fromkeys(RESULTS, 0)
+            self.rule_errors = {}
+            self.stages = {stage: Histogram(self.buckets) for stage in STAGES}
+            self.validation = Histogram(self.buckets)
+
+    def observe_stage(self, stage: str, seconds: float):
+        with self._lock:
+            self.stages[stage].observe(seconds)
+
+    def message_validated(
+        self, ctx: Context, error: typing.Optional[Exception], seconds: float
+    ):
+        if error is not None:
+            result = RESULT_ERROR
+        elif ctx.errors:
+            result = RESULT_INVALID
+        else:
+            result = RESULT_VALID
+        with self._lock:
+            self.messages[result] += 1
+            self.validation.observe(seconds)
+            rule_errors = self.rule_errors
+            for log_msg in ctx.errors:
+                rule_errors[log_msg.rule] = rule_errors.get(log_msg.rule, 0) + 1
+
+    def _rule_error_counts(self) -> typing.Dict[typing.Tuple[str, str], int]:
+        # rules with the same labels (e.g. from equal profiles) are reported together
+        counts: typing.Dict[typing.Tuple[str, str], int] = {}
+        for rule, count in list(self.rule_errors.items()):
+            labels = _rule_labels(rule)
+            counts[labels] = counts.get(labels, 0) + count
+        return counts
+
+    def snapshot(self) -> dict:
+        """
+        Returns current metrics as a JSON-serializable dict
+        """
+        with self._lock:
+            return {
+                "messages": dict(self.messages),
+                "rule_errors": [
+                    {"selector": selector, "location": location, "errors": count}
+                    for (selector, location), count in sorted(
+                        self._rule_error_counts().items()
+                    )
+                ],
+                "stages": {
+                    stage: hist.snapshot() for stage, hist in self.stages.items()
+                },
+                "validation": self.validation.snapshot(),
+            }
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.snapshot(), **kwargs)
+
+    def render_prometheus(self) -> str:
+        """
+        Returns current metrics in Prometheus text exposition format
+        """
+        with self._lock:
+            lines = [
+                f"# HELP {PREFIX}messages_total Validated messages, by result",
+                f"# TYPE {PREFIX}messages_total counter",
+            ]
+            for result, count in self.messages.items():
+                lines.append(f"{PREFIX}messages_total{_labels(result=result)} {count}")
+
+            lines += [
+                f"# HELP {PREFIX}rule_errors_total Validation errors, by rule",
+                f"# TYPE {PREFIX}rule_errors_total counter",
+            ]
+            for (selector, location), count in sorted(
+                self._rule_error_counts().items()
+            ):
+                labels = _labels(selector=selector, location=location)
+                lines.append(f"{PREFIX}rule_errors_total{labels} {count}")
+
+            lines += _render_histogram(
+                f"{PREFIX}stage_seconds",
+                "Time spent in validation stages",
+                [({"stage": stage}, hist) for stage, hist in self.stages.items()],
+            )
+            lines += _render_histogram(
+                f"{PREFIX}validation_seconds",
+                "Message validation time",
+                [({}, self.validation)],
+            )
+        return "\n".join(lines) + "\n"
+
+
+def _render_histogram(
+    name: str,
+    help_text: str,
+    histograms: typing.List[typing.Tuple[typing.Dict[str, str], Histogram]],
+) -> typing.List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for labels, hist in histograms:
+        for bound, count in hist.cumulative():
+            lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {count}")
+        suffix = _labels(**labels) if labels else ""
+        lines.append(f"{name}_sum{suffix} {hist.sum!r}")
+        lines.append(f"{name}_count{suffix} {hist.count}")
+    return lines
+
+
+__all__ = [
+    "BaseMetrics",
+    "Histogram",
+    "MetricsCollector",
+    "STAGES",
+    "STAGE_FIELDS",
+    "STAGE_PARSE",
+    "STAGE_STRUCTURE",
+]
@@ -5,6 +5,8 @@ from .context import Context
 
 
 class ContextMixin:
+    __slots__ = ()
+
     context: Context
 
     def set_context(self, context: Context):
@@ -13,6 +15,8 @@ class ContextMixin:
 
 
 class ValidateMixin:
+    __slots__ = ()
+
     def validate(self, *args, **kwargs) -> typing.Any:
         raise NotImplemented()
 
@@ -0,0 +1,193 @@
+import collections
+import concurrent.futures
+import os
+import pickle
+import typing
+
+from .codegen import INTERPRETED
+from .constants import DEFAULT_CHUNK_SIZE
+from .context import LOG_ALL, Context, LogMessage, ValidationResult
+from .profile import CompiledProfile
+from .validator import Message, MessageItem, Validator, message_chunks
+
+# log entry sent back from a worker: (message, rule index, selector index, is error)
+_LogEntry = typing.Tuple[str, int, typing.Optional[int], bool]
+# result sent back from a worker: (correlation id, log, number of passed checks, is partial, error)
+_Result = typing.Tuple[
+    typing.Any, typing.List[_LogEntry], int, bool, typing.Optional[Exception]
+]
+# per-process state of a worker: validator, and profile objects indexes
+_worker: typing.Optional[Validator] = None
+_worker_objects: typing.Dict[int, int] = {}
+
+
+def _profile_objects(profile: CompiledProfile) -> typing.List[typing.Any]:
+    """
+    Returns rules and selectors of the profile which can be referenced from the validation log.
+
+    The order is the same for a profile and its unpickled copy, so objects can be referenced by position between
+    processes.
+    """
+    out = []
+    for rule in profile.compiled_rules.rules:
+        out.extend((rule, rule.selector))
+        if rule.test_rule:
+            out.extend((rule.test_rule, rule.test_rule.selector))
+    nodes = list(profile.compiled_structure.nodes)
+    while nodes:
+        node = nodes.pop(0)
+        out.extend((node.rule, node.selector))
+        nodes.extend(node.children)
+    return out
+
+
+def init_worker(
+    profile_data: bytes,
+    lazy: bool,
+    log_level: str = LOG_ALL,
+    fail_fast: bool = False,
+    engine: str = INTERPRETED,
+):
+    """
+    Initializer of a worker process: creates the process' validator, used by `validate_one()`
+
+    :param profile_data: pickled compiled profile
+    :param lazy: see `Validator`
+    :param log_level: see `Validator`
+    :param fail_fast: see `Validator`
+    :param engine: see `Validator`
+    """
+    global _worker, _worker_objects
+    profile = pickle.loads(profile_data)
+    _worker = Validator(
+        rules=None,
+        profile=profile,
+        lazy=lazy,
+        log_level=log_level,
+        fail_fast=fail_fast,
+        engine=engine,
+    )
+    _worker_objects = {
+        id(obj): idx for idx, obj in enumerate(_profile_objects(profile))
+    }
+
+
+def validate_one(msg: Message) -> ValidationResult:
+    """
+    Validates a message with the validator of a worker process initialized with `init_worker()`
+    """
+    return next(_worker.validate_many([msg]))
+
+
+def _validate_chunk(
+    chunk: typing.List[typing.Tuple[typing.Any, Message]]
+) -> typing.List[_Result]:
+    out = []
+    for result in _worker.validate_many(chunk):
+        log = [
+            (
+                log_msg.msg,
+                _worker_objects[id(log_msg.rule)],
+                _worker_objects.get(id(log_msg.selector)),
+                log_msg.is_error,
+            )
+            for log_msg in result.context.log
+        ]
+        error = result.error
+        if error is not None and hasattr(error, "message"):
+            # message is available in the main process, don't send it back
+            error.message = None
+        ctx = result.context
+        out.append((result.id, log, ctx.passed, ctx.partial, error))
+    return out
+
+
+def validate_parallel(
+    validator: Validator,
+    messages: typing.Iterable[MessageItem],
+    jobs: int = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ordered: bool = True,
+) -> typing.Iterator[ValidationResult]:
+    """
+    Validates messages in a pool of worker processes, yielding a result for each message.
+
+    Works like `Validator.validate_many()`, but messages are validated in `jobs` processes. The compiled profile is
+    sent to each worker once, and messages are sent in chunks of `chunk_size` messages. Only a few chunks per
+    worker are sent ahead, so messages are read from `messages` as results are consumed, and memory use doesn't
+    depend on the number of messages.
+
+    Validation log of each result references rules and selectors of `validator.profile`, as with
+    `validate_many()`. Messages are parsed in workers only, so result's `context.message` (and `.message` of
+    `MessageMalformedError`) is the message as given in `messages`. Workers don't profile validation nor
+    report metrics, `validator.profiler` and `validator.metrics` are not used.
+
+    :param validator: validator with rules to check
+    :param messages: iterable of messages or (correlation id, message) tuples
+    :param jobs: number of worker processes (number of CPUs by default)
+    :param chunk_size: number of messages sent to a worker at once
+    :param ordered: yield results in input order, or as soon as a chunk is validated
+    :return:
+    """
+    profile = validator.profile
+    objects = _profile_objects(profile)
+    jobs = jobs or os.cpu_count() or 1
+    max_pending = jobs * 2
+
+    def _results(chunk, future):
+        for (_, msg), result in zip(chunk, future.result()):
+            result_id, log, passed, partial, error = result
+            ctx = Context(
+                message=msg,
+                log=[
+                    LogMessage(
+                        msg=text,
+                        rule=objects[rule_idx],
+                        selector=objects[sel_idx] if sel_idx is not None else None,
+                        is_error=is_error,
+                    )
+                    for text, rule_idx, sel_idx, is_error in log
+                ],
+                log_level=validator.log_level,
+                fail_fast=validator.fail_fast,
+            )
+            ctx.passed = passed
+            ctx.partial = partial
+            if error is not None and hasattr(error, "message"):
+                error.message = msg
+            yield ValidationResult(id=result_id, context=ctx, error=error)
+
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=init_worker,
+        initargs=(
+            pickle.dumps(profile),
+            validator.lazy,
+            validator.log_level,
+            validator.fail_fast,
+            validator.engine,
+        ),
+    ) as executor:
+        pending = collections.OrderedDict()
+        for chunk in message_chunks(messages, chunk_size):
+            future = executor.submit(_validate_chunk, chunk)
+            pending[future] = chunk
+            while len(pending) >= max_pending:
+                if ordered:
+                    done = [next(iter(pending))]
+                else:
+                    done, _ = concurrent.futures.wait(
+                        pending, return_when=concurrent.futures.FIRST_COMPLETED
+                    )
+                for future in done:
+                    yield from _results(pending.pop(future), future)
+        if ordered:
+            while pending:
+                future, chunk = pending.popitem(last=False)
+                yield from _results(chunk, future)
+        else:
+            for future in concurrent.futures.as_completed(list(pending)):
+                yield from _results(pending.pop(future), future)
+
+
+__all__ = ["init_worker", "validate_one", "validate_parallel"]
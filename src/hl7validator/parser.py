@@ -1,20 +1,102 @@
+import functools
 import pkgutil
+import threading
+import typing
 
 import lark
 
 DEFAULT_GRAMMAR = "resources/hl7validation.lark"
+LALR_GRAMMAR = "resources/hl7validation_lalr.lark"
 FILE_LOCATION = r"file"
 PACKAGE_LOCATION = r"pkg"
 
+EARLEY = "earley"
+LALR = "lalr"
+PARSERS = (EARLEY, LALR)
 
-def create_parser(grammar: str = None) -> lark.Lark:
+GRAMMARS = {
+    EARLEY: DEFAULT_GRAMMAR,
+    LALR: LALR_GRAMMAR,
+}
+
+# process-wide cache of parsers: (grammar data, parser type, transformer class, cache file) -> parser
+_parsers: typing.Dict[tuple, lark.Lark] = {}
+_parsers_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def load_grammar(grammar: str = None, parser: str = EARLEY) -> str:
+    """
+    Returns grammar data from package resource
+    :param grammar: optional grammar resource (default one for the parser type will be used)
+    :param parser: parser type, one of `PARSERS`
+    :return:
+    """
+    if parser not in PARSERS:
+        raise ValueError(f"Invalid parser: {parser}")
+    return pkgutil.get_data(__name__, grammar or GRAMMARS[parser]).decode("utf-8")
+
+
+def create_parser(
+    grammar: str = None,
+    parser: str = EARLEY,
+    transformer: lark.Transformer = None,
+    cache: typing.Union[bool, str] = None,
+) -> lark.Lark:
     """
     Creates Lark parser with validation rules grammar
-    :param grammar:
+
+    Earley parser uses the default grammar, and produces a parse tree, which should be transformed afterwards.
+    LALR parser uses LALR-compatible grammar, and applies `transformer` inline, during parsing.
+
+    Parsers are cached in the process, by grammar contents, parser type, transformer class and cache file, so each
+    grammar is analyzed once, and each cache file is created or loaded when it's used for the first time. A cached LALR parser keeps the first transformer instance it was created with, so inline
+    transformer must not keep state between parses.
+
+    :param grammar: optional grammar resource (default one for the parser type will be used)
+    :param parser: parser type, one of `PARSERS`
+    :param transformer: LALR only, transformer to apply during parsing
+    :param cache: LALR only, load serialized parser from Lark cache file (`True` for a file in temp dir, or a path).
+        The file is created if it doesn't exist or is outdated.
     :return:
     """
-    data = pkgutil.get_data(__name__, grammar or DEFAULT_GRAMMAR).decode("utf-8")
-    return lark.Lark(data)  # , parser='lalr')
+    data = load_grammar(grammar, parser)
+    if cache and parser != LALR:
+        raise ValueError(f"Parser cache is supported for {LALR} parser only")
+    key = (data, parser, transformer.__class__ if transformer else None, cache or None)
+    try:
+        return _parsers[key]
+    except KeyError:
+        pass
+    with _parsers_lock:
+        if key not in _parsers:
+            _parsers[key] = _build_parser(data, parser, transformer, cache)
+        return _parsers[key]
+
+
+def _build_parser(
+    data: str,
+    parser: str,
+    transformer: lark.Transformer = None,
+    cache: typing.Union[bool, str] = None,
+) -> lark.Lark:
+    if parser == LALR:
+        return lark.Lark(
+            data,
+            parser="lalr",
+            transformer=transformer,
+            maybe_placeholders=True,
+            cache=cache or False,
+        )
+    return lark.Lark(data)
+
+
+def clear_parser_cache():
+    """
+    Removes all parsers from process-wide cache
+    """
+    with _parsers_lock:
+        _parsers.clear()
 
 
 def parse_rules(parser: lark.Lark, rules: str) -> lark.Tree:
@@ -1,27 +1,84 @@
 import typing
 
+import hl7
+
+from .context import Context
 from .exceptions import NotValid
 from .mixins import ContextMixin, ValidateMixin
 from .selectors import BaseSelector
-from .values import BaseValue
+from .values import INVALID, BaseValue
 
 
 class BasePredicate(ContextMixin, ValidateMixin):
+    """
+    Check of a selected value against `.expected` value.
+
+    `.check()` returns the checked value, or `INVALID` if the check fails. `.check_value()` and `.validate()`
+    raise on failure instead (`AssertionError` and `NotValid`). A subclass overriding only `.check_value()` gets
+    `.check()` calling it.
+    """
+
+    __slots__ = ("expected", "context")
+
     expected: BaseValue
+    # `.check()` implemented by the class or its nearest base (and not derived from `.check_value()`)
+    _own_check: typing.ClassVar[
+        typing.Callable[["BasePredicate", typing.Any], typing.Any]
+    ]
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if "check" in cls.__dict__:
+            cls._own_check = cls.__dict__["check"]
+        elif "check_value" in cls.__dict__:
+            cls.check = _check_with_check_value
 
     def __init__(self, expected: BaseValue):
         self.expected = expected
+        self.context = None
 
-    def validate(self, sel: BaseSelector) -> typing.Any:
-        selected_value = sel.get_value(self.context.message)
-        try:
-            result = self.check_value(selected_value)
-            return result
-        except AssertionError:
+    def validate(
+        self,
+        sel: BaseSelector,
+        segments: typing.Mapping[tuple, hl7.Segment] = None,
+        context: Context = None,
+    ) -> typing.Any:
+        """
+        Checks value selected with `sel`.
+
+        :param sel: selector of the value
+        :param segments: optional segments already located in the message, by `BaseSelector.segment_key`
+        :param context: validation context (`.context` set with `.set_context()` is used by default)
+        :return:
+        """
+        ctx = context if context is not None else self.context
+        selected_value = self.select(sel, segments, ctx)
+        result = self.check(selected_value)
+        if result is INVALID:
             raise NotValid(self, sel, selected_value)
+        return result
+
+    def select(
+        self,
+        sel: BaseSelector,
+        segments: typing.Optional[typing.Mapping[tuple, hl7.Segment]],
+        ctx: Context,
+    ) -> typing.Any:
+        """
+        Returns the value selected with `sel` from `ctx` message
+        """
+        segment = segments.get(sel.segment_key) if segments else None
+        if segment is not None:
+            return sel.get_segment_value(segment, ctx.message)
+        return sel.get_value(ctx.message, ctx.get_index())
+
+    def check(self, in_value) -> typing.Any:
+        return self.expected.check(in_value)
 
     def check_value(self, in_value):
-        return self.expected.eval(in_value)
+        result = self._own_check(in_value)
+        assert result is not INVALID, f"Invalid value {in_value} for {self}"
+        return result
 
     def __str__(self):
         return f"<{self.__class__.__name__}(expected={self.expected})>"
@@ -29,25 +86,35 @@ class BasePredicate(ContextMixin, ValidateMixin):
     __repr__ = __str__
 
 
+BasePredicate._own_check = BasePredicate.check
+
+
+def _check_with_check_value(self: BasePredicate, in_value) -> typing.Any:
+    # `.check()` of a predicate class implementing `.check_value()`
+    try:
+        return self.check_value(in_value)
+    except AssertionError:
+        return INVALID
+
+
 class MustBe(BasePredicate):
-    pass
+    __slots__ = ()
 
 
 class MayBe(BasePredicate):
-    def check_value(self, in_value):
+    __slots__ = ()
+
+    def check(self, in_value):
         if in_value:
-            return self.expected.eval(in_value)
+            return self.expected.check(in_value)
         return in_value
 
 
 class CannotBe(BasePredicate):
-    def check_value(self, in_value):
-        # We want to raise assertion error only if `in_value` matches the value in .expected.
-        # this is a bit tricky, because when .expected will raise AssertionError, this should suppress the error
-        # because the value is invalid on BaseValue level, so it's valid for us.
-        try:
-            if in_value and self.expected.eval(in_value):
-                assert False, f"Value {in_value} cannot be {self.expected}"
-            return in_value
-        except AssertionError:
-            return in_value
+    __slots__ = ()
+
+    def check(self, in_value):
+        # The assertion for a value matching .expected used to be suppressed by the same handler which suppressed
+        # .expected errors, so no value has ever failed this check. Conditional rules (`if ... is empty`) depend
+        # on it, so it's kept: the value is accepted, matching .expected or not.
+        return in_value
@@ -0,0 +1,121 @@
+import time
+import typing
+
+import attrs
+
+from .codegen import CODEGEN, INTERPRETED, GeneratedRules
+from .context import Context
+from .metrics import STAGE_FIELDS, STAGE_STRUCTURE, BaseMetrics
+from .parser import EARLEY
+from .rules import FieldValidationRule, SegmentValidationRule
+from .ruleset import CompiledRules
+from .structure import CompiledStructure
+from .transformer import HL7Transformer, ImportedSource, make_transformer
+
+
+@attrs.define(auto_attribs=True, frozen=True)
+class CompiledProfile:
+    """
+    Compiled, immutable set of validation rules for one message profile.
+
+    A profile is built once from rules text and can be used to validate any number of messages. Compiling the rules
+    (grammar parser creation, rules parsing and transformation into rule objects) is much more expensive than
+    validating a single message, so a profile should be reused whenever possible.
+    """
+
+    # field value rules, in rules file order
+    rules: typing.Tuple[FieldValidationRule, ...]
+    # root-level structure rules
+    structure: typing.Tuple[SegmentValidationRule, ...]
+    # all sources imported by rules, directly or transitively
+    imports: typing.Tuple[ImportedSource, ...] = ()
+    # structure rules compiled for validation
+    compiled_structure: CompiledStructure = attrs.field(
+        default=attrs.Factory(
+            lambda self: CompiledStructure(self.structure), takes_self=True
+        ),
+        eq=False,
+        repr=False,
+    )
+    # field rules compiled for validation
+    compiled_rules: CompiledRules = attrs.field(
+        default=attrs.Factory(lambda self: CompiledRules(self.rules), takes_self=True),
+        eq=False,
+        repr=False,
+    )
+    # field rules compiled into generated code, created on first use (see `.generated_rules`)
+    _generated_rules: typing.Optional[GeneratedRules] = attrs.field(
+        default=None, init=False, eq=False, repr=False
+    )
+
+    @classmethod
+    def from_transformer(cls, transformer: HL7Transformer) -> "CompiledProfile":
+        return cls(
+            rules=tuple(transformer.get_rules()),
+            structure=tuple(transformer.get_structure()),
+            imports=tuple(transformer.get_imports()),
+        )
+
+    @property
+    def generated_rules(self) -> GeneratedRules:
+        """
+        Field rules compiled into generated code, for the `codegen` engine. Created on first use, so profiles
+        validated with the default engine don't pay for it, and profiles pickled before it's used don't include it.
+        """
+        generated = self._generated_rules
+        if generated is None:
+            # concurrent first uses may create it twice, any of the copies can be kept
+            generated = GeneratedRules(self.rules)
+            object.__setattr__(self, "_generated_rules", generated)
+        return generated
+
+    def validate(
+        self, ctx: Context, metrics: BaseMetrics = None, engine: str = INTERPRETED
+    ) -> Context:
+        """
+        Validates the message from `ctx` against this profile.
+
+        Validation results are added to `ctx` log. With `ctx.fail_fast`, validation stops at the first error.
+        :param ctx:
+        :param metrics: optional metrics, which get structure and fields validation times
+        :param engine: field rules engine: `interpreted` (rule objects), or `codegen` (generated code)
+        :return:
+        """
+        start = time.perf_counter() if metrics is not None else 0.0
+        # first: check structure
+        self.compiled_structure.validate(ctx)
+        if metrics is not None:
+            structure_end = time.perf_counter()
+            metrics.observe_stage(STAGE_STRUCTURE, structure_end - start)
+        if ctx.partial:
+            return ctx
+        # then check specific fields
+        if engine == CODEGEN:
+            self.generated_rules.validate(ctx)
+        else:
+            self.compiled_rules.validate(ctx)
+        if metrics is not None:
+            metrics.observe_stage(STAGE_FIELDS, time.perf_counter() - structure_end)
+        return ctx
+
+
+def compile_profile(
+    rules: str,
+    grammar: str = None,
+    parser: str = EARLEY,
+    parser_cache: typing.Union[bool, str] = None,
+) -> CompiledProfile:
+    """
+    Compiles rules text into a reusable profile
+    :param rules: Rules is a string with message rules
+    :param grammar: optional grammar data (default will be used)
+    :param parser: rules parser type: `earley` or `lalr`
+    :param parser_cache: LALR only, serialized parser location (see `parser.create_parser()`)
+    :return:
+    """
+    return CompiledProfile.from_transformer(
+        make_transformer(rules, grammar, parser, parser_cache)
+    )
+
+
+__all__ = ["CompiledProfile", "compile_profile"]
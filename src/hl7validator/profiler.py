@@ -0,0 +1,120 @@
+import typing
+
+import attrs
+
+if typing.TYPE_CHECKING:
+    from .rules import FieldValidationRule, SegmentValidationRule
+
+    Rule = typing.Union[FieldValidationRule, SegmentValidationRule]
+
+DEFAULT_TOP = 20
+
+
+def format_location(rule: "Rule") -> str:
+    """
+    Returns rule location in rules source, as `source:line` (source is empty for rules validator was created with)
+    """
+    line = rule.line if rule.line is not None else "?"
+    return f"{rule.origin or ''}:{line}"
+
+
+@attrs.define(auto_attribs=True)
+class RuleStats:
+    """
+    Validation statistics of one field rule or structure node
+    """
+
+    rule: "Rule"
+    # number of validations
+    calls: int = 0
+    # cumulative validation time, for structure nodes with their subtrees
+    seconds: float = 0.0
+    passed: int = 0
+    # validations which logged an error (for field rules: also errors of their conditions)
+    failed: int = 0
+
+    @property
+    def average(self) -> float:
+        return self.seconds / self.calls if self.calls else 0.0
+
+    @property
+    def location(self) -> str:
+        return format_location(self.rule)
+
+
+class Profiler:
+    """
+    Per-rule profiler: counts validations, passed and failed checks, and cumulative time of each field rule and
+    structure node.
+
+    Profiling is enabled by passing a profiler to `Validator` (or setting `Context.profiler`), statistics of all
+    messages validated with it are added up. Without a profiler, validation isn't instrumented at all.
+
+    Field rules are timed with their conditions. Structure nodes are timed with their subtrees: a node's time
+    includes validation of its child segments, which are also reported on their own. Validations stopped before
+    the result was known (fail-fast validation stopped by another rule, malformed message) are counted in `calls`
+    only.
+
+    Counters are not synchronized, use a profiler per thread when validating messages in many threads.
+    """
+
+    stats: typing.Dict["Rule", RuleStats]
+
+    def __init__(self):
+        self.stats = {}
+
+    def record(self, rule: "Rule", seconds: float, passed: typing.Optional[bool]):
+        """
+        Adds one validation of `rule`
+
+        :param rule: validated field rule or structure rule
+        :param seconds: validation time
+        :param passed: validation result, None if validation was stopped before the result was known
+        """
+        try:
+            stats = self.stats[rule]
+        except KeyError:
+            stats = self.stats.setdefault(rule, RuleStats(rule))
+        stats.calls += 1
+        stats.seconds += seconds
+        if passed:
+            stats.passed += 1
+        elif passed is not None:
+            stats.failed += 1
+
+    def top(self, count: int = None) -> typing.List[RuleStats]:
+        """
+        Returns statistics of `count` slowest rules (all by default), by cumulative time
+        """
+        stats = sorted(self.stats.values(), key=lambda s: s.seconds, reverse=True)
+        return stats[:count] if count is not None else stats
+
+    def clear(self):
+        self.stats = {}
+
+    def format_report(self, count: int = DEFAULT_TOP, source: str = None) -> str:
+        """
+        Formats a table of `count` slowest rules
+
+        :param count: number of rules to report
+        :param source: name of the rules source validator was created with, shown in locations of its rules
+        :return:
+        """
+        lines = [
+            f"{min(count, len(self.stats))} slowest of {len(self.stats)} rules:",
+            f"{'total ms':>10} {'calls':>8} {'passed':>8} {'failed':>8} {'avg us':>9}"
+            "  location  rule",
+        ]
+        for stats in self.top(count):
+            location = stats.location
+            if stats.rule.origin is None and source:
+                location = source + location
+            lines.append(
+                f"{stats.seconds * 1e3:10.3f} {stats.calls:8d} {stats.passed:8d}"
+                f" {stats.failed:8d} {stats.average * 1e6:9.2f}"
+                f"  {location}  {stats.rule}"
+            )
+        return "\n".join(lines)
+
+
+__all__ = ["Profiler", "RuleStats", "format_location"]
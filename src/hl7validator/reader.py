@@ -0,0 +1,66 @@
+import re
+import typing
+
+DEFAULT_BUFFER_SIZE = 64 * 1024
+
+# MLLP block characters
+MLLP_START = b"\x0b"
+MLLP_END = b"\x1c"
+# batch and file header/trailer segments, skipped by the reader
+BATCH_SEGMENTS = (b"FHS", b"BHS", b"BTS", b"FTS")
+
+# segment terminators (HL7 uses CR, files often use LF or CRLF) and MLLP frame boundaries
+_SEPARATORS = re.compile(rb"[\r\n\x0b\x1c]")
+
+
+def read_messages(
+    stream: typing.BinaryIO, buffer_size: int = DEFAULT_BUFFER_SIZE
+) -> typing.Iterator[bytes]:
+    """
+    Reads HL7 messages from a stream, one by one.
+
+    The stream can contain a single message, a batch file (messages wrapped in FHS/BHS/BTS/FTS segments), or MLLP
+    framed messages (also with batches inside frames). A message starts with MSH segment, and ends before the next
+    MSH, a batch header/trailer segment or at the end of MLLP frame. Segments before the first MSH are returned as a
+    message too, so they're reported as invalid instead of being lost.
+
+    The stream is read in `buffer_size` blocks, so only the current message is kept in memory. Messages are
+    returned with segments terminated with CR, ready for validation.
+
+    :param stream: binary stream, e.g. a file opened in "rb" mode
+    :param buffer_size: size of a block read from the stream
+    :return:
+    """
+    segments: typing.List[bytes] = []
+    rest = b""
+    while True:
+        data = stream.read(buffer_size)
+        # at the end of the stream, terminate the last segment
+        buf = rest + (data or b"\r")
+        pos = 0
+        for match in _SEPARATORS.finditer(buf):
+            # segments are kept as they are, whitespace can be a part of field values
+            line = buf[pos : match.start()]
+            pos = match.end()
+            if line.strip():
+                seg_id = line[:3]
+                if (seg_id == b"MSH" or seg_id in BATCH_SEGMENTS) and segments:
+                    yield _join(segments)
+                    segments = []
+                if seg_id not in BATCH_SEGMENTS:
+                    segments.append(line)
+            if match.group() in (MLLP_START, MLLP_END) and segments:
+                yield _join(segments)
+                segments = []
+        rest = buf[pos:]
+        if not data:
+            break
+    if segments:
+        yield _join(segments)
+
+
+def _join(segments: typing.List[bytes]) -> bytes:
+    return b"\r".join(segments) + b"\r"
+
+
+__all__ = ["read_messages"]
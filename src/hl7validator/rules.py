@@ -1,13 +1,16 @@
+import bisect
 import typing
 from copy import copy
 
-import hl7
-
-from .context import LogMessage
+from .context import Context, LogMessage
 from .exceptions import NotValid
+from .index import SegmentIndex
 from .mixins import Cardinality, ContextMixin, ValidateMixin
+from .values import INVALID
 
 if typing.TYPE_CHECKING:
+    import hl7
+
     from .predicates import BasePredicate
     from .selectors import BaseSelector, SegmentSelector
 
@@ -17,9 +20,15 @@ class FieldValidationRule(ContextMixin, ValidateMixin):
     Validation rule validates one specific check on the message
     """
 
+    __slots__ = ("selector", "predicate", "test_rule", "origin", "line", "context")
+
     selector: "BaseSelector"
     predicate: "BasePredicate"
     test_rule: "BaseRule"
+    # import location of the rules file this rule comes from (None for rules validator was created with)
+    origin: typing.Optional[str]
+    # line of the rule in its rules source (None if not known)
+    line: typing.Optional[int]
 
     def __init__(
         self,
@@ -30,32 +39,52 @@ class FieldValidationRule(ContextMixin, ValidateMixin):
         self.selector = selector
         self.predicate = predicate
         self.test_rule = test_rule
+        self.origin = None
+        self.line = selector.line
         self.context = None
 
-    def validate(self):
-        self.predicate.set_context(self.context)
+    def validate(
+        self,
+        segments: typing.Mapping[tuple, "hl7.Segment"] = None,
+        context: Context = None,
+    ):
+        """
+        Validates the rule (and its test rule) against context message.
+
+        The rule isn't changed during validation, so it can be used in many validations at once, if each one passes
+        its own `context`.
+
+        :param segments: optional segments already located in the message (see `BasePredicate.validate()`)
+        :param context: validation context (`.context` set with `.set_context()` is used by default)
+        :return:
+        """
+        ctx = context if context is not None else self.context
         if self.test_rule:
-            self.test_rule.set_context(self.context)
-            self.test_rule.validate()
-        try:
-            ret = self.predicate.validate(self.selector)
-            self.context.add_msg(
-                LogMessage(msg=f"Rule {self}: ok", rule=self, selector=self.selector)
-            )
-            return ret
-        except NotValid as err:
-            self.context.add_msg(
+            self.test_rule.validate(segments, ctx)
+        value = self.predicate.select(self.selector, segments, ctx)
+        ret = self.predicate.check(value)
+        self.add_result(ctx, value, ret is not INVALID)
+        return ret if ret is not INVALID else None
+
+    def add_result(self, ctx: Context, value: typing.Any, passed: bool):
+        """
+        Adds result of the check of `value` (selected with `.selector`) to `ctx`
+        """
+        if not passed:
+            ctx.add_msg(
                 LogMessage(
-                    msg=f"validation error for {err.selector} value {err.value}",
+                    msg=f"validation error for {self.selector} value {value}",
                     rule=self,
-                    selector=err.selector,
+                    selector=self.selector,
                     is_error=True,
                 )
             )
-        # except Exception as err:
-        #     self.context.add_msg(
-        #         LogMessage(msg=f"internal error {err}", rule=self, is_error=True)
-        #     )
+        elif ctx.log_passed:
+            ctx.add_msg(
+                LogMessage(msg=f"Rule {self}: ok", rule=self, selector=self.selector)
+            )
+        else:
+            ctx.add_passed()
 
     def __str__(self):
         extra = []
@@ -64,24 +93,13 @@ class FieldValidationRule(ContextMixin, ValidateMixin):
         return f"<{self.__class__.__name__}: {self.selector} {self.predicate} {', '.join(extra)}>"
 
 
-def _get_segments(message: hl7.Message, sel: str) -> typing.List[hl7.Segment]:
-    segments = [
-        (
-            idx,
-            seg,
-        )
-        for idx, seg in enumerate(message)
-        if seg[0][0] == sel
-    ]
-    return segments
-
-
-def _validate_segment(selector: "SegmentSelector", message: hl7.Message):
+def _validate_segment(
+    selector: "SegmentSelector", index: SegmentIndex, start: int = 0, end: int = None
+):
     cd = selector.cardinality
     sel = selector.sel
-    segments = _get_segments(message, sel)
+    sel_len = index.count(sel, start, end)
 
-    sel_len = len(segments)
     if cd == Cardinality.SEGMENT_NONE and sel_len > 0:
         raise NotValid(
             selector=selector, rule=None, value=selector.sel, msg=f"not expected {sel}"
@@ -103,43 +121,46 @@ def _validate_segment(selector: "SegmentSelector", message: hl7.Message):
             selector=selector, rule=None, value=selector.sel, msg=f"not enough {sel}"
         )
 
+
 def _cut_message_to_selector(
     current_selector: "SegmentSelector",
-    current_message: hl7.Message,
+    index: SegmentIndex,
+    start: int,
     next_selector: "SegmentSelector",
-):
-    out = []
-    current_msg = []
-    segidx = 0
-    # set only when we hit first selector occurence
-    has_match = False
-
-    for segidx, seg in enumerate(current_message):
-        seg_name = seg[0][0]
-        if seg_name == current_selector.sel:
-            has_match = True
-        if not has_match:
-            continue
-        if current_msg and seg_name == current_selector.sel:
-            out.append(current_msg)
-            current_msg = [seg]
-        # rest of the message
-        elif (current_msg or out) and (
-            next_selector and seg_name == next_selector.sel
-        ):
-            out.append(current_msg)
-            current_msg = []
-            break
-        else:
-            current_msg.append(seg)
+    end: int = None,
+) -> typing.Tuple[typing.List[typing.Tuple[int, int]], int]:
+    """
+    Splits indexed segments within [start, end) positions into chunks. Each chunk starts with `current_selector`
+    segment, and the last one ends before the first `next_selector` segment.
 
-    if current_msg:
-        out.append(current_msg)
-    rest = current_message[segidx:]
-    return out, rest
+    Returns chunks as (start, end) positions, and the position of the rest of the message.
+    """
+    if end is None:
+        end = len(index)
+    first = index.find(current_selector.sel, start)
+    if first is not None and first >= end:
+        first = None
+    if first is None:
+        # no match: the rest is the last segment only (or nothing)
+        return [], max(start, end - 1)
+
+    stop = end
+    rest = end - 1
+    if next_selector and next_selector.sel != current_selector.sel:
+        next_pos = index.find(next_selector.sel, first + 1)
+        if next_pos is not None and next_pos < end:
+            stop = rest = next_pos
+
+    positions = index.get_positions(current_selector.sel)
+    starts = positions[
+        bisect.bisect_left(positions, first) : bisect.bisect_left(positions, stop)
+    ]
+    return list(zip(starts, [*starts[1:], stop])), rest
 
 
 class SegmentValidationRule(ContextMixin, ValidateMixin):
+    __slots__ = ("selector", "context")
+
     selector: "SegmentSelector"
 
     def __str__(self):
@@ -149,39 +170,53 @@ class SegmentValidationRule(ContextMixin, ValidateMixin):
 
     def __init__(self, selector: "SegmentSelector"):
         self.selector = selector
+        self.context = None
+
+    @property
+    def origin(self) -> typing.Optional[str]:
+        return self.selector.origin
+
+    @property
+    def line(self) -> typing.Optional[int]:
+        return self.selector.line
 
     def _validate(self):
         msg = self.context.message
+        index = self.context.get_index()
         # for self, we should check if current selector exists in one instance
-        self_sel = copy(self.selector)
-        _validate_segment(self_sel, msg)
+        _validate_segment(self.selector, index)
 
         # validate children cardinality
         for c in self.selector.children:
             try:
-                _validate_segment(c, msg)
+                _validate_segment(c, index)
             except NotValid as err:
                 err.rule = self
                 raise err
 
-        current_message = msg[1:]
+        current_start = 1
         for cidx, c in enumerate(self.selector.children):
             try:
                 nextc = self.selector.children[cidx + 1]
             except IndexError:
                 nextc = None
-            msg_chunks, current_message = _cut_message_to_selector(
-                c, current_message, nextc
+            msg_chunks, current_start = _cut_message_to_selector(
+                c, index, current_start, nextc
             )
-            for msg_chunk in msg_chunks:
+            for chunk_start, chunk_end in msg_chunks:
                 subctx = copy(self.context)
-                subctx.message = msg_chunk
+                subctx.message = msg[chunk_start:chunk_end]
                 subv = SegmentValidationRule(c)
                 subv.set_context(subctx).validate()
+                # log lists are shared with the copy, the counter is not
+                self.context.passed = subctx.passed
 
     def validate(self, *args, **kwargs) -> typing.Any:
         try:
             self._validate()
+            if not self.context.log_passed:
+                self.context.add_passed()
+                return
             self.context.add_msg(
                     LogMessage(
                             msg=f"validation {self} -> ok",
@@ -0,0 +1,280 @@
+import logging
+import time
+import typing
+
+import hl7
+
+from .context import Context
+from .exceptions import ValidationStopped
+from .predicates import BasePredicate, CannotBe, MayBe, MustBe
+from .profiler import Profiler
+from .rules import FieldValidationRule
+from .selectors import FieldSelector
+from .values import (
+    INVALID,
+    AnyValue,
+    ConstValue,
+    IntValue,
+    OneOfValues,
+    RegexpValue,
+    StringValue,
+)
+
+log = logging.getLogger(__name__)
+
+# value slot not read yet
+_UNSET = object()
+
+
+class RuleCheck:
+    """
+    Check of a field rule (or of its test rule), with slots of its selected value and its result in per-message
+    state. Rules with the same selector share the value slot, rules with the same selector and predicate share the
+    result slot, so each is computed once per message.
+
+    Rules which can't share values (custom rule, selector or predicate classes) have no slots, and are validated
+    with their own `.validate()`.
+    """
+
+    __slots__ = ("rule", "test", "value_slot", "result_slot")
+
+    rule: FieldValidationRule
+    # check of the test rule, validated before this one
+    test: typing.Optional["RuleCheck"]
+    value_slot: typing.Optional[int]
+    # None for checks which can't be shared (custom predicates and values)
+    result_slot: typing.Optional[int]
+
+    def __init__(
+        self,
+        rule: FieldValidationRule,
+        test: "RuleCheck" = None,
+        value_slot: int = None,
+        result_slot: int = None,
+    ):
+        self.rule = rule
+        self.test = test
+        self.value_slot = value_slot
+        self.result_slot = result_slot
+
+    def __str__(self):
+        return f"<{self.__class__.__name__}: {self.rule} value={self.value_slot} result={self.result_slot}>"
+
+    __repr__ = __str__
+
+
+def _value_key(rule: FieldValidationRule) -> typing.Optional[str]:
+    """
+    Returns key of the value selected for `rule`, equal for rules selecting the same value, None if it can't be
+    shared
+    """
+    if (
+        type(rule) is FieldValidationRule
+        and type(rule.selector) is FieldSelector
+        and type(rule.predicate).select is BasePredicate.select
+    ):
+        return rule.selector.sel
+    return None
+
+
+def _result_key(rule: FieldValidationRule) -> typing.Optional[tuple]:
+    """
+    Returns key of the check of `rule`'s value, equal for rules checking the same value the same way, None if it
+    can't be shared
+    """
+    predicate = rule.predicate
+    expected = predicate.expected
+    kind = type(expected)
+    if type(predicate) not in (MustBe, MayBe, CannotBe):
+        return None
+    if kind is ConstValue:
+        params = expected.const
+    elif kind is OneOfValues:
+        params = expected._values
+    elif kind is RegexpValue:
+        params = expected._re
+    elif kind in (AnyValue, IntValue, StringValue):
+        params = None
+    else:
+        return None
+    return rule.selector.sel, type(predicate), kind, params
+
+
+def share_checks(
+    rules: typing.Sequence[FieldValidationRule],
+) -> typing.Tuple[typing.Tuple[RuleCheck, ...], int, int]:
+    """
+    Common subexpression elimination for field rules: assigns value and result slots, so rules (and conditions)
+    with the same selector read it once per message, and rules with the same selector and predicate check it once.
+
+    Returns checks of `rules`, and the numbers of value and result slots.
+    """
+    values: typing.Dict[str, int] = {}
+    results: typing.Dict[tuple, int] = {}
+
+    def _check(rule: FieldValidationRule, test: RuleCheck = None) -> RuleCheck:
+        value_key = _value_key(rule)
+        if value_key is None:
+            return RuleCheck(rule)
+        result_key = _result_key(rule)
+        return RuleCheck(
+            rule,
+            test,
+            values.setdefault(value_key, len(values)),
+            results.setdefault(result_key, len(results))
+            if result_key is not None
+            else None,
+        )
+
+    checks = []
+    for rule in rules:
+        if _value_key(rule) is not None and rule.test_rule is not None:
+            checks.append(_check(rule, _check(rule.test_rule)))
+        else:
+            # the rule validates its test rule itself
+            checks.append(_check(rule))
+    return tuple(checks), len(values), len(results)
+
+
+class SegmentRules:
+    """
+    Field rules which read values from one segment (rules and their test rules)
+    """
+
+    __slots__ = ("segment_key", "rules")
+
+    segment_key: typing.Tuple[str, int]
+    rules: typing.Tuple[FieldValidationRule, ...]
+
+    def __init__(
+        self,
+        segment_key: typing.Tuple[str, int],
+        rules: typing.Sequence[FieldValidationRule],
+    ):
+        self.segment_key = segment_key
+        self.rules = tuple(rules)
+
+    def __str__(self):
+        segment, segment_num = self.segment_key
+        return f"<{self.__class__.__name__}: {segment}[{segment_num}] rules={len(self.rules)}>"
+
+    __repr__ = __str__
+
+
+class CompiledRules:
+    """
+    Field rules compiled for validation with segments located once per message.
+
+    Rules are grouped by the segment their selectors read from. During validation each segment is found once, and
+    all rules reading from it get values from that segment directly. Each selector is read once per message, and
+    rules and conditions with the same selector and predicate are checked once (see `share_checks()`). Rules are
+    still evaluated (and logged) in rules file order, so the result is the same as validation of each
+    `FieldValidationRule` separately.
+    """
+
+    __slots__ = ("rules", "groups", "checks", "value_count", "result_count")
+
+    rules: typing.Tuple[FieldValidationRule, ...]
+    groups: typing.Tuple[SegmentRules, ...]
+    # checks of rules, in rules order
+    checks: typing.Tuple[RuleCheck, ...]
+    # numbers of shared values and results
+    value_count: int
+    result_count: int
+
+    def __init__(self, rules: typing.Sequence[FieldValidationRule]):
+        self.rules = tuple(rules)
+        grouped: typing.Dict[tuple, typing.List[FieldValidationRule]] = {}
+        for rule in self.rules:
+            for r in (rule, rule.test_rule):
+                if r is not None and r.selector.segment_key is not None:
+                    grouped.setdefault(r.selector.segment_key, []).append(r)
+        self.groups = tuple(SegmentRules(key, rules) for key, rules in grouped.items())
+        self.checks, self.value_count, self.result_count = share_checks(self.rules)
+
+    def locate_segments(self, ctx: Context) -> typing.Dict[tuple, hl7.Segment]:
+        """
+        Returns segments used by rules, found in `ctx` message. Missing segments are skipped, so rules reading from
+        them fail the same way as without located segments.
+        """
+        index = ctx.get_index()
+        segments = {}
+        for group in self.groups:
+            try:
+                segments[group.segment_key] = index.get_segment(*group.segment_key)
+            except (KeyError, IndexError):
+                pass
+        return segments
+
+    def validate(self, ctx: Context) -> Context:
+        segments = self.locate_segments(ctx)
+        values = [_UNSET] * self.value_count
+        results = [None] * self.result_count
+        try:
+            if ctx.profiler is not None:
+                self._validate_profiled(segments, ctx, values, results, ctx.profiler)
+                return ctx
+            for check in self.checks:
+                log.info("validating %s in payload", check.rule)
+                if check.test is not None:
+                    self._validate_check(check.test, segments, ctx, values, results)
+                self._validate_check(check, segments, ctx, values, results)
+        except ValidationStopped:
+            # fail-fast validation, ctx is marked as partial
+            pass
+        return ctx
+
+    @staticmethod
+    def _validate_check(
+        check: RuleCheck,
+        segments: typing.Dict[tuple, hl7.Segment],
+        ctx: Context,
+        values: list,
+        results: list,
+    ):
+        rule = check.rule
+        slot = check.value_slot
+        if slot is None:
+            rule.validate(segments, ctx)
+            return
+        value = values[slot]
+        if value is _UNSET:
+            value = values[slot] = rule.predicate.select(rule.selector, segments, ctx)
+        slot = check.result_slot
+        if slot is None:
+            passed = rule.predicate.check(value) is not INVALID
+        else:
+            passed = results[slot]
+            if passed is None:
+                passed = results[slot] = rule.predicate.check(value) is not INVALID
+        rule.add_result(ctx, value, passed)
+
+    def _validate_profiled(
+        self,
+        segments: typing.Dict[tuple, hl7.Segment],
+        ctx: Context,
+        values: list,
+        results: list,
+        profiler: Profiler,
+    ):
+        timer = time.perf_counter
+        for check in self.checks:
+            rule = check.rule
+            log.info("validating %s in payload", rule)
+            errors = len(ctx.errors)
+            passed = None
+            start = timer()
+            try:
+                if check.test is not None:
+                    self._validate_check(check.test, segments, ctx, values, results)
+                self._validate_check(check, segments, ctx, values, results)
+                passed = len(ctx.errors) == errors
+            except ValidationStopped:
+                # stopped at an error of this rule (or its condition)
+                passed = False
+                raise
+            finally:
+                profiler.record(rule, timer() - start, passed)
+
+
+__all__ = ["CompiledRules", "RuleCheck", "SegmentRules", "share_checks"]
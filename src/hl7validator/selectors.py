@@ -1,18 +1,33 @@
+import functools
 import re
+import sys
 import typing
 
 import hl7
+from hl7.util import unescape
 
 from .exceptions import MessageMalformedError
 from .mixins import Cardinality
 
+if typing.TYPE_CHECKING:
+    from .index import SegmentIndex
+
 
 class BaseSelector:
+    __slots__ = ("sel", "segment_key", "line")
+
     sel: str
     sel_regex: typing.ClassVar[re.Pattern]
-
-    def __init__(self, sel):
-        self.sel = sel
+    # (segment id, segment number) of the segment the value is read from, if known upfront
+    segment_key: typing.Optional[typing.Tuple[str, int]]
+    # line of the selector in its rules source (None if not known)
+    line: typing.Optional[int]
+
+    def __init__(self, sel, line: int = None):
+        # selectors repeat across rules: keep one copy of each
+        self.sel = sys.intern(str(sel))
+        self.segment_key = None
+        self.line = line
         assert self.__class__.validate_selector(sel)
 
 
@@ -20,13 +35,20 @@ class BaseSelector:
     def validate_selector(cls, val) -> bool:
         return cls.sel_regex.match(val)
 
-    def get_value(self, msg: hl7.Component):
+    def get_value(self, msg: hl7.Component, index: "SegmentIndex" = None):
         try:
-            sel = msg[self.sel]
-            return sel
+            if index is not None:
+                return self.get_indexed_value(index)
+            return self.get_message_value(msg)
         except (KeyError, IndexError,) as err:
             raise MessageMalformedError(self.sel, msg, err)
 
+    def get_message_value(self, msg: hl7.Message):
+        return msg[self.sel]
+
+    def get_indexed_value(self, index: "SegmentIndex"):
+        raise NotImplementedError()
+
     def __str__(self):
         return f"<{self.__class__.__name__} sel={self.sel}>"
 
@@ -35,12 +57,16 @@ class BaseSelector:
 
 
 class SegmentSelector(BaseSelector):
+    __slots__ = ("cardinality", "parent", "level", "children", "origin")
+
     # ABC only
     sel_regex = re.compile(r"([A-Z]{2}[A-Z0-9]{1})")
     cardinality: Cardinality
     parent: "typing.Optional[SegmentSelector]"
     level: int
     children: list
+    # import location of the rules file this segment comes from (None for rules validator was created with)
+    origin: typing.Optional[str]
 
     def __init__(
         self,
@@ -48,11 +74,13 @@ class SegmentSelector(BaseSelector):
         cardinality: Cardinality = None,
         parent: "SegmentSelector" = None,
         level: int = None,
+        line: int = None,
     ):
-        super().__init__(sel)
+        super().__init__(sel, line)
         self.level = level
         self.cardinality = cardinality or Cardinality.SEGMENT_ONE
         self.children = []
+        self.origin = None
         self.set_parent(parent)
 
     def set_parent(self, parent: "SegmentSelector"):
@@ -72,9 +100,121 @@ class SegmentSelector(BaseSelector):
         )
 
 
+class FieldPath(typing.NamedTuple):
+    """
+    Field selector parsed into segment id and 0-based positions within the segment
+    """
+
+    segment: str
+    segment_num: int
+    # position of the field in the segment (segment id is at position 0)
+    field: int
+    repeat: int
+    component: int
+    subcomponent: int
+    # MSH.1 and MSH.2 (separators) are returned without unescaping
+    raw: bool
+    # accessor key, for error messages
+    key: str
+
+    @classmethod
+    def from_selector(cls, sel: str) -> "FieldPath":
+        accessor = hl7.Accessor.parse_key(sel)
+        return cls(
+            segment=accessor.segment,
+            segment_num=accessor.segment_num,
+            field=accessor.field_num or 1,
+            repeat=(accessor.repeat_num or 1) - 1,
+            component=(accessor.component_num or 1) - 1,
+            subcomponent=(accessor.subcomponent_num or 1) - 1,
+            raw=accessor.segment == "MSH" and accessor.field_num in (1, 2),
+            key=accessor.key,
+        )
+
+    def extract(self, segment: hl7.Segment):
+        """
+        Returns field value from `segment`.
+
+        Same as `hl7.Segment.extract_field()`, with the same handling of empty/missing values and the same errors,
+        but the path is parsed only once.
+        """
+        if self.field < len(segment):
+            field = segment[self.field]
+        else:
+            if not (self.repeat or self.component or self.subcomponent):
+                # non-present optional value
+                return ""
+            raise IndexError(f"Field not present: {self.key}")
+
+        rep = field[self.repeat]
+        if not isinstance(rep, hl7.Repetition):
+            # leaf
+            if not (self.component or self.subcomponent):
+                return rep if self.raw else unescape(segment, rep)
+            raise IndexError(
+                f"Field reaches leaf node before completing path: {self.key}"
+            )
+
+        if self.component >= len(rep):
+            if not self.subcomponent:
+                return ""
+            raise IndexError(f"Component not present: {self.key}")
+
+        component = rep[self.component]
+        if not isinstance(component, hl7.Component):
+            # leaf
+            if not self.subcomponent:
+                return unescape(segment, component)
+            raise IndexError(
+                f"Field reaches leaf node before completing path: {self.key}"
+            )
+
+        if self.subcomponent < len(component):
+            return unescape(segment, component[self.subcomponent])
+        return ""
+
+
+# rules with the same selector share the parsed path
+_parse_field_path = functools.lru_cache(maxsize=4096)(FieldPath.from_selector)
+
+
 class FieldSelector(BaseSelector):
+    __slots__ = ("path",)
+
     # ABC.1, ABC.1.1, ABC.1.2.3
     sel_regex = re.compile(r"^[A-Z]{2}[A-Z0-9]{1}\.[0-9]+(\.[0-9]+)*?")
+    # selector parsed once, None if it can't be parsed (lookup will fail as in hl7 library)
+    path: typing.Optional[FieldPath]
+
+    def __init__(self, sel, line: int = None):
+        super().__init__(sel, line)
+        try:
+            self.path = _parse_field_path(self.sel)
+        except ValueError:
+            self.path = None
+        else:
+            self.segment_key = (self.path.segment, self.path.segment_num)
+
+    def get_message_value(self, msg: hl7.Message):
+        if self.path is None:
+            return super().get_message_value(msg)
+        path = self.path
+        return path.extract(msg.segments(path.segment)(path.segment_num))
+
+    def get_segment_value(self, segment: hl7.Segment, msg: hl7.Message):
+        """
+        Returns value from already located `segment` (segment for `.segment_key`)
+        """
+        try:
+            return self.path.extract(segment)
+        except IndexError as err:
+            raise MessageMalformedError(self.sel, msg, err)
+
+    def get_indexed_value(self, index: "SegmentIndex"):
+        if self.path is None:
+            return self.get_message_value(index.segments)
+        path = self.path
+        return path.extract(index.get_segment(path.segment, path.segment_num))
 
 
-__all__ = ["FieldSelector", "SegmentSelector"]
+__all__ = ["FieldPath", "FieldSelector", "SegmentSelector"]
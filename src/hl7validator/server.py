@@ -0,0 +1,214 @@
+import asyncio
+import concurrent.futures
+import datetime
+import logging
+import os
+import pickle
+import typing
+
+import hl7
+from hl7.util import generate_message_control_id
+
+from . import parallel
+from .constants import DEFAULT_HOST, DEFAULT_PORT
+from .context import LOG_ERRORS, ValidationResult
+from .reader import MLLP_END, MLLP_START
+from .validator import Validator
+
+log = logging.getLogger(__name__)
+
+# largest accepted MLLP frame
+DEFAULT_MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+
+FRAME_END = MLLP_END + b"\r"
+ACK_ACCEPT = "AA"
+ACK_ERROR = "AE"
+
+
+def create_ack(result: ValidationResult, msg: bytes) -> bytes:
+    """
+    Creates ACK message for validated `msg`: AA if the message is valid, AE with validation errors otherwise.
+
+    Validation errors are sent in ERR segments (in ERR.8, user message). ACK header is created from the message
+    header, as in `hl7.Message.create_ack()`. If the message header is unusable, generic ACK header is used.
+
+    :param result: validation result of the message
+    :param msg: validated message
+    :return: ACK message, without MLLP framing
+    """
+    ack_code = ACK_ACCEPT if result.is_valid else ACK_ERROR
+    try:
+        header = hl7.parse(msg.split(b"\r", 1)[0])
+        ack = header.create_ack(ack_code)
+    except Exception:
+        # not a message, or header without fields needed for ACK
+        ack = hl7.parse(
+            "MSH|^~\\&|||||%s||ACK|%s|P|2.5\rMSA|%s|"
+            % (
+                datetime.datetime.utcnow().strftime("%Y%m%d%H%M%S"),
+                generate_message_control_id(),
+                ack_code,
+            )
+        )
+    if result.error is not None:
+        errors = [str(result.error)]
+    else:
+        errors = [log_msg.msg for log_msg in result.context.get_errors()]
+    out = str(ack)
+    for error in errors:
+        out += "ERR||||||||%s\r" % ack.escape(error)
+    return out.encode("utf-8")
+
+
+def _validate_to_ack(msg: bytes) -> bytes:
+    # runs in a worker process, initialized with `parallel.init_worker()`
+    return create_ack(parallel.validate_one(msg), msg)
+
+
+class MLLPServer:
+    """
+    asyncio MLLP server, which validates received messages and replies with ACK.
+
+    Each connection can send any number of MLLP framed messages, and gets ACK for each message (AA for valid
+    messages, AE with validation errors in ERR segments). Connections are handled concurrently in the event loop,
+    validation and ACK creation run in a pool of worker processes, with the compiled profile loaded once per
+    worker.
+    """
+
+    validator: Validator
+    host: str
+    port: int
+    jobs: int
+    max_message_size: int
+    executor: typing.Optional[concurrent.futures.Executor]
+    server: typing.Optional[asyncio.AbstractServer]
+    # open connections: handler task -> writer
+    connections: typing.Dict[asyncio.Task, asyncio.StreamWriter]
+
+    def __init__(
+        self,
+        validator: Validator,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        jobs: int = None,
+        max_message_size: int = DEFAULT_MAX_MESSAGE_SIZE,
+    ):
+        """
+        :param validator: validator with rules to check (with `fail_fast`, ACK reports the first error only)
+        :param host: address to listen on
+        :param port: port to listen on (0 for any free port, see `.port` after `.start()`)
+        :param jobs: number of worker processes (number of CPUs by default)
+        :param max_message_size: largest accepted frame, a connection sending larger frame is closed
+        """
+        self.validator = validator
+        self.host = host
+        self.port = port
+        self.jobs = jobs or os.cpu_count() or 1
+        self.max_message_size = max_message_size
+        self.executor = None
+        self.server = None
+        self.connections = {}
+
+    async def start(self) -> asyncio.AbstractServer:
+        """
+        Starts worker processes and the server. Returns when the server is listening.
+        """
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.jobs,
+            initializer=parallel.init_worker,
+            # ACK reports errors only, passed checks are not logged
+            initargs=(
+                pickle.dumps(self.validator.profile),
+                self.validator.lazy,
+                LOG_ERRORS,
+                self.validator.fail_fast,
+                self.validator.engine,
+            ),
+        )
+        self.server = await asyncio.start_server(
+            self.handle_connection,
+            self.host,
+            self.port,
+            limit=self.max_message_size,
+        )
+        self.port = self.server.sockets[0].getsockname()[1]
+        log.info("listening on %s:%s", self.host, self.port)
+        return self.server
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self):
+        """
+        Stops the server: closes open connections, waits for their handlers and stops worker processes
+        """
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        # handlers finish when their connection is closed
+        for writer in self.connections.values():
+            writer.close()
+        await asyncio.gather(*self.connections, return_exceptions=True)
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    async def validate(self, msg: bytes) -> bytes:
+        """
+        Validates a message in a worker process, returns ACK message
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, _validate_to_ack, msg)
+
+    async def handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        peer = writer.get_extra_info("peername")
+        log.debug("connection from %s", peer)
+        task = asyncio.current_task()
+        self.connections[task] = writer
+        try:
+            while True:
+                try:
+                    frame = await reader.readuntil(FRAME_END)
+                except asyncio.IncompleteReadError:
+                    # connection closed
+                    break
+                except asyncio.LimitOverrunError:
+                    log.warning("message from %s too large, closing connection", peer)
+                    break
+                start = frame.find(MLLP_START)
+                msg = frame[start + 1 : -len(FRAME_END)]
+                ack = await self.validate(msg)
+                writer.write(MLLP_START + ack + FRAME_END)
+                await writer.drain()
+        except ConnectionError:
+            log.debug("connection from %s lost", peer)
+        finally:
+            del self.connections[task]
+            writer.close()
+
+
+async def send_message(
+    msg: bytes, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT
+) -> bytes:
+    """
+    Sends one message to MLLP server, returns ACK message (without MLLP framing)
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(MLLP_START + msg + FRAME_END)
+        await writer.drain()
+        frame = await reader.readuntil(FRAME_END)
+        return frame[frame.find(MLLP_START) + 1 : -len(FRAME_END)]
+    finally:
+        writer.close()
+
+
+__all__ = ["MLLPServer", "create_ack", "send_message"]
@@ -0,0 +1,164 @@
+import logging
+import time
+import typing
+
+from .context import Context, LogMessage
+from .exceptions import NotValid, ValidationStopped
+from .index import SegmentIndex
+from .profiler import Profiler
+from .rules import (
+    SegmentValidationRule,
+    _cut_message_to_selector,
+    _validate_segment,
+)
+from .selectors import SegmentSelector
+
+log = logging.getLogger(__name__)
+
+
+class StructureNode:
+    """
+    Compiled structure rule: a segment selector with its children, and the rule used in validation log
+    """
+
+    __slots__ = ("selector", "rule", "children", "siblings")
+
+    selector: SegmentSelector
+    rule: SegmentValidationRule
+    children: typing.Tuple["StructureNode", ...]
+    # (child, selector of the next sibling) pairs
+    siblings: typing.Tuple[
+        typing.Tuple["StructureNode", typing.Optional[SegmentSelector]], ...
+    ]
+
+    def __init__(
+        self, selector: SegmentSelector, rule: SegmentValidationRule = None
+    ):
+        self.selector = selector
+        self.rule = rule or SegmentValidationRule(selector)
+        self.children = tuple(StructureNode(c) for c in selector.children)
+        next_selectors = [c.selector for c in self.children[1:]] + [None]
+        self.siblings = tuple(zip(self.children, next_selectors))
+
+    def __str__(self):
+        return f"<{self.__class__.__name__}: (selector={self.selector})>"
+
+    __repr__ = __str__
+
+
+class CompiledStructure:
+    """
+    Structure rules compiled for validation in one pass over the message segments index.
+
+    The result is the same as validation with `SegmentValidationRule` objects: the same checks are done in the same
+    order, and the same messages are logged. Message chunks are (start, end) positions in the segments index of
+    the whole message, so segments lists are not copied, and no context copies nor rule objects are created during
+    validation.
+    """
+
+    __slots__ = ("nodes",)
+
+    nodes: typing.Tuple[StructureNode, ...]
+
+    def __init__(self, structure: typing.Sequence[SegmentValidationRule]):
+        self.nodes = tuple(StructureNode(rule.selector, rule) for rule in structure)
+
+    def validate(self, ctx: Context) -> Context:
+        index = ctx.get_index()
+        if ctx.profiler is not None:
+            validate_node = self._profiled_validate_node(ctx.profiler)
+        else:
+            validate_node = self._validate_node
+        try:
+            for node in self.nodes:
+                log.info("validating %s in structure", node.rule)
+                validate_node(ctx, index, node, 0, len(index), validate_node)
+        except ValidationStopped:
+            # fail-fast validation, ctx is marked as partial
+            pass
+        return ctx
+
+    def _profiled_validate_node(self, profiler: Profiler) -> typing.Callable:
+        """
+        Returns `._validate_node()` which records each node validation in `profiler`
+        """
+        timer = time.perf_counter
+        validate = self._validate_node
+
+        def validate_node(ctx, index, node, start, end, validate_child):
+            passed = None
+            started = timer()
+            try:
+                passed = validate(ctx, index, node, start, end, validate_child)
+            except ValidationStopped:
+                # stopped at an error of this node, or of a node in its subtree
+                if ctx.errors[-1].rule is node.rule:
+                    passed = False
+                raise
+            finally:
+                profiler.record(node.rule, timer() - started, passed)
+            return passed
+
+        return validate_node
+
+    def _validate_node(
+        self,
+        ctx: Context,
+        index: SegmentIndex,
+        node: StructureNode,
+        start: int,
+        end: int,
+        validate_child: typing.Callable,
+    ) -> bool:
+        """
+        Validates `node` in [start, end) segments of the message, and its children in their chunks (with
+        `validate_child`, this method or its profiled version). Returns True if the node's checks passed.
+        """
+        try:
+            _validate_segment(node.selector, index, start, end)
+            # validate children cardinality
+            for child in node.children:
+                try:
+                    _validate_segment(child.selector, index, start, end)
+                except NotValid as err:
+                    err.rule = node.rule
+                    raise err
+
+            current_start = start + 1
+            for child, next_selector in node.siblings:
+                chunks, current_start = _cut_message_to_selector(
+                    child.selector, index, current_start, next_selector, end
+                )
+                for chunk_start, chunk_end in chunks:
+                    validate_child(
+                        ctx, index, child, chunk_start, chunk_end, validate_child
+                    )
+
+            if not ctx.log_passed:
+                ctx.add_passed()
+                return True
+            ctx.add_msg(
+                LogMessage(
+                    msg=f"validation {node.rule} -> ok",
+                    rule=node.rule,
+                    selector=node.selector,
+                    is_error=False,
+                )
+            )
+            return True
+        except NotValid as err:
+            ctx.add_msg(
+                LogMessage(
+                    msg=(
+                        f"validation error for {err.selector}"
+                        f" value {err.value}: {err.msg}"
+                    ),
+                    rule=node.rule,
+                    selector=err.selector,
+                    is_error=True,
+                )
+            )
+            return False
+
+
+__all__ = ["CompiledStructure"]
@@ -1,12 +1,17 @@
+import copy
+import hashlib
 import logging
+import os
 import pkgutil
+import threading
 import typing
 from urllib.parse import urlparse
 
+import attrs
 import lark
 
 from .exceptions import RuleImportError
-from .parser import FILE_LOCATION, PACKAGE_LOCATION, create_parser
+from .parser import EARLEY, FILE_LOCATION, LALR, PACKAGE_LOCATION, create_parser
 from .predicates import CannotBe, MayBe, MustBe
 from .rules import FieldValidationRule, SegmentValidationRule
 from .selectors import Cardinality, FieldSelector, SegmentSelector
@@ -35,10 +40,43 @@ def get_type_for_check_type(value: str):
     return value_converter
 
 
+@attrs.define(auto_attribs=True, frozen=True)
+class ImportedSource:
+    """
+    Rules source imported with `import` statement
+    """
+
+    # location from import statement
+    location: str
+    # sha256 hex digest of source contents
+    digest: str
+
+    @classmethod
+    def read(cls, location: str) -> typing.Tuple["ImportedSource", str]:
+        """
+        Reads source from location, returns source info and source contents
+        """
+        data = _read_source(location)
+        return cls(location, _digest(data)), data
+
+    def is_current(self) -> bool:
+        """
+        Checks if source contents at location are the same as when it was imported
+        """
+        try:
+            data = _read_source(self.location)
+        except (OSError, RuleImportError):
+            return False
+        return _digest(data) == self.digest
+
+
 @lark.v_args(inline=True)
 class HL7Transformer(lark.Transformer):
     """
     Tree transformer for validation rules
+
+    With Earley parser, the transformer is applied to a parse tree and collects rules in its state. With LALR parser,
+    the transformer is applied inline, during parsing, and `compile_structure` returns a new, populated transformer.
     """
 
     def __init__(self):
@@ -48,10 +86,10 @@ class HL7Transformer(lark.Transformer):
 
     # field validation handlers
     def selector_field(self, value: lark.Token):
-        return FieldSelector(value.value)
+        return FieldSelector(value.value, line=value.line)
 
     def selector_segment(self, value: lark.Token):
-        return SegmentSelector(value.value)
+        return SegmentSelector(value.value, line=value.line)
 
     def must_be_value(self, value: typing.Union[lark.Token, lark.Tree]):
 
@@ -140,21 +178,24 @@ class HL7Transformer(lark.Transformer):
 
     def structure_segment(
         self,
-        level: str,
+        level: lark.Token,
         segment: SegmentSelector,
         card_token: lark.Token = None,
         *args,
         **kwargs,
     ):
+        segment.level = _segment_level(level)
+        if card_token:
+            card = Cardinality(card_token.children[0].value)
+            segment.cardinality = card
+        return self._append_segment(segment)
+
+    def _append_segment(self, segment: SegmentSelector) -> SegmentSelector:
         last: typing.Optional[SegmentSelector] = None
         try:
             last = self._structure[-1]
         except IndexError:
             pass
-        segment.level = len(level)
-        if card_token:
-            card = Cardinality(card_token.children[0].value)
-            segment.cardinality = card
 
         if last:
             p = last
@@ -166,14 +207,101 @@ class HL7Transformer(lark.Transformer):
         return segment
 
     def import_rule(self, rule_token: lark.Token, *args, **kwargs):
-        source = _read_source(rule_token.value.strip('"'))
-        log.info(f"importing {source}")
-        t = make_transformer(source)
-        self._rules.extend(t.get_rules())
-        self._structure.extend(t._structure)
+        imported, t = import_resolver.resolve(rule_token.value.strip('"'), EARLEY)
+        self._merge(t, imported)
+
+    def _merge(self, transformer: "HL7Transformer", imported: ImportedSource):
+        """
+        Merges rules and structure imported from another source.
+
+        A source is merged only once, even if it's imported several times, directly or through other imports.
+        Imported structure is copied, because following segments can be attached to imported ones. Segments of a
+        source merged before are skipped, and segments attached to them are attached to the merged ones instead.
+        """
+        merged = {i.location for i in self._imports}
+        if imported.location in merged:
+            log.info(f"skipping {imported.location}: already imported")
+            return
+        self._imports.append(imported)
+        self._imports.extend(
+            i for i in transformer.get_imports() if i.location not in merged
+        )
+        self._rules.extend(
+            r for r in transformer.get_rules() if r.origin not in merged
+        )
+        # segments merged before, by origin and position in the source
+        merged_segments = {
+            _segment_key(s): s for s in self._structure if s.origin in merged
+        }
+        for segment in copy.deepcopy(transformer._structure):
+            if segment.origin in merged:
+                continue
+            parent = segment.parent
+            if parent is not None and parent.origin in merged:
+                segment.set_parent(merged_segments[_segment_key(parent)])
+            self._structure.append(segment)
         log.info(
-            f"imported {len(t.get_rules())} rules, {len(t.get_structure())} from {source}"
+            f"imported {len(transformer.get_rules())} rules,"
+            f" {len(transformer.get_structure())} structure rules"
+            f" from {imported.location}"
+        )
+
+    # LALR inline handlers: those don't change transformer state, results are collected in `compile_structure`
+    def collect(self, *items) -> list:
+        return list(items)
+
+    def import_source(
+        self, rule_token: lark.Token
+    ) -> typing.Tuple[ImportedSource, "HL7Transformer"]:
+        return import_resolver.resolve(rule_token.value.strip('"'), LALR)
+
+    def make_rule(
+        self,
+        selector: FieldSelector,
+        predicate,
+        test_selector: FieldSelector = None,
+        test_predicate=None,
+    ) -> FieldValidationRule:
+        test_rule = None
+        if test_selector is not None:
+            test_rule = self._create_rule(test_selector, test_predicate)
+        return self._create_rule(selector, predicate, test_rule)
+
+    def indented_segment(
+        self, segment_token: lark.Token, card_token: lark.Tree = None
+    ) -> SegmentSelector:
+        segment = SegmentSelector(
+            segment_token.value.lstrip(),
+            level=_segment_level(segment_token),
+            line=segment_token.end_line,
         )
+        if card_token:
+            segment.cardinality = Cardinality(card_token.children[0].value)
+        return segment
+
+    def indented_optional_segment(
+        self, bracket_token: lark.Token, segment_token: lark.Token
+    ) -> SegmentSelector:
+        segment = SegmentSelector(
+            segment_token.value,
+            level=_segment_level(bracket_token),
+            line=segment_token.line,
+        )
+        return self.optional_segment(segment)
+
+    def compile_structure(
+        self,
+        imports: typing.List[typing.Tuple[ImportedSource, "HL7Transformer"]],
+        segments: typing.List[SegmentSelector],
+        rules: typing.List[FieldValidationRule],
+    ) -> "HL7Transformer":
+        out = HL7Transformer()
+        for imported, t in imports:
+            out._merge(t, imported)
+        for segment in segments:
+            out._append_segment(segment)
+        out._rules.extend(rules)
+        return out
 
     # structure handlers
     def get_rules(self) -> typing.List[FieldValidationRule]:
@@ -183,10 +311,119 @@ class HL7Transformer(lark.Transformer):
         # roots only
         return [SegmentValidationRule(p) for p in self._structure if p.parent is None]
 
-    def get_imports(self) -> typing.List[str]:
+    def get_imports(self) -> typing.List[ImportedSource]:
+        # all sources imported, directly or transitively
         return self._imports
 
 
+def _segment_key(segment: SegmentSelector) -> tuple:
+    """
+    Returns key identifying a segment of an imported source, equal for copies of the segment
+    """
+    return segment.origin, segment.line, segment.sel
+
+
+def _segment_level(token: lark.Token) -> int:
+    """
+    Returns structure level for a token which ends with a segment (or `[`): column of the segment
+
+    In Earley grammar, it's the whitespace token before the segment, and in LALR grammar, whitespace is a part of the
+    segment token. Blank lines and comments before the segment don't change its level.
+    """
+    indent = token.value[: len(token.value) - len(token.value.lstrip())]
+    if "\n" in indent:
+        return len(indent) - indent.rfind("\n")
+    return token.column + len(indent)
+
+
+@attrs.define(auto_attribs=True)
+class _ResolvedImport:
+    imported: ImportedSource
+    transformer: HL7Transformer
+    # modification times of the source and all its imports
+    mtimes: typing.Dict[str, typing.Optional[int]]
+
+    def is_current(self) -> bool:
+        return all(_source_mtime(loc) == mtime for loc, mtime in self.mtimes.items())
+
+
+class ImportResolver:
+    """
+    Resolves imported rules sources into transformers.
+
+    Compiled imports are cached in the process, by location and parser type, so a source imported by many profiles
+    is read and parsed once. `file://` entries are recompiled when modification time of the file, or of any file it
+    imports, changes. `pkg://` resources are not expected to change.
+
+    Import cycles raise `RuleImportError`.
+    """
+
+    def __init__(self):
+        self._cache: typing.Dict[typing.Tuple[str, str], _ResolvedImport] = {}
+        self._lock = threading.Lock()
+        # locations being imported in current thread
+        self._local = threading.local()
+
+    def _get_stack(self) -> typing.List[str]:
+        try:
+            return self._local.stack
+        except AttributeError:
+            self._local.stack = []
+            return self._local.stack
+
+    def resolve(
+        self, location: str, parser: str = EARLEY
+    ) -> typing.Tuple[ImportedSource, HL7Transformer]:
+        stack = self._get_stack()
+        if location in stack:
+            raise RuleImportError(f"import cycle: {' -> '.join([*stack, location])}")
+        key = (location, parser)
+        entry = self._cache.get(key)
+        if entry is not None and entry.is_current():
+            return entry.imported, entry.transformer
+
+        mtime = _source_mtime(location)
+        stack.append(location)
+        try:
+            imported, source = ImportedSource.read(location)
+            log.info(f"importing {location}")
+            transformer = make_transformer(source, parser=parser)
+        finally:
+            stack.pop()
+        # objects defined in this source (and not imported from other sources)
+        for obj in (*transformer.get_rules(), *transformer._structure):
+            if obj.origin is None:
+                obj.origin = location
+        mtimes = {
+            i.location: _source_mtime(i.location) for i in transformer.get_imports()
+        }
+        mtimes[location] = mtime
+        with self._lock:
+            self._cache[key] = _ResolvedImport(imported, transformer, mtimes)
+        return imported, transformer
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+import_resolver = ImportResolver()
+
+
+def _source_mtime(source_loc: str) -> typing.Optional[int]:
+    url = urlparse(source_loc)
+    if url.scheme == FILE_LOCATION:
+        try:
+            return os.stat(url.path).st_mtime_ns
+        except OSError:
+            return None
+    return None
+
+
+def _digest(data: str) -> str:
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
 def _read_source(source_loc: str) -> str:
     url = urlparse(source_loc)
     if url.scheme == FILE_LOCATION:
@@ -201,9 +438,34 @@ def _read_source(source_loc: str) -> str:
     return data
 
 
-def make_transformer(rules: str, grammar: str = None) -> "HL7Transformer":
+def make_transformer(
+    rules: str,
+    grammar: str = None,
+    parser: str = EARLEY,
+    parser_cache: typing.Union[bool, str] = None,
+) -> "HL7Transformer":
+    """
+    Parses rules and returns transformer with rules and structure
+
+    :param rules: rules text
+    :param grammar: optional grammar resource (default one for the parser type will be used)
+    :param parser: parser type, `earley` or `lalr`
+    :param parser_cache: LALR only, serialized parser location (see `create_parser()`)
+    :return:
+    """
+    if parser == LALR:
+        lalr_parser = create_parser(
+            grammar, LALR, transformer=HL7Transformer(), cache=parser_cache
+        )
+        return lalr_parser.parse(rules)
     transformer = HL7Transformer()
-    parser = create_parser(grammar)
+    parser = create_parser(grammar, parser, cache=parser_cache)
     tree = parser.parse(rules)
-    transformer.transform(tree)
+    try:
+        transformer.transform(tree)
+    except lark.exceptions.VisitError as err:
+        # errors from imports are wrapped by lark
+        if isinstance(err.orig_exc, RuleImportError):
+            raise err.orig_exc
+        raise
     return transformer
@@ -1,17 +1,33 @@
+import itertools
 import logging
+import threading
+import time
 import typing
 
 import hl7
 import lark
 
-from .context import Context
+from .cache import ProfileCache
+from .codegen import ENGINES, INTERPRETED
+from .context import LOG_ALL, LOG_LEVELS, Context, ValidationResult
+from .exceptions import BaseValidatorError
+from .lazy import LazyMessage
+from .metrics import STAGE_PARSE, BaseMetrics
 from .mixins import ContextMixin, ValidateMixin
-from .parser import create_parser
+from .parser import EARLEY, create_parser
 from .predicates import BasePredicate
-from .transformer import make_transformer
+from .profile import CompiledProfile
+from .profiler import Profiler
+from .transformer import HL7Transformer, make_transformer
 
 log = logging.getLogger(__name__)
 
+Message = typing.Union[str, bytes, hl7.Message, LazyMessage]
+# message, or (correlation id, message) tuple
+MessageItem = typing.Union[Message, typing.Tuple[typing.Any, Message]]
+# errors which stop validation of one message of a batch (see `ValidationResult.error`)
+MESSAGE_ERRORS = (BaseValidatorError, hl7.ParseException, ValueError)
+
 
 class Validator(ContextMixin, ValidateMixin):
     """
@@ -20,19 +36,97 @@ class Validator(ContextMixin, ValidateMixin):
     Validator creation requires rules to parse. Ruleset describes a specific HL7 message profile. Later on, a message
      will be checked if it complies with those rules.
 
+    Rules are compiled into a :class:`CompiledProfile` once (on first use, or eagerly with `.compile()`), and the
+     profile is reused for every validated message.
     """
 
-    def __init__(self, rules: str, grammar: str = None):
+    def __init__(
+        self,
+        rules: str,
+        grammar: str = None,
+        profile: CompiledProfile = None,
+        parser: str = EARLEY,
+        parser_cache: typing.Union[bool, str] = None,
+        cache_dir: str = None,
+        lazy: bool = True,
+        log_level: str = LOG_ALL,
+        fail_fast: bool = False,
+        profiler: Profiler = None,
+        metrics: BaseMetrics = None,
+        engine: str = INTERPRETED,
+    ):
         """
         Initializes the instance.
         :param rules: Rules is a string with message rules
         :param grammar: optional grammar data (default will be used)
+        :param profile: optional, already compiled profile (rules won't be compiled again)
+        :param parser: rules parser type: `earley` (default) or `lalr` (faster for large rule sets)
+        :param parser_cache: LALR only, load serialized parser from this file (`True` for a file in temp dir),
+            see `parser.create_parser()`
+        :param cache_dir: optional directory for on-disk cache of compiled profiles (see `cache.ProfileCache`)
+        :param lazy: parse only segments reached by field rules (see `lazy.LazyMessage`), `False` to parse messages
+            with `hl7.parse()`
+        :param log_level: `all` (default) to log every check, `errors` to log failed checks only (passed checks are
+            counted in `Context.passed`)
+        :param fail_fast: stop validation of a message at the first error (the context is marked as `.partial`)
+        :param profiler: optional per-rule profiler, which collects statistics of all validated messages (see
+            `profiler.Profiler`)
+        :param metrics: optional metrics, which get results and stage times of validated messages (see
+            `metrics.MetricsCollector`)
+        :param engine: field rules engine: `interpreted` (default) to validate with rule objects, `codegen` to
+            validate with a function generated from the rules (see `codegen.GeneratedRules`)
         """
         self.rules = rules
         self.grammar = grammar
+        self.parser = parser
+        self.parser_cache = parser_cache
+        self.cache_dir = cache_dir
+        self.lazy = lazy
+        if log_level not in LOG_LEVELS:
+            raise ValueError(f"Invalid log level: {log_level}")
+        self.log_level = log_level
+        self.fail_fast = fail_fast
+        self.profiler = profiler
+        self.metrics = metrics
+        if engine not in ENGINES:
+            raise ValueError(f"Invalid engine: {engine}")
+        self.engine = engine
         self._rules: lark.Tree = None
+        self._profile = profile
         self.transformer: HL7Transformer = None
         self.context = None
+        self._compile_lock = threading.Lock()
+
+    @property
+    def profile(self) -> CompiledProfile:
+        """
+        Compiled profile for this instance's rules. Rules are compiled on first access.
+        :return:
+        """
+        if self._profile is None:
+            with self._compile_lock:
+                if self._profile is None:
+                    self.compile()
+        return self._profile
+
+    def compile(self) -> CompiledProfile:
+        """
+        Compiles rules into a profile eagerly
+
+        With `cache_dir`, the profile is loaded from on-disk cache if possible, and `.transformer` is not set.
+        :return:
+        """
+        if self.cache_dir:
+            cache = ProfileCache(self.cache_dir)
+            self._profile = cache.get_or_compile(
+                self.rules, self.grammar, self.parser, self.parser_cache
+            )
+            return self._profile
+        self.transformer = make_transformer(
+            self.rules, self.grammar, self.parser, self.parser_cache
+        )
+        self._profile = CompiledProfile.from_transformer(self.transformer)
+        return self._profile
 
     def get_parser(self, grammar: str = None) -> lark.Lark:
         """
@@ -40,7 +134,7 @@ class Validator(ContextMixin, ValidateMixin):
         :param grammar:
         :return:
         """
-        p = create_parser(grammar)
+        p = create_parser(grammar, self.parser, cache=self.parser_cache)
         return p
 
     def _get_parser_tree(
@@ -56,41 +150,111 @@ class Validator(ContextMixin, ValidateMixin):
         parser = self.get_parser(grammar)
         return parser.parse(rules)
 
-    def validate(self, msg: typing.Union[str, bytes, hl7.Message] = None) -> Context:
+    def validate(self, msg: Message = None) -> Context:
         """
         Validates a specific message if it matches a given profile
 
-        Returns Context object with validation result
+        Returns Context object with validation result. Validation state is kept in the returned context only, so
+        one validator can validate messages in many threads at once.
 
-        :param msg:
+        :param msg: message to validate (if not given, message from context set with `.set_context()` is used)
         :return:
         """
 
-        ctx = self.context or Context(message=msg)
+        # each call gets a fresh context, unless the message was provided with .set_context()
+        ctx = self._create_context(msg) if msg is not None else self.context
+        return self._validate_context(ctx, self.profile)
 
-        if not ctx.message:
-            raise ValueError("empty message")
+    def validate_many(
+        self,
+        messages: typing.Iterable[MessageItem],
+    ) -> typing.Iterator[ValidationResult]:
+        """
+        Validates messages one by one, yielding a result for each message, in input order.
 
-        if not isinstance(ctx.message, hl7.Message):
-            ctx.message = hl7.parse(ctx.message)
+        Messages are read from `messages` only when the next result is requested, and results are not kept, so any
+        number of messages can be validated in constant memory. The profile is compiled once for all messages, and
+        `.context` is not changed.
 
-        self.set_context(ctx)
+        An item can be a message, or a (correlation id, message) tuple. Result's `.id` is the correlation id, or
+        the position of the message in `messages`. A message which can't be validated (not a HL7 message,
+        malformed) doesn't stop the batch: its result has the `.error` set, and the context contains messages logged
+        before the error.
 
-        self.transformer = transformer = make_transformer(self.rules, self.grammar)
+        :param messages: iterable of messages or (correlation id, message) tuples
+        :return:
+        """
+        profile = self.profile
+        for position, item in enumerate(messages):
+            if isinstance(item, tuple):
+                correlation_id, msg = item
+            else:
+                correlation_id, msg = position, item
+            ctx = self._create_context(msg)
+            try:
+                self._validate_context(ctx, profile)
+            except MESSAGE_ERRORS as err:
+                yield ValidationResult(id=correlation_id, context=ctx, error=err)
+            else:
+                yield ValidationResult(id=correlation_id, context=ctx)
+
+    def _validate_context(self, ctx: Context, profile: CompiledProfile) -> Context:
+        if self.metrics is not None:
+            return self._validate_measured(ctx, profile)
+        return profile.validate(self._prepare_context(ctx), engine=self.engine)
+
+    def _validate_measured(self, ctx: Context, profile: CompiledProfile) -> Context:
+        """
+        Validates `ctx` message, reporting stage times and the result to `.metrics`. Validation errors are reported
+        and raised. Without a context (no message given nor set with `.set_context()`) nothing is reported.
+        """
+        metrics = self.metrics
+        start = time.perf_counter()
+        try:
+            self._prepare_context(ctx)
+            metrics.observe_stage(STAGE_PARSE, time.perf_counter() - start)
+            profile.validate(ctx, metrics, self.engine)
+        except Exception as err:
+            if ctx is not None:
+                metrics.message_validated(ctx, err, time.perf_counter() - start)
+            raise
+        metrics.message_validated(ctx, None, time.perf_counter() - start)
+        return ctx
 
-        rules = transformer.get_rules()
-        struct = transformer.get_structure()
-        orig_msg = ctx.message
+    def _create_context(self, msg: Message) -> Context:
+        return Context(
+            message=msg,
+            log_level=self.log_level,
+            fail_fast=self.fail_fast,
+            profiler=self.profiler,
+        )
 
-        # first: check structure
-        for seg in struct:
-            log.info(f"validating {seg} in structure")
-            # reset msg for each rule
-            ctx.message = orig_msg
-            seg.set_context(ctx).validate()
-        # then check specific fields
-        ctx.message = orig_msg
-        for rule in rules:
-            log.info(f"validating {rule} in payload with {ctx}")
-            rule.set_context(ctx).validate()
+    def _prepare_context(self, ctx: Context) -> Context:
+        if not ctx or not ctx.message:
+            raise ValueError("empty message")
+
+        if not isinstance(ctx.message, (hl7.Message, LazyMessage)):
+            if self.lazy:
+                ctx.message = LazyMessage.parse(ctx.message)
+            else:
+                ctx.message = hl7.parse(ctx.message)
         return ctx
+
+
+def message_chunks(
+    messages: typing.Iterable[MessageItem],
+    chunk_size: int,
+) -> typing.Iterator[typing.List[typing.Tuple[typing.Any, Message]]]:
+    """
+    Splits messages into lists of `chunk_size` (correlation id, message) tuples. Messages given without an id get
+    their position in `messages`, as in `Validator.validate_many()`.
+    """
+    items = (
+        item if isinstance(item, tuple) else (position, item)
+        for position, item in enumerate(messages)
+    )
+    while True:
+        chunk = list(itertools.islice(items, chunk_size))
+        if not chunk:
+            return
+        yield chunk
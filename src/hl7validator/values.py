@@ -1,10 +1,59 @@
+import functools
 import re
+import sys
 import typing
 
 
+class _Invalid:
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return "INVALID"
+
+
+# returned by `.check()` for a value which doesn't match
+INVALID = _Invalid()
+
+
+def _check_with_eval(self, in_value: str) -> typing.Any:
+    # `.check()` of a value class implementing `.eval()`
+    try:
+        return self.eval(in_value)
+    except AssertionError:
+        return INVALID
+
+
 class BaseValue:
-    def eval(self, *args, **kwargs):
-        raise NotImplemented()
+    """
+    Expected value of a field.
+
+    Values are checked with `.check()`, which returns the (converted) value, or `INVALID` if the value doesn't
+    match. `.eval()` is the same check raising `AssertionError` instead. A subclass implements one of them, the
+    other one is derived from it: a subclass overriding only `.eval()` gets `.check()` calling it.
+    """
+
+    __slots__ = ()
+
+    # `.check()` implemented by the class or its nearest base (and not derived from `.eval()`), used by `.eval()`
+    _own_check: typing.ClassVar[typing.Callable[["BaseValue", str], typing.Any]]
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if "check" in cls.__dict__:
+            cls._own_check = cls.__dict__["check"]
+        elif "eval" in cls.__dict__:
+            cls.check = _check_with_eval
+
+    def eval(self, in_value: str) -> typing.Any:
+        result = self._own_check(in_value)
+        assert result is not INVALID, f"Invalid input {in_value} for {self}"
+        return result
+
+    def check(self, in_value: str) -> typing.Any:
+        raise NotImplementedError(
+            f"{self.__class__.__name__} must implement .check() or .eval()"
+        )
 
     def __str__(self):
         return f"<{self.__class__.__name__}>"
@@ -12,17 +61,22 @@ class BaseValue:
     __repr__ = __str__
 
 
+BaseValue._own_check = BaseValue.check
+
+
 class BaseConverter(BaseValue):
+    __slots__ = ()
+
     converter: typing.ClassVar[typing.Callable]
 
     def __init__(self, *args):
         pass
 
-    def eval(self, in_value: str) -> typing.Any:
+    def check(self, in_value: str) -> typing.Any:
         try:
             return self.converter(in_value)
         except (ValueError, TypeError):
-            assert False, f"Invalid input {in_value} for {self.converter}"
+            return INVALID
 
     def __str__(self):
         return f"<{self.__class__.__name__}>"
@@ -31,32 +85,40 @@ class BaseConverter(BaseValue):
 
 
 class StringValue(BaseConverter):
+    __slots__ = ()
+
     converter = str
 
 
 class IntValue(BaseConverter):
+    __slots__ = ()
+
     converter = int
 
 
 class AnyValue(BaseConverter):
+    __slots__ = ()
+
     converter = bool
 
-    def eval(self, in_value: str) -> typing.Any:
+    def check(self, in_value: str) -> typing.Any:
         try:
-            assert self.converter(in_value)
-            return True
-        except (ValueError, TypeError, AssertionError):
-            assert False, f"Invalid input {in_value} for {self.converter}"
+            if self.converter(in_value):
+                return True
+        except (ValueError, TypeError):
+            pass
+        return INVALID
 
 
 class RegexpValue(BaseValue):
+    __slots__ = ("_re", "re")
+
     def __init__(self, re_value: str):
         self._re = re_value
         self.re = re.compile(self._re)
 
-    def eval(self, in_value: str) -> typing.Any:
-        assert self.re.match(in_value)
-        return in_value
+    def check(self, in_value: str) -> typing.Any:
+        return in_value if self.re.match(in_value) else INVALID
 
     def __str__(self):
         return f"<{self.__class__.__name__}({self._re})>"
@@ -65,12 +127,13 @@ class RegexpValue(BaseValue):
 
 
 class ConstValue(BaseValue):
+    __slots__ = ("const",)
+
     def __init__(self, const: str):
-        self.const = const.strip('"')
+        self.const = sys.intern(const.strip('"'))
 
-    def eval(self, in_value: str) -> typing.Any:
-        assert in_value == self.const
-        return in_value
+    def check(self, in_value: str) -> typing.Any:
+        return in_value if in_value == self.const else INVALID
 
     def __str__(self):
         return f"<{self.__class__.__name__}: {self.const}>"
@@ -78,13 +141,20 @@ class ConstValue(BaseValue):
     __repr__ = __str__
 
 
+# rules with the same values share one set
+_frozen_values = functools.lru_cache(maxsize=1024)(frozenset)
+
+
 class OneOfValues(BaseValue):
+    __slots__ = ("values", "_values")
+
     def __init__(self, *values):
-        self.values = [v.strip('"') for v in values]
+        # in rules order, for display
+        self.values = [sys.intern(v.strip('"')) for v in values]
+        self._values = _frozen_values(tuple(self.values))
 
-    def eval(self, in_value: str) -> typing.Any:
-        assert in_value in self.values
-        return in_value
+    def check(self, in_value: str) -> typing.Any:
+        return in_value if in_value in self._values else INVALID
 
     def __str__(self):
         return f"<{self.__class__.__name__}: {self.values}>"
@@ -93,6 +163,7 @@ class OneOfValues(BaseValue):
 
 
 __all__ = [
+    "INVALID",
     "AnyValue",
     "IntValue",
     "StringValue",
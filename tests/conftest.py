@@ -0,0 +1,7 @@
+from hl7validator.codegen import ENGINES
+
+
+def pytest_generate_tests(metafunc):
+    # tests taking `engine` argument run with each field rules engine, passed to validators they create
+    if "engine" in metafunc.fixturenames:
+        metafunc.parametrize("engine", ENGINES)
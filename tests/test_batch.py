@@ -0,0 +1,52 @@
+import itertools
+
+import hl7
+
+from hl7validator.context import ValidationResult
+from hl7validator.exceptions import MessageMalformedError
+from hl7validator.validator import Validator
+
+RULES = """
+ MSH
+ "MSH.3.1" must be "SrcSystem"
+"""
+
+VALID_MSG = b"MSH|^~\\&|SrcSystem||TargetSystem|LabName|200705271331||OML^O21|12345|P|2.4\r"
+INVALID_MSG = b"MSH|^~\\&|Other||TargetSystem|LabName|200705271331||OML^O21|12345|P|2.4\r"
+
+
+def test_validate_many_order_and_ids(engine):
+    v = Validator(rules=RULES, engine=engine)
+    messages = [VALID_MSG, INVALID_MSG.decode("utf-8"), hl7.parse(VALID_MSG)]
+    results = list(v.validate_many(messages))
+    assert all(isinstance(r, ValidationResult) for r in results)
+    assert [r.id for r in results] == [0, 1, 2]
+    assert [r.is_valid for r in results] == [True, False, True]
+    assert v.context is None
+
+    results = list(v.validate_many([("a", INVALID_MSG), ("b", VALID_MSG)]))
+    assert [(r.id, r.is_valid) for r in results] == [("a", False), ("b", True)]
+
+
+def test_validate_many_is_lazy(engine):
+    v = Validator(rules=RULES, engine=engine)
+    consumed = []
+
+    def messages():
+        for idx in itertools.count():
+            consumed.append(idx)
+            yield VALID_MSG
+
+    results = v.validate_many(messages())
+    first = list(itertools.islice(results, 3))
+    assert [r.id for r in first] == [0, 1, 2]
+    assert consumed == [0, 1, 2]
+
+
+def test_validate_many_errors_dont_stop_batch(engine):
+    v = Validator(rules='"PID.1.1" must be "1"\n', engine=engine)
+    results = list(v.validate_many([b"not a message", VALID_MSG, b""]))
+    assert [r.id for r in results] == [0, 1, 2]
+    assert not any(r.is_valid for r in results)
+    assert isinstance(results[1].error, MessageMalformedError)
+    assert all(r.error is not None for r in results)
@@ -0,0 +1,66 @@
+import os
+
+from click.testing import CliRunner
+
+from hl7validator.cache import ProfileCache
+from hl7validator.cli import main
+from hl7validator.validator import Validator
+
+TEST_MSG = b"MSH|^~\\&|SrcSystem||TargetSystem|LabName|200705271331||OML^O21|12345|P|2.4\r"
+
+
+def _make_rules(tmp_path, base_rules):
+    base = tmp_path / "base.rules"
+    base.write_text(base_rules)
+    nested = tmp_path / "nested.rules"
+    nested.write_text(f'import "file://{base}"\n"MSH.9.1.1" must be "OML"\n')
+    return f'import "file://{nested}"\n MSH\n"MSH.12.1" must be "2.4"\n'
+
+
+def test_profile_cache(tmp_path, engine):
+    cache_dir = tmp_path / "cache"
+    rules = _make_rules(tmp_path, '"MSH.3.1" must be "SrcSystem"\n')
+
+    validator = Validator(rules=rules, cache_dir=str(cache_dir), engine=engine)
+    assert validator.validate(TEST_MSG).is_valid
+    assert len(validator.profile.rules) == 3
+    assert len(validator.profile.imports) == 2
+    assert len(os.listdir(cache_dir)) == 1
+
+    cache = ProfileCache(str(cache_dir))
+    cached = cache.load(rules)
+    assert cached is not None
+    assert [str(r) for r in cached.rules] == [str(r) for r in validator.profile.rules]
+    # other parser type has its own entry
+    assert cache.load(rules, parser="lalr") is None
+
+    validator = Validator(rules=rules, cache_dir=str(cache_dir), engine=engine)
+    assert validator.validate(TEST_MSG).is_valid
+
+
+def test_profile_cache_import_changed(tmp_path, engine):
+    cache_dir = str(tmp_path / "cache")
+    rules = _make_rules(tmp_path, '"MSH.3.1" must be "SrcSystem"\n')
+    validator = Validator(rules=rules, cache_dir=cache_dir, engine=engine)
+    assert validator.validate(TEST_MSG).is_valid
+
+    # transitively imported file changed, cached entry must not be used
+    (tmp_path / "base.rules").write_text('"MSH.3.1" must be "OtherSystem"\n')
+    assert ProfileCache(cache_dir).load(rules) is None
+    validator = Validator(rules=rules, cache_dir=cache_dir, engine=engine)
+    assert not validator.validate(TEST_MSG).is_valid
+    assert ProfileCache(cache_dir).load(rules) is not None
+
+
+def test_profile_cache_cli(tmp_path, engine):
+    this_dir = os.path.dirname(__file__)
+    tmsg = os.path.join(this_dir, "resources", "test.message.hl7")
+    trules = os.path.join(this_dir, "resources", "test.correct.rules")
+    cache_dir = tmp_path / "cache"
+    runner = CliRunner()
+    for _ in range(2):
+        out = runner.invoke(
+            main, ["--engine", engine, "--cache-dir", str(cache_dir), trules, tmsg]
+        )
+        assert out.exit_code == 0
+    assert len(os.listdir(cache_dir)) == 1
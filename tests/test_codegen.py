@@ -0,0 +1,137 @@
+import inspect
+import os
+import pickle
+
+import hl7
+import pytest
+from click.testing import CliRunner
+
+from hl7validator.cli import main
+from hl7validator.codegen import CODEGEN, generate_source
+from hl7validator.context import Context
+from hl7validator.exceptions import MessageMalformedError
+from hl7validator.predicates import MustBe
+from hl7validator.profile import CompiledProfile, compile_profile
+from hl7validator.profiler import Profiler
+from hl7validator.rules import FieldValidationRule
+from hl7validator.selectors import FieldSelector
+from hl7validator.validator import Validator
+from hl7validator.values import INVALID, BaseValue
+
+RULES = """
+ "PID.3.1" must be "123"
+ "OBR.2.1" must be int if "PID.1.1" is of value "1"
+ "PID.5.1" must be "Other"
+ "MSH.9.1.1" must be one of "ORU", "OML"
+ "PID.3.1.2" may be "x" if "OBR.1.1" is not empty
+ "MSH.7.1" must match r"[0-9]{12}"
+ "PID.2.1" cannot be int
+ "MSH.1" must be "|"
+"""
+
+MSG = (
+    b"MSH|^~\\&|A||B|C|200705271331||ORU^R01|1|P|2.4\r"
+    b"PID|1||123^x||Na\\T\\me\r"
+    b"OBR|1|abc\r"
+)
+
+
+def _log(ctx):
+    return [(m.msg, m.is_error, m.rule, m.selector) for m in ctx.log]
+
+
+@pytest.mark.parametrize("log_level", ["all", "errors"])
+@pytest.mark.parametrize("fail_fast", [False, True])
+def test_generated_rules_same_as_compiled_rules(log_level, fail_fast):
+    profile = compile_profile(RULES, parser="lalr")
+    options = {"log_level": log_level, "fail_fast": fail_fast}
+    expected = profile.compiled_rules.validate(Context(hl7.parse(MSG), **options))
+    ctx = profile.generated_rules.validate(Context(hl7.parse(MSG), **options))
+    assert _log(ctx) == _log(expected)
+    assert (ctx.passed, ctx.partial) == (expected.passed, expected.partial)
+    assert len(ctx.errors) == (1 if fail_fast else 2)
+
+
+def test_generated_rules_malformed():
+    profile = compile_profile(RULES + '"NTE.1.1" must be "1"\n', parser="lalr")
+    ctx = Context(message=hl7.parse(MSG), log_level="errors")
+    with pytest.raises(MessageMalformedError):
+        profile.generated_rules.validate(ctx)
+    # rules before the malformed one are validated
+    assert (len(ctx.errors), ctx.passed) == (2, 8)
+
+
+def test_generated_source():
+    profile = compile_profile(RULES, parser="lalr")
+    source, namespace = generate_source(profile.rules)
+    assert source.startswith("def validate_rules(ctx):\n")
+    # each segment is located once
+    assert source.count("index.get_segment(") == 3
+    # checks are inlined
+    assert "v0 == '123'" in source
+    assert "in {'OML', 'ORU'}" in source
+    assert "int(v" in source
+    assert ".validate(" not in source
+    assert namespace["R0"] is profile.rules[0]
+
+    generated = profile.generated_rules
+    assert generated.source == source
+    assert inspect.getsource(generated._function) == source
+
+
+def test_generated_rules_custom_value():
+    class EvenValue(BaseValue):
+        def check(self, in_value):
+            return in_value if int(in_value) % 2 == 0 else INVALID
+
+    rules = compile_profile(RULES, parser="lalr").rules + (
+        FieldValidationRule(FieldSelector("OBR.1.1"), MustBe(EvenValue())),
+    )
+    profile = CompiledProfile(rules=rules, structure=())
+    expected = profile.compiled_rules.validate(Context(message=hl7.parse(MSG)))
+    ctx = profile.generated_rules.validate(Context(message=hl7.parse(MSG)))
+    assert _log(ctx) == _log(expected)
+    assert ctx.errors[-1].rule is rules[-1]
+
+
+def test_generated_rules_pickled():
+    profile = compile_profile(RULES, parser="lalr")
+    source = profile.generated_rules.source
+    loaded = pickle.loads(pickle.dumps(profile))
+    ctx = loaded.generated_rules.validate(Context(message=hl7.parse(MSG)))
+    assert ctx.errors[0].rule is loaded.rules[1]
+    assert loaded.generated_rules.source == source
+
+
+def test_generated_rules_created_on_first_use():
+    validator = Validator(rules=RULES)
+    validator.validate(MSG)
+    profile = validator.profile
+    # not created for the interpreted engine, nor pickled
+    assert profile._generated_rules is None
+    assert pickle.loads(pickle.dumps(profile))._generated_rules is None
+
+    validator = Validator(rules=RULES, profile=profile, engine=CODEGEN)
+    assert len(validator.validate(MSG).errors) == 2
+    assert profile._generated_rules is profile.generated_rules
+
+
+def test_validator_engine():
+    with pytest.raises(ValueError):
+        Validator(rules=RULES, engine="jit")
+
+    profiler = Profiler()
+    validator = Validator(rules=RULES, engine=CODEGEN, profiler=profiler)
+    # profiled validation is done rule by rule
+    assert len(validator.validate(MSG).errors) == 2
+    assert len(profiler.stats) == len(validator.profile.rules)
+
+
+def test_engine_cli():
+    this_dir = os.path.dirname(__file__)
+    tmsg = os.path.join(this_dir, "resources", "test.message.hl7")
+    trules = os.path.join(this_dir, "resources", "test.correct.rules")
+    runner = CliRunner()
+    out = runner.invoke(main, ["--engine", CODEGEN, trules, tmsg])
+    assert out.exit_code == 0
+    assert out.output.endswith("Message is valid.\n")
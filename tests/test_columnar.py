@@ -0,0 +1,136 @@
+import pytest
+
+from hl7validator.exceptions import MessageMalformedError
+from hl7validator.generator import MESSAGE_TYPES, generate_messages, generate_rules
+from hl7validator.predicates import MustBe
+from hl7validator.profile import CompiledProfile
+from hl7validator.rules import FieldValidationRule
+from hl7validator.selectors import FieldSelector
+from hl7validator.validator import Validator
+from hl7validator.values import AnyValue, StringValue
+
+np = pytest.importorskip("numpy")
+
+from hl7validator.columnar import ColumnarRules, validate_columnar  # noqa: E402
+
+RULES = """
+MSH
+  PID
+
+"MSH.3.1" must be "SrcSystem"
+"MSH.7.1" must match r"[0-9]{12}"
+"MSH.9.1.1" must be one of "OML", "ORU"
+"MSH.10.1" must be int
+"MSH.11.1" may be "P"
+"MSH.12.1" must be not empty
+"PID.2.1" cannot be int
+"PID.3.1" must be int if "PID.2.1" is not empty
+"PID.4.1" may be int
+"PID.5.1.2" must be string
+"""
+
+MESSAGES = [
+    b"MSH|^~\\&|SrcSystem||TargetSystem|LabName|200705271331||OML^O21|12345|P|2.4\r"
+    b"PID|1|0000|1234||Smith^John\r",
+    b"MSH|^~\\&|Other||TargetSystem|LabName|2007052713||ADT^A01| 12 |D|\r"
+    b"PID|1|0000|x|+5|Smith^John\r",
+    b"MSH|^~\\&|SrcSystem||TargetSystem|LabName|200705271331||ORU^R01|1_0||2.4\r"
+    b"PID|1||12||Smith\r",
+    # structure error
+    b"MSH|^~\\&|SrcSystem||TargetSystem|LabName|200705271331||OML^O21|12345|P|2.4\r",
+    # malformed: selected field not present
+    b"MSH|^~\\&|SrcSystem||TargetSystem|LabName|200705271331||OML^O21|12345|P|2.4\r"
+    b"PID|1|0000|1234\r",
+    b"not a message",
+]
+
+
+class UpperCaseRule(FieldValidationRule):
+    """
+    Rule checking its value with own `.validate()`
+    """
+
+    __slots__ = ()
+
+    def validate(self, segments=None, context=None):
+        ctx = context if context is not None else self.context
+        if self.test_rule:
+            self.test_rule.validate(segments, ctx)
+        value = self.predicate.select(self.selector, segments, ctx)
+        self.add_result(ctx, value, str(value).isupper())
+
+
+def _results(results) -> list:
+    return [
+        (
+            r.id,
+            [(m.msg, m.is_error, m.rule, m.selector) for m in r.context.log],
+            r.context.passed,
+            r.context.partial,
+            type(r.error),
+            str(r.error),
+        )
+        for r in results
+    ]
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 100])
+@pytest.mark.parametrize(
+    "options",
+    [{}, {"log_level": "errors"}, {"fail_fast": True}, {"lazy": False}],
+)
+def test_validate_columnar_same_results(batch_size, options):
+    validator = Validator(rules=RULES, **options)
+    expected = _results(validator.validate_many(MESSAGES))
+    results = list(validate_columnar(validator, MESSAGES, batch_size))
+    assert _results(results) == expected
+    assert [r.is_valid for r in results] == [True] + [False] * 5
+    assert isinstance(results[4].error, MessageMalformedError)
+
+
+@pytest.mark.parametrize("message_type", MESSAGE_TYPES)
+def test_validate_columnar_generated(message_type):
+    validator = Validator(
+        rules=generate_rules(message_type, 100, conditional_rate=0.3),
+        parser="lalr",
+        log_level="errors",
+    )
+    messages = list(generate_messages(50, message_type, error_rate=0.3))
+    expected = _results(validator.validate_many(messages))
+    assert _results(validate_columnar(validator, messages, 20)) == expected
+
+
+def test_columnar_rules_checks():
+    validator = Validator(rules=RULES)
+    rules = ColumnarRules(validator.profile.rules)
+    # conditional rule is checked with its test rule
+    assert len(rules.checks) == len(validator.profile.rules) + 1
+    values = np.array(["", "12", " 12 ", "+5", "1_0", "x", "١٢"], dtype=str)
+    int_check = rules.checks[3].evaluate
+    assert int_check(values).tolist() == [False, True, True, True, True, False, True]
+    may_be_int = rules.checks[-2].evaluate
+    assert may_be_int(values).tolist() == [True, True, True, True, True, False, True]
+
+
+@pytest.mark.parametrize("options", [{}, {"log_level": "errors"}, {"fail_fast": True}])
+def test_validate_columnar_custom_rules(options):
+    validator = Validator(rules=RULES)
+    custom = (
+        UpperCaseRule(FieldSelector("MSH.4.1"), MustBe(StringValue())),
+        UpperCaseRule(
+            FieldSelector("PID.5.1.1"),
+            MustBe(StringValue()),
+            FieldValidationRule(FieldSelector("PID.3.1"), MustBe(AnyValue())),
+        ),
+    )
+    profile = CompiledProfile(
+        rules=(custom[0], *validator.profile.rules, custom[1]),
+        structure=validator.profile.structure,
+    )
+    validator = Validator(rules=RULES, profile=profile, **options)
+    expected = _results(validator.validate_many(MESSAGES))
+    assert _results(validate_columnar(validator, MESSAGES, 100)) == expected
+    rules = ColumnarRules(profile.rules)
+    # custom rules are validated with their test rules, message by message
+    assert len(rules.checks) == len(profile.rules) + 1
+    assert [c.rule for c in rules.checks if c.evaluate is None] == list(custom)
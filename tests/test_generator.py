@@ -0,0 +1,59 @@
+import pytest
+from click.testing import CliRunner
+
+from hl7validator.cli import generate, main
+from hl7validator.generator import (
+    MESSAGE_TYPES,
+    generate_messages,
+    generate_rules,
+    message_size,
+)
+from hl7validator.validator import Validator
+
+
+def test_generator_deterministic():
+    assert list(generate_messages(5, seed=1)) == list(generate_messages(5, seed=1))
+    assert list(generate_messages(5, seed=1)) != list(generate_messages(5, seed=2))
+    assert generate_rules(seed=1) == generate_rules(seed=1)
+
+
+@pytest.mark.parametrize("message_type", MESSAGE_TYPES)
+@pytest.mark.parametrize("depth", [1, 2, 3])
+@pytest.mark.parametrize("parser", ["earley", "lalr"])
+def test_generated_messages_valid(message_type, depth, parser, engine):
+    rules = generate_rules(message_type, rule_count=100, depth=depth)
+    validator = Validator(rules=rules, parser=parser, engine=engine)
+    assert len(validator.profile.rules) == 100
+    messages = generate_messages(20, message_type, groups=3, obx=2, nte=1)
+    assert all(r.is_valid for r in validator.validate_many(messages))
+
+
+@pytest.mark.parametrize("message_type", MESSAGE_TYPES)
+def test_generated_errors(message_type, engine):
+    # enough rules to check every field
+    validator = Validator(
+        rules=generate_rules(message_type, rule_count=100), parser="lalr", engine=engine
+    )
+    messages = generate_messages(20, message_type, groups=2, nte=0, error_rate=1)
+    assert not any(r.is_valid for r in validator.validate_many(messages))
+
+
+def test_generated_message_size():
+    msg = next(generate_messages(1, "ORU", groups=10, obx=4, nte=2))
+    assert msg.count("\r") == message_size("ORU", 10, 4, 2) == 1 + 2 + 10 * 13
+
+
+def test_generate_cli(tmp_path, engine):
+    rules = tmp_path / "adt.rules"
+    messages = tmp_path / "adt.hl7"
+    runner = CliRunner()
+    out = runner.invoke(generate, ["rules", "-t", "ADT", "-n", "30", "-o", str(rules)])
+    assert out.exit_code == 0
+    out = runner.invoke(
+        generate,
+        ["messages", "-t", "ADT", "-n", "5", "--mllp", "--error-rate", "0", "-o", str(messages)],
+    )
+    assert out.exit_code == 0
+    out = runner.invoke(main, ["--engine", engine, str(rules), str(messages)])
+    assert out.exit_code == 0
+    assert out.output.splitlines()[-1] == "5 messages, 5 valid, 0 invalid"
@@ -0,0 +1,88 @@
+import os
+
+import pytest
+
+from hl7validator.exceptions import RuleImportError
+from hl7validator.transformer import import_resolver, make_transformer
+from hl7validator.validator import Validator
+
+
+def _write(path, data):
+    path.write_text(data)
+    return f"file://{path}"
+
+
+@pytest.mark.parametrize("parser", ["earley", "lalr"])
+def test_import_diamond_deduplicated(tmp_path, parser):
+    base = _write(tmp_path / "base.rules", '\n MSH\n"MSH.3.1" must be not empty\n')
+    left = _write(tmp_path / "left.rules", f'import "{base}"\n"MSH.4.1" must be not empty\n')
+    right = _write(tmp_path / "right.rules", f'import "{base}"\n"MSH.5.1" must be not empty\n')
+    rules = (
+        f'import "{left}"\nimport "{right}"\nimport "{base}"\n'
+        '"MSH.6.1" must be not empty\n'
+    )
+
+    t = make_transformer(rules, parser=parser)
+    assert [r.selector.sel for r in t.get_rules()] == [
+        "MSH.3.1",
+        "MSH.4.1",
+        "MSH.5.1",
+        "MSH.6.1",
+    ]
+    assert [r.origin for r in t.get_rules()] == [base, left, right, None]
+    assert len(t.get_structure()) == 1
+    assert [i.location for i in t.get_imports()] == [left, base, right]
+
+
+@pytest.mark.parametrize("parser", ["earley", "lalr"])
+def test_import_cached(tmp_path, parser):
+    base = _write(tmp_path / "base.rules", '"MSH.3.1" must be not empty\n')
+    rules = f'import "{base}"\n'
+    first = make_transformer(rules, parser=parser).get_rules()
+    second = make_transformer(rules, parser=parser).get_rules()
+    # compiled once
+    assert first[0] is second[0]
+
+    # file changed
+    _write(tmp_path / "base.rules", '"MSH.3.1" must be empty\n')
+    stat = os.stat(tmp_path / "base.rules")
+    os.utime(tmp_path / "base.rules", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    third = make_transformer(rules, parser=parser).get_rules()
+    assert third[0] is not first[0]
+    assert "CannotBe" in str(third[0])
+
+
+@pytest.mark.parametrize("parser", ["earley", "lalr"])
+def test_import_cycle(tmp_path, parser):
+    first = f"file://{tmp_path / 'first.rules'}"
+    second = _write(tmp_path / "second.rules", f'import "{first}"\n')
+    _write(tmp_path / "first.rules", f'import "{second}"\n')
+    import_resolver.clear()
+    with pytest.raises(RuleImportError) as err:
+        make_transformer(f'import "{first}"\n', parser=parser)
+    assert "import cycle" in str(err.value)
+
+
+@pytest.mark.parametrize("parser", ["earley", "lalr"])
+def test_import_diamond_structure(tmp_path, parser):
+    base = _write(tmp_path / "base.rules", "\n MSH\n   PID\n")
+    left = _write(tmp_path / "left.rules", f'import "{base}"\n"PID.3.1" must be int\n')
+    # ORC is attached to a segment of the shared import
+    right = _write(tmp_path / "right.rules", f'import "{base}"\n     ORC 1\n')
+    rules = f'import "{left}"\nimport "{right}"\n'
+
+    t = make_transformer(rules, parser=parser)
+    assert [(s.sel, s.parent and s.parent.sel) for s in t._structure] == [
+        ("MSH", None),
+        ("PID", "MSH"),
+        ("ORC", "PID"),
+    ]
+    [root] = t.get_structure()
+    assert [c.sel for c in root.selector.children[0].children] == ["ORC"]
+
+    validator = Validator(rules=rules, parser=parser)
+    ctx = validator.validate(
+        b"MSH|^~\\&|A||B|C|200705271331||ORU^R01|1|P|2.4\r" b"PID|1||123\r"
+    )
+    assert len(ctx.errors) == 1
+    assert ctx.errors[0].msg.endswith("not enough ORC")
@@ -0,0 +1,41 @@
+import hl7
+import pytest
+
+from hl7validator.index import SegmentIndex
+from hl7validator.selectors import FieldSelector
+
+TEST_MSG = (
+    "MSH|^~\\&|SrcSystem||TargetSystem|LabName|200705271331||ORU^R01|12345|P|2.4\r"
+    "PID|1|0000\r"
+    "OBX|1|NM|A^B\r"
+    "NTE|1|P\r"
+    "OBX|2|ST|C^D\r"
+    "NTE|2|P\r"
+)
+
+
+def test_segment_index():
+    msg = hl7.parse(TEST_MSG)
+    index = SegmentIndex(msg)
+    assert len(index) == 6
+    assert index.ids == ["MSH", "PID", "OBX", "NTE", "OBX", "NTE"]
+    assert index.count("OBX") == 2
+    assert index.count("OBX", 3) == 1
+    assert index.count("OBX", 0, 3) == 1
+    assert index.count("ABC") == 0
+    assert index.find("NTE", 4) == 5
+    assert index.find("PID", 2) is None
+    assert index.get_segment("OBX", 2) is msg[4]
+    with pytest.raises(KeyError):
+        index.get_segment("ABC")
+    with pytest.raises(IndexError):
+        index.get_segment("PID", 2)
+
+
+@pytest.mark.parametrize(
+    "sel", ["MSH.9.1.1", "MSH.3", "PID.2.1", "OBX.3.1.2", "NTE.7"]
+)
+def test_field_selector_indexed(sel):
+    msg = hl7.parse(TEST_MSG)
+    selector = FieldSelector(sel)
+    assert selector.get_value(msg, SegmentIndex(msg)) == selector.get_value(msg)
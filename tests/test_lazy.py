@@ -0,0 +1,54 @@
+import hl7
+import pytest
+
+from hl7validator.lazy import LazyMessage
+from hl7validator.validator import Validator
+
+MSG = (
+    b"MSH|^~\\&|A||B|C|200705271331||ORU^R01|1|P|2.4\r"
+    b"PID|1||123^^^X\\F\\Y~456|A&B^C\r"
+    b"OBR|1\r"
+    b"OBX|1|ST|||val^x\r"
+    b"OBX|2|ST|||val2\r"
+    b"P\r"
+)
+
+RULES = """
+ MSH
+  PID 1
+  OBR 1
+    OBX 1..n
+ "PID.3.1" must be "123"
+ "MSH.9.1.1" must be "ORU"
+"""
+
+
+def test_lazy_message_same_as_parsed():
+    lazy = LazyMessage.parse(MSG)
+    parsed = hl7.parse(MSG)
+    assert len(lazy) == len(parsed)
+    assert lazy.segment_ids == [seg[0][0] for seg in parsed]
+    assert lazy.to_message() == parsed
+    assert str(lazy) == str(parsed)
+    for key in ("PID.3.1", "PID.3.2.1", "PID.4.1.1.2", "OBX.5.1.2", "MSH.2"):
+        assert lazy[key] == parsed[key]
+    assert lazy.segments("OBX") == parsed.segments("OBX")
+    with pytest.raises(KeyError):
+        lazy.segments("NTE")
+
+
+def test_validation_parses_referenced_segments_only(engine):
+    ctx = Validator(rules=RULES, engine=engine).validate(MSG)
+    assert ctx.is_valid
+    msg = ctx.message
+    assert isinstance(msg, LazyMessage)
+    parsed = [seg_id for idx, seg_id in enumerate(msg.segment_ids) if msg.is_parsed(idx)]
+    # "P" segment has no fields, so it's parsed to get its id
+    assert parsed == ["MSH", "PID", "P"]
+
+
+def test_validation_same_without_lazy(engine):
+    lazy = Validator(rules=RULES, engine=engine).validate(MSG)
+    parsed = Validator(rules=RULES, lazy=False, engine=engine).validate(MSG)
+    assert isinstance(parsed.message, hl7.Message)
+    assert [m.msg for m in lazy.log] == [m.msg for m in parsed.log]
@@ -0,0 +1,126 @@
+import json
+
+import hl7
+import pytest
+
+from hl7validator.metrics import (
+    STAGES,
+    BaseMetrics,
+    Histogram,
+    MetricsCollector,
+)
+from hl7validator.validator import Validator
+
+RULES = """
+MSH
+  PID
+
+"MSH.3.1" must be "SrcSystem"
+"MSH.7.1" must match r"[0-9]{12}"
+"""
+
+VALID_MSG = (
+    b"MSH|^~\\&|SrcSystem||TargetSystem|LabName|200705271331||OML^O21|12345|P|2.4\r"
+    b"PID|1|0000\r"
+)
+INVALID_MSG = (
+    b"MSH|^~\\&|Other||TargetSystem|LabName|2007052713||OML^O21|12345|P|2.4\r"
+    b"PID|1|0000\r"
+    b"PID|2|0000\r"
+)
+NOT_HL7_MSG = b"not a message"
+
+
+def test_histogram():
+    hist = Histogram([0.1, 1.0])
+    for value in (0.05, 0.1, 0.5, 2):
+        hist.observe(value)
+    assert hist.cumulative() == [("0.1", 2), ("1.0", 3), ("+Inf", 4)]
+    assert hist.count == 4
+    assert hist.sum == pytest.approx(2.65)
+
+
+def test_collector_counts(engine):
+    metrics = MetricsCollector()
+    validator = Validator(rules=RULES, metrics=metrics, engine=engine)
+    messages = [VALID_MSG, INVALID_MSG, VALID_MSG, NOT_HL7_MSG]
+    results = list(validator.validate_many(messages))
+    assert [r.is_valid for r in results] == [True, False, True, False]
+
+    snapshot = metrics.snapshot()
+    assert snapshot["messages"] == {"valid": 2, "invalid": 1, "error": 1}
+    assert snapshot["rule_errors"] == [
+        {"selector": "MSH", "location": ":2", "errors": 1},
+        {"selector": "MSH.3.1", "location": ":5", "errors": 1},
+        {"selector": "MSH.7.1", "location": ":6", "errors": 1},
+    ]
+    assert snapshot["validation"]["count"] == 4
+    # stages of the message which can't be parsed aren't observed
+    for stage in STAGES:
+        assert snapshot["stages"][stage]["count"] == 3
+    assert json.loads(metrics.to_json()) == snapshot
+
+    metrics.reset()
+    assert metrics.snapshot()["messages"] == {"valid": 0, "invalid": 0, "error": 0}
+
+
+def test_collector_validate_error(engine):
+    metrics = MetricsCollector()
+    validator = Validator(rules=RULES, metrics=metrics, engine=engine)
+    with pytest.raises(hl7.ParseException):
+        validator.validate(NOT_HL7_MSG)
+    assert validator.validate(VALID_MSG).is_valid
+    assert metrics.messages == {"valid": 1, "invalid": 0, "error": 1}
+
+
+def test_collector_validate_without_message(engine):
+    metrics = MetricsCollector()
+    validator = Validator(rules=RULES, metrics=metrics, engine=engine)
+    with pytest.raises(ValueError, match="empty message"):
+        validator.validate()
+    assert metrics.messages == {"valid": 0, "invalid": 0, "error": 0}
+
+
+def test_collector_prometheus(engine):
+    metrics = MetricsCollector(buckets=[0.5, 0.001])
+    validator = Validator(rules=RULES, metrics=metrics, engine=engine)
+    validator.validate(INVALID_MSG)
+    text = metrics.render_prometheus()
+    lines = text.splitlines()
+    assert text.endswith("\n")
+    assert 'hl7validator_messages_total{result="invalid"} 1' in lines
+    assert (
+        'hl7validator_rule_errors_total{selector="MSH.3.1",location=":5"} 1' in lines
+    )
+    for stage in STAGES:
+        name = "hl7validator_stage_seconds"
+        assert f'{name}_bucket{{stage="{stage}",le="+Inf"}} 1' in lines
+        assert f'{name}_count{{stage="{stage}"}} 1' in lines
+    assert 'hl7validator_validation_seconds_bucket{le="0.001"}' in text
+    assert "hl7validator_validation_seconds_count 1" in lines
+    # every sample is preceded by its metric's HELP and TYPE
+    types = [line.split()[2] for line in lines if line.startswith("# TYPE")]
+    assert types == [
+        "hl7validator_messages_total",
+        "hl7validator_rule_errors_total",
+        "hl7validator_stage_seconds",
+        "hl7validator_validation_seconds",
+    ]
+
+
+def test_custom_metrics(engine):
+    class StageMetrics(BaseMetrics):
+        def __init__(self):
+            self.stages = []
+
+        def observe_stage(self, stage, seconds):
+            self.stages.append(stage)
+
+    metrics = StageMetrics()
+    validator = Validator(rules=RULES, metrics=metrics, fail_fast=True, engine=engine)
+    validator.validate(VALID_MSG)
+    assert metrics.stages == ["parse", "structure", "fields"]
+    metrics.stages.clear()
+    # fail-fast validation stops in the structure stage
+    validator.validate(INVALID_MSG)
+    assert metrics.stages == ["parse", "structure"]
@@ -0,0 +1,110 @@
+import os
+import pickle
+
+import pytest
+from click.testing import CliRunner
+
+from hl7validator.cli import main
+from hl7validator.exceptions import MessageMalformedError
+from hl7validator.parallel import init_worker, validate_one, validate_parallel
+from hl7validator.validator import Validator
+
+RULES = """
+ MSH
+  PID 1
+ "MSH.3.1" must be "SrcSystem"
+ "PID.3.1" must be int if "PID.1.1" is not empty
+"""
+
+VALID_MSG = b"MSH|^~\\&|SrcSystem||TargetSystem|LabName|200705271331||OML^O21|12345|P|2.4\rPID|1||123\r"
+INVALID_MSG = b"MSH|^~\\&|Other||TargetSystem|LabName|200705271331||OML^O21|12345|P|2.4\rPID|1||abc\r"
+MALFORMED_MSG = b"MSH|^~\\&|SrcSystem||TargetSystem|LabName|200705271331||OML^O21|12345|P|2.4\r"
+
+
+def _messages(count):
+    for idx in range(count):
+        yield (VALID_MSG, INVALID_MSG, MALFORMED_MSG, b"")[idx % 4]
+
+
+def _summary(results):
+    return [
+        (
+            r.id,
+            r.is_valid,
+            type(r.error),
+            [(m.msg, m.is_error, str(m.rule), str(m.selector)) for m in r.context.log],
+        )
+        for r in results
+    ]
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+def test_validate_parallel_same_as_validate_many(ordered, engine):
+    v = Validator(rules=RULES, engine=engine)
+    expected = _summary(v.validate_many(_messages(50)))
+    results = list(validate_parallel(v, _messages(50), jobs=2, chunk_size=3, ordered=ordered))
+    if not ordered:
+        results.sort(key=lambda r: r.id)
+    assert _summary(results) == expected
+    rules = set(v.profile.rules) | set(r.test_rule for r in v.profile.rules)
+    assert results[1].context.log[-1].rule in rules
+    assert results[1].context.message == INVALID_MSG
+    assert isinstance(results[2].error, MessageMalformedError)
+    assert results[2].error.message == MALFORMED_MSG
+
+
+def test_validate_parallel_correlation_ids(engine):
+    v = Validator(rules=RULES, engine=engine)
+    messages = [(f"msg-{idx}", VALID_MSG) for idx in range(10)]
+    results = validate_parallel(v, messages, jobs=2, chunk_size=4)
+    assert [(r.id, r.is_valid) for r in results] == [(f"msg-{idx}", True) for idx in range(10)]
+
+
+def test_parallel_cli(tmp_path, engine):
+    this_dir = os.path.dirname(__file__)
+    tmsg = os.path.join(this_dir, "resources", "test.message.hl7")
+    trules = os.path.join(this_dir, "resources", "test.correct.rules")
+    invalid = tmp_path / "invalid.hl7"
+    invalid.write_bytes(INVALID_MSG)
+    runner = CliRunner()
+    out = runner.invoke(
+        main, ["--engine", engine, "--jobs", "2", trules, tmsg, str(invalid), tmsg]
+    )
+    assert out.exit_code == 1
+    lines = out.output.splitlines()
+    assert lines[0] == f"{tmsg}: Message is valid."
+    assert lines[1] == f"{invalid}: Message is invalid:"
+    assert lines[-1] == "3 messages, 2 valid, 1 invalid"
+
+
+def test_validate_parallel_errors_only(engine):
+    validator = Validator(rules=RULES, log_level="errors", engine=engine)
+    results = list(validate_parallel(validator, _messages(8), jobs=2, chunk_size=3))
+    expected = list(validator.validate_many(_messages(8)))
+    assert _summary(results) == _summary(expected)
+    assert [r.context.passed for r in results] == [r.context.passed for r in expected]
+    assert all(m.is_error for r in results for m in r.context.log)
+
+
+def test_validate_parallel_fail_fast(engine):
+    validator = Validator(rules=RULES, fail_fast=True, engine=engine)
+    results = list(validate_parallel(validator, _messages(8), jobs=2, chunk_size=3))
+    expected = list(validator.validate_many(_messages(8)))
+    assert _summary(results) == _summary(expected)
+    assert [r.context.partial for r in results] == [r.context.partial for r in expected]
+    assert [r.context.partial for r in results[:2]] == [False, True]
+
+
+def test_worker_validate_one(engine):
+    # worker entry points, called in this process
+    validator = Validator(rules=RULES, engine=engine)
+    init_worker(pickle.dumps(validator.profile), lazy=True, log_level="errors")
+    results = [validate_one(msg) for msg in _messages(4)]
+    in_process = Validator(rules=RULES, log_level="errors", engine=engine)
+    expected = list(in_process.validate_many(_messages(4)))
+    assert [(r.is_valid, type(r.error)) for r in results] == [
+        (r.is_valid, type(r.error)) for r in expected
+    ]
+    assert [[m.msg for m in r.context.log] for r in results] == [
+        [m.msg for m in r.context.log] for r in expected
+    ]
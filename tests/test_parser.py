@@ -1,16 +1,21 @@
 import os
+import subprocess
+import sys
 
+import pytest
 from click.testing import CliRunner
 from lark import lark
+from lark.exceptions import UnexpectedInput
 
 from hl7validator.cli import main
 from hl7validator.mixins import Cardinality
-from hl7validator.parser import create_parser
+from hl7validator.parser import clear_parser_cache, create_parser
 from hl7validator.predicates import MustBe
-from hl7validator.transformer import HL7Transformer
+from hl7validator.transformer import HL7Transformer, make_transformer
 from hl7validator.validator import Validator
 from hl7validator.values import AnyValue
 
+
 def test_parser_creation():
 
     rules = """
@@ -40,7 +45,7 @@ def test_parser_creation():
     assert len(_rules) == len([r for r in rules.split("\n") if r.strip()])
 
 
-def test_parser_validation_ok():
+def test_parser_validation_ok(engine):
     test_msg = r'MSH|^~\\&|SrcSystem||TargetSystem|LabName|200705271331||OML^O21|12345|P|2.4\r"'
     rules = """
 // this is a comment
@@ -57,12 +62,12 @@ def test_parser_validation_ok():
  // this is a regexp
  "MSH.7.1" must match r"[0-9]{12}" if "MSH.7.1" is not empty
 """
-    validator = Validator(rules=rules)
+    validator = Validator(rules=rules, engine=engine)
     ctx = validator.validate(test_msg)
     assert ctx.is_valid
 
 
-def test_parser_validation_invalid():
+def test_parser_validation_invalid(engine):
     test_msg = (
         r'MSH|^~\\&|Invalid||TargetSystem|LabName|2007052713||OML^O21|12345|P|2.4\r"'
     )
@@ -81,7 +86,7 @@ def test_parser_validation_invalid():
  // this is a regexp
  "MSH.7.1" must match r"[0-9]{12}" if "MSH.7.1" is not empty
 """
-    validator = Validator(rules=rules)
+    validator = Validator(rules=rules, engine=engine)
     ctx = validator.validate(test_msg)
     assert len(ctx.log)
     # 3 rules broken: MSH.3.1 invalid value, MSH.3.1 value not in allowed set, MSH.7.1 invalid regexp
@@ -89,25 +94,51 @@ def test_parser_validation_invalid():
     assert ctx.is_valid is False
 
 
-def test_parser_cli_error():
+def test_parser_cli_error(engine):
+    this_dir = os.path.dirname(__file__)
+    tmsg = os.path.join(this_dir, "resources", "test.message.hl7")
+    trules = os.path.join(this_dir, "resources", "test.incorrect.rules")
+    runner = CliRunner()
+    out = runner.invoke(main, ["--engine", engine, trules, tmsg])
+    assert out.exit_code == 1
+
+
+def test_parser_cli_fail_fast(engine):
     this_dir = os.path.dirname(__file__)
     tmsg = os.path.join(this_dir, "resources", "test.message.hl7")
     trules = os.path.join(this_dir, "resources", "test.incorrect.rules")
     runner = CliRunner()
-    out = runner.invoke(main, [trules, tmsg])
+    out = runner.invoke(main, ["--engine", engine, "--fail-fast", trules, tmsg])
     assert out.exit_code == 1
+    errors = [line for line in out.output.splitlines() if line.startswith(" * ")]
+    assert len(errors) == 1
+    assert out.output.splitlines()[-1] == " (validation stopped at the first error)"
 
 
-def test_parser_cli_ok():
+def test_parser_cli_ok(engine):
     this_dir = os.path.dirname(__file__)
     tmsg = os.path.join(this_dir, "resources", "test.message.hl7")
     trules = os.path.join(this_dir, "resources", "test.correct.rules")
     runner = CliRunner()
-    out = runner.invoke(main, [trules, tmsg])
+    out = runner.invoke(main, ["--engine", engine, trules, tmsg])
     assert out.exit_code == 0
 
 
-def test_structure_validation_complex():
+def test_cli_start_up_imports():
+    # server, worker pools and generator aren't needed to validate a message
+    code = (
+        "import sys, hl7validator.cli; "
+        "print(sorted(m for m in ('asyncio', 'concurrent.futures', 'hl7validator.server', "
+        "'hl7validator.parallel', 'hl7validator.generator') if m in sys.modules))"
+    )
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    out = subprocess.run(
+        [sys.executable, "-c", code], env=env, capture_output=True, check=True
+    )
+    assert out.stdout.decode().strip() == "[]"
+
+
+def test_structure_validation_complex(engine):
     test_msg = (
         b"MSH|^~\\&|SrcSystem||TargetSystem|LabName|200705271331||OML^O21|12345|P|2.4\r"
         b"PID|1|0000|||\r"
@@ -143,7 +174,7 @@ def test_structure_validation_complex():
  // this is a regexp
  "MSH.7.1" must match r"[0-9]{12}" if "MSH.7.1" is not empty
 """
-    validator = Validator(rules=rules)
+    validator = Validator(rules=rules, engine=engine)
     ctx = validator.validate(test_msg)
     assert len(ctx.log)
     assert len(ctx.get_errors())
@@ -155,7 +186,7 @@ def test_structure_validation_complex():
     assert errors[1].selector.cardinality == Cardinality.SEGMENT_AT_MOST_ONE
 
 
-def test_structure_validation_import():
+def test_structure_validation_import(engine):
     test_msg = (
         b"MSH|^~\\&|SrcSystem|SrcSystemLabName|TargetSystem|LabName|200705271331||OML^O21|12345|P|2.4\r"
         b"PID|1|0000|||\r"
@@ -176,7 +207,7 @@ MSH
 "PV1.1" must be not empty
 
 """
-    validator = Validator(rules=rules)
+    validator = Validator(rules=rules, engine=engine)
     ctx = validator.validate(test_msg)
     assert len(validator.transformer.get_rules()) == 4  # 4 rules from import
     assert len(validator.transformer.get_structure()) == 2  # 1 rule for structure (MSH)
@@ -186,14 +217,14 @@ MSH
     assert ctx.is_valid
 
 
-def test_structure_validation_import_bad_structure():
+def test_structure_validation_import_bad_structure(engine):
     test_msg = b"MSH|^~\\&|||||200705271331||OML^O21|12345|P|2.4\r"
 
     rules = """
 import "pkg://hl7validator/resources/base_hl7.rules"
 // no other rules
 """
-    validator = Validator(rules=rules)
+    validator = Validator(rules=rules, engine=engine)
     ctx = validator.validate(test_msg)
 
     assert len(ctx.log) == 4  # 3 rules from import + 1 import strucutre rule
@@ -212,7 +243,7 @@ import "pkg://hl7validator/resources/base_hl7.rules"
     assert isinstance(errors[1].rule.predicate.expected, AnyValue)
 
 
-def test_structure_validation_duplicate_segment():
+def test_structure_validation_duplicate_segment(engine):
     test_msg = (b"MSH|^~\\&|||||200705271331||OML^O21|12345|P|2.4\r"
                 b"SE1||||\r"
                 b"SE2||||\r"
@@ -224,7 +255,7 @@ def test_structure_validation_duplicate_segment():
 SE1
 SE2
 """
-    validator = Validator(rules=rules)
+    validator = Validator(rules=rules, engine=engine)
     ctx = validator.validate(test_msg)
 
     assert not ctx.is_valid
@@ -233,7 +264,7 @@ SE2
     assert errors[0].selector.sel == 'SE2'
 
 
-def test_structure_validation_order():
+def test_structure_validation_order(engine):
     test_msg = (b"MSH|^~\\&|||||200705271331||OML^O21|12345|P|2.4\r"
                 b"SE1||||\r"
                 b"SE2||||\r"
@@ -249,7 +280,7 @@ SE2
   SE3
   
 """
-    validator = Validator(rules=rules)
+    validator = Validator(rules=rules, engine=engine)
     ctx = validator.validate(test_msg)
 
     assert len(validator.transformer.get_rules()) == 0
@@ -257,7 +288,7 @@ SE2
     assert ctx.is_valid
 
 
-def test_structure_validation_order_duplicated():
+def test_structure_validation_order_duplicated(engine):
     test_msg = (b"MSH|^~\\&|||||200705271331||OML^O21|12345|P|2.4\r"
                 b"SE1||||\r"
                 b"SE2||||\r"
@@ -270,11 +301,11 @@ def test_structure_validation_order_duplicated():
 SE2
   SE3
 """
-    validator = Validator(rules=rules)
+    validator = Validator(rules=rules, engine=engine)
     ctx = validator.validate(test_msg)
 
     assert not ctx.is_valid
-def test_structure_validation_order_duplicated_chain():
+def test_structure_validation_order_duplicated_chain(engine):
     test_msg = (b"MSH|^~\\&|||||200705271331||OML^O21|12345|P|2.4\r"
                 b"SE1||||\r"
                 b"SE2||||\r"
@@ -292,13 +323,13 @@ SE2 0..1
   SE3 0..1
     SE5 0..1
 """
-    validator = Validator(rules=rules)
+    validator = Validator(rules=rules, engine=engine)
     ctx = validator.validate(test_msg)
 
     assert ctx.is_valid
 
 
-def test_structure_validation_zero_segment():
+def test_structure_validation_zero_segment(engine):
     test_msg = (b"MSH|^~\\&|||||200705271331||OML^O21|12345|P|2.4\r"
                 b"SE1||||\r"
                 b"SE2||||\r"
@@ -311,12 +342,12 @@ SE2 1..n
      SE4 0
      SE2
 """
-    validator = Validator(rules=rules)
+    validator = Validator(rules=rules, engine=engine)
     ctx = validator.validate(test_msg)
 
     assert ctx.is_valid
 
-def test_structure_validation_one_or_more_segment():
+def test_structure_validation_one_or_more_segment(engine):
     test_msg = (b"MSH|^~\\&|||||200705271331||OML^O21|12345|P|2.4\r"
                 b"SE1||||\r"
                 b"SE2||||\r"
@@ -328,7 +359,176 @@ SE2 1..n
   SE3
      SE4 1..n
 """
-    validator = Validator(rules=rules)
+    validator = Validator(rules=rules, engine=engine)
     ctx = validator.validate(test_msg)
 
     assert not ctx.is_valid
+
+
+def _dump_transformer(t):
+    return (
+        [str(r) for r in t.get_rules()],
+        [(s.sel, s.cardinality, s.parent and s.parent.sel) for s in t._structure],
+    )
+
+
+@pytest.mark.parametrize(
+    "rules",
+    [
+        """
+import "pkg://hl7validator/resources/base_hl7.rules"
+ MSH
+   PID  0..1
+     // [XXX] notation is an equivalent of XXX 0..1
+     [PV1]
+     NTE 1..n
+   OBR  1..n
+     NTE 0..1
+
+ "MSH.3.1" must be not empty
+ "MSH.3.1" may be string
+ "MSH.3.1" cannot be "AnySystem"
+ "MSH.3.1" must be one of "SrcSystem", "OtherSystem"
+ "MSH.3.2" cannot be one of "Test", "Value"
+ "MSH.3.3" must be int if "MSH.4" is empty
+ "MSH.7.1" must match r"[0-9]{12}" if "MSH.7.1" is not empty
+ "NTE.2.1" must be "P" if "PID.2.1" is one of "ABC", "BCD"
+ "NTE.2.2" must be empty if "PID.2.1" is of type string
+""",
+        open(os.path.join(os.path.dirname(__file__), "resources", "test.correct.rules")).read(),
+        # comments don't change segment levels
+        "\nMSH\n  PID 1\n// visit\n  PV1 1\n",
+        "\nMSH\n  PID 1 // patient\n  PV1 1\n",
+    ],
+)
+def test_lalr_parser_same_as_earley(rules):
+    earley = make_transformer(rules, parser="earley")
+    lalr = make_transformer(rules, parser="lalr")
+    assert isinstance(lalr, HL7Transformer)
+    assert _dump_transformer(earley) == _dump_transformer(lalr)
+
+
+@pytest.mark.parametrize(
+    "rules, parents",
+    [
+        (
+            '\r\nMSH\r\n  PID\r\n    PV1\r\n  OBR\r\n"PID.1.1" must be "1"\r\n',
+            {"PID": "MSH", "PV1": "PID", "OBR": "MSH"},
+        ),
+        # segment level is its column: blank lines, trailing whitespace and comments don't change it
+        (
+            '\nMSH\n  PID\n\n   PV1\n  OBR \n   [NTE]\n  // c\n  ORC\n"PID.1.1" must be "1"\n',
+            {"PID": "MSH", "PV1": "PID", "OBR": "MSH", "NTE": "OBR", "ORC": "MSH"},
+        ),
+    ],
+)
+def test_lalr_parser_same_levels_as_earley(rules, parents):
+    for parser in ("earley", "lalr"):
+        t = make_transformer(rules, parser=parser)
+        assert {s.sel: s.parent and s.parent.sel for s in t._structure} == {
+            "MSH": None,
+            **parents,
+        }
+    assert _dump_transformer(make_transformer(rules, parser="earley")) == (
+        _dump_transformer(make_transformer(rules, parser="lalr"))
+    )
+
+
+@pytest.mark.parametrize("parser", ["earley", "lalr"])
+def test_structure_indentation_required(parser):
+    # first structure segment must be indented, as line breaks are for the following ones
+    with pytest.raises(UnexpectedInput):
+        make_transformer("MSH\n  PID\n", parser=parser)
+    t = make_transformer(" MSH\n  PID\n", parser=parser)
+    assert {s.sel: s.parent and s.parent.sel for s in t._structure} == {
+        "MSH": None,
+        "PID": "MSH",
+    }
+
+
+def test_lalr_parser_validation(engine):
+    test_msg = (
+        b"MSH|^~\\&|SrcSystem||TargetSystem|LabName|200705271331||OML^O21|12345|P|2.4\r"
+        b"PID|1|0000|||\r"
+        b"PV1||||\r"
+        b"OBR|||\r"
+        b"NTE|||\r"
+        b"NTE|||\r"
+    )
+    rules = """
+ MSH
+   PID  0..1
+     [PV1]
+     NTE 1..n
+   OBR  1..n
+     NTE 0..1
+ "MSH.3.1" must be "SrcSystem"
+"""
+    validator = Validator(rules=rules, parser="lalr", engine=engine)
+    ctx = validator.validate(test_msg)
+    errors = ctx.get_errors()
+    assert [(e.selector.sel, e.selector.cardinality) for e in errors] == [
+        ("NTE", Cardinality.SEGMENT_AT_LEAST_ONE),
+        ("NTE", Cardinality.SEGMENT_AT_MOST_ONE),
+    ]
+
+
+def test_parser_cli_lalr(engine):
+    this_dir = os.path.dirname(__file__)
+    tmsg = os.path.join(this_dir, "resources", "test.message.hl7")
+    trules = os.path.join(this_dir, "resources", "test.correct.rules")
+    runner = CliRunner()
+    out = runner.invoke(main, ["--engine", engine, "--parser", "lalr", trules, tmsg])
+    assert out.exit_code == 0
+
+
+def test_parser_cached():
+    assert create_parser() is create_parser()
+    assert create_parser(parser="lalr") is create_parser(parser="lalr")
+    assert create_parser() is not create_parser(parser="lalr")
+    with pytest.raises(ValueError):
+        create_parser(parser="cyk")
+    with pytest.raises(ValueError):
+        create_parser(cache=True)
+
+
+def test_parser_serialized_after_cached(tmp_path):
+    # parser created without cache file before doesn't prevent creating the file
+    cache_file = tmp_path / "parser.cache"
+    clear_parser_cache()
+    Validator(rules='"MSH.3.1" must be "SrcSystem"', parser="lalr").compile()
+    Validator(
+        rules='"MSH.3.1" must be "SrcSystem"',
+        parser="lalr",
+        parser_cache=str(cache_file),
+    ).compile()
+    assert cache_file.exists()
+    assert create_parser(parser="lalr", cache=str(cache_file)) is create_parser(
+        parser="lalr", cache=str(cache_file)
+    )
+
+
+def test_parser_serialized(tmp_path, engine):
+    cache_file = tmp_path / "parser.cache"
+    clear_parser_cache()
+    validator = Validator(
+        rules='"MSH.3.1" must be "SrcSystem"',
+        parser="lalr",
+        parser_cache=str(cache_file),
+        engine=engine,
+    )
+    validator.compile()
+    assert cache_file.exists()
+
+    # loaded from serialized parser
+    clear_parser_cache()
+    this_dir = os.path.dirname(__file__)
+    tmsg = os.path.join(this_dir, "resources", "test.message.hl7")
+    trules = os.path.join(this_dir, "resources", "test.correct.rules")
+    runner = CliRunner()
+    out = runner.invoke(
+        main, ["--parser", "lalr", "--parser-cache", str(cache_file), trules, tmsg]
+    )
+    assert out.exit_code == 0
+    out = runner.invoke(main, ["--parser-cache", str(cache_file), trules, tmsg])
+    assert out.exit_code == 2
@@ -1,10 +1,25 @@
 import hl7
 import pytest
 
-from hl7validator.predicates import MustBe, MayBe, CannotBe
+from hl7validator.predicates import BasePredicate, MustBe, MayBe, CannotBe
+from hl7validator.profile import CompiledProfile
+from hl7validator.rules import FieldValidationRule
 from hl7validator.selectors import SegmentSelector, FieldSelector
-from hl7validator.values import StringValue, AnyValue, IntValue, ConstValue, OneOfValues
+from hl7validator.values import (
+    INVALID,
+    AnyValue,
+    BaseValue,
+    ConstValue,
+    IntValue,
+    OneOfValues,
+    RegexpValue,
+    StringValue,
+)
 from hl7validator.context import Context
+from hl7validator.exceptions import NotValid
+
+MSG = "MSH|^~\\&|src||TargetSystem|LabName|200705271331||OML^O21|12345|P|2.4\r"
+
 
 @pytest.mark.skip('old api')
 def test_predicate_must_be():
@@ -36,3 +51,128 @@ def test_predicate_may_be():
     with pytest.raises(AssertionError):
         assert may_be.eval(FieldSelector('MSH.9.1.1'), ConstValue('FOO'))
     assert may_be.eval(FieldSelector('MSH.8.1.1'), ConstValue('Any')) is None
+
+
+@pytest.mark.parametrize(
+    "value,in_value,expected",
+    [
+        (StringValue(), "abc", "abc"),
+        (IntValue(), "12", 12),
+        (IntValue(), "abc", INVALID),
+        (AnyValue(), "abc", True),
+        (AnyValue(), "", INVALID),
+        (ConstValue('"OML"'), "OML", "OML"),
+        (ConstValue('"OML"'), "ORU", INVALID),
+        (OneOfValues('"2.3"', '"2.4"'), "2.4", "2.4"),
+        (OneOfValues('"2.3"', '"2.4"'), "2.5", INVALID),
+        (RegexpValue("[0-9]+"), "123", "123"),
+        (RegexpValue("[0-9]+"), "abc", INVALID),
+    ],
+)
+def test_value_check(value, in_value, expected):
+    assert value.check(in_value) == expected
+    if expected is INVALID:
+        with pytest.raises(AssertionError):
+            value.eval(in_value)
+    else:
+        assert value.eval(in_value) == expected
+
+
+def test_value_check_from_eval():
+    # values implementing the raising protocol only still work with .check()
+    class EvenValue(BaseValue):
+        def eval(self, in_value):
+            assert int(in_value) % 2 == 0
+            return in_value
+
+    assert EvenValue().check("2") == "2"
+    assert EvenValue().check("3") is INVALID
+
+
+@pytest.mark.parametrize(
+    "predicate,in_value,expected",
+    [
+        (MustBe(ConstValue('"OML"')), "OML", "OML"),
+        (MustBe(ConstValue('"OML"')), "ORU", INVALID),
+        (MustBe(IntValue()), "", INVALID),
+        (MayBe(IntValue()), "", ""),
+        (MayBe(IntValue()), "abc", INVALID),
+        # no value is rejected by CannotBe (see CannotBe.check())
+        (CannotBe(ConstValue('"OML"')), "ORU", "ORU"),
+        (CannotBe(ConstValue('"OML"')), "OML", "OML"),
+    ],
+)
+def test_predicate_check(predicate, in_value, expected):
+    assert predicate.check(in_value) == expected
+    if expected is INVALID:
+        with pytest.raises(AssertionError):
+            predicate.check_value(in_value)
+    else:
+        assert predicate.check_value(in_value) == expected
+
+
+def test_predicate_validate_raises():
+    msg = hl7.parse(
+        "MSH|^~\\&|SrcSystem||TargetSystem|LabName|200705271331||OML^O21|12345|P|2.4\r"
+    )
+    ctx = Context(message=msg)
+    sel = FieldSelector("MSH.3.1")
+    assert MustBe(ConstValue('"SrcSystem"')).validate(sel, context=ctx) == "SrcSystem"
+    with pytest.raises(NotValid) as err:
+        MustBe(ConstValue('"Other"')).validate(sel, context=ctx)
+    assert err.value.selector is sel
+    assert err.value.value == "SrcSystem"
+
+
+class UpperValue(StringValue):
+    def eval(self, in_value):
+        assert in_value.isupper()
+        return super().eval(in_value)
+
+
+class NeverValid(BasePredicate):
+    def check_value(self, in_value):
+        assert False
+
+
+class NotEmpty(MayBe):
+    def check_value(self, in_value):
+        assert in_value
+        return super().check_value(in_value)
+
+
+def test_converter_eval_override():
+    assert UpperValue().check("SRC") == "SRC"
+    assert UpperValue().check("src") is INVALID
+    assert MustBe(UpperValue()).check("src") is INVALID
+
+
+def test_predicate_check_value_override():
+    assert NeverValid(StringValue()).check("SRC") is INVALID
+    assert NotEmpty(IntValue()).check("1") == 1
+    assert NotEmpty(IntValue()).check("") is INVALID
+    assert NotEmpty(IntValue()).check("x") is INVALID
+
+    ctx = Context(message=hl7.parse(MSG))
+    with pytest.raises(NotValid):
+        NeverValid(StringValue()).validate(FieldSelector("MSH.3.1"), context=ctx)
+
+
+def test_value_without_check():
+    class NoCheck(BaseValue):
+        pass
+
+    with pytest.raises(NotImplementedError):
+        NoCheck().check("1")
+    with pytest.raises(NotImplementedError):
+        NoCheck().eval("1")
+
+
+@pytest.mark.parametrize(
+    "predicate", [MustBe(UpperValue()), NeverValid(StringValue()), NotEmpty(IntValue())]
+)
+def test_custom_checks_in_rules(predicate, engine):
+    rule = FieldValidationRule(FieldSelector("MSH.3.1"), predicate)
+    profile = CompiledProfile(rules=(rule,), structure=())
+    ctx = profile.validate(Context(message=hl7.parse(MSG)), engine=engine)
+    assert [e.rule for e in ctx.errors] == [rule]
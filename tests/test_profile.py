@@ -0,0 +1,108 @@
+import pickle
+
+import pytest
+
+from hl7validator.profile import CompiledProfile, compile_profile
+from hl7validator.validator import Validator
+
+RULES = """
+ MSH
+ "MSH.3.1" must be "SrcSystem"
+ "MSH.7.1" must match r"[0-9]{12}"
+"""
+
+VALID_MSG = b"MSH|^~\\&|SrcSystem||TargetSystem|LabName|200705271331||OML^O21|12345|P|2.4\r"
+INVALID_MSG = b"MSH|^~\\&|Other||TargetSystem|LabName|2007052713||OML^O21|12345|P|2.4\r"
+
+
+def test_profile_compiled_once(engine):
+    validator = Validator(rules=RULES, engine=engine)
+    profile = validator.profile
+    assert isinstance(profile, CompiledProfile)
+    assert len(profile.rules) == 2
+    assert len(profile.structure) == 1
+
+    assert validator.validate(VALID_MSG).is_valid
+    assert validator.profile is profile
+    # each message is validated with a fresh context
+    ctx = validator.validate(INVALID_MSG)
+    assert not ctx.is_valid
+    assert len(ctx.get_errors()) == 2
+    assert validator.validate(VALID_MSG).is_valid
+    assert validator.profile is profile
+
+
+def test_profile_shared_between_validators(engine):
+    profile = compile_profile(RULES)
+    v1 = Validator(rules=RULES, profile=profile, engine=engine)
+    v2 = Validator(rules=RULES, profile=profile, engine=engine)
+    assert v1.validate(VALID_MSG).is_valid
+    assert not v2.validate(INVALID_MSG).is_valid
+    assert v1.profile is v2.profile is profile
+
+
+@pytest.mark.parametrize("msg", [VALID_MSG, INVALID_MSG])
+def test_log_level_errors(msg, engine):
+    full = Validator(rules=RULES, engine=engine).validate(msg)
+    errors_only = Validator(rules=RULES, log_level="errors", engine=engine).validate(msg)
+    assert errors_only.is_valid == full.is_valid
+    # passed checks are counted, not logged
+    assert errors_only.log == errors_only.get_errors()
+    assert [m.msg for m in errors_only.log] == [m.msg for m in full.get_errors()]
+    assert errors_only.passed == full.passed == len(full.log) - len(full.get_errors())
+
+
+def test_log_level_invalid(engine):
+    with pytest.raises(ValueError):
+        Validator(rules=RULES, log_level="debug", engine=engine)
+
+
+STRUCTURE_RULES = """
+ MSH
+  PID 1
+ "MSH.3.1" must be "SrcSystem"
+ "MSH.7.1" must match r"[0-9]{12}"
+"""
+
+
+@pytest.mark.parametrize(
+    "rules,msg,errors",
+    [
+        # field rules: stops after MSH.3.1
+        (RULES, INVALID_MSG, 2),
+        # structure: field rules are not checked
+        (STRUCTURE_RULES, INVALID_MSG, 3),
+    ],
+)
+def test_fail_fast(rules, msg, errors, engine):
+    full = Validator(rules=rules, engine=engine).validate(msg)
+    assert len(full.get_errors()) == errors
+    assert not full.partial
+
+    ctx = Validator(rules=rules, fail_fast=True, engine=engine).validate(msg)
+    assert not ctx.is_valid
+    assert ctx.partial
+    assert [m.msg for m in ctx.get_errors()] == [full.get_errors()[0].msg]
+    # checks logged before the first error are the same
+    assert [m.msg for m in ctx.log] == [m.msg for m in full.log[: len(ctx.log)]]
+
+
+def test_fail_fast_valid_message(engine):
+    full = Validator(rules=RULES, engine=engine).validate(VALID_MSG)
+    ctx = Validator(rules=RULES, fail_fast=True, engine=engine).validate(VALID_MSG)
+    assert ctx.is_valid
+    assert not ctx.partial
+    assert [m.msg for m in ctx.log] == [m.msg for m in full.log]
+
+
+def test_profile_objects_are_compact():
+    rules = RULES + ' "MSH.12.1" must be one of "2.3", "2.4"\n "PID.1.1" may be one of "2.3", "2.4"\n'
+    profile = pickle.loads(pickle.dumps(compile_profile(rules)))
+    objects = [profile.structure[0], profile.structure[0].selector]
+    for rule in profile.rules:
+        objects.extend((rule, rule.selector, rule.predicate, rule.predicate.expected))
+    assert not [obj for obj in objects if hasattr(obj, "__dict__")]
+    # equal values are shared, also in a loaded profile
+    one_of = [rule.predicate.expected for rule in profile.rules[2:]]
+    assert one_of[0]._values is one_of[1]._values
+    assert one_of[0].values == ["2.3", "2.4"]
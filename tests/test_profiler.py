@@ -0,0 +1,112 @@
+import os
+
+import pytest
+from click.testing import CliRunner
+
+from hl7validator.cli import main
+from hl7validator.parser import PARSERS
+from hl7validator.profiler import Profiler
+from hl7validator.rules import FieldValidationRule, SegmentValidationRule
+from hl7validator.validator import Validator
+
+RULES = """
+MSH
+  PID
+  PV1 0..n
+
+"MSH.3.1" must be "SrcSystem"
+"MSH.7.1" must match r"[0-9]{12}"
+"PID.3.1" must be int if "PID.2.1" is not empty
+"""
+
+VALID_MSG = (
+    b"MSH|^~\\&|SrcSystem||TargetSystem|LabName|200705271331||OML^O21|12345|P|2.4\r"
+    b"PID|1|0000|1234|\r"
+    b"PV1|1|I\r"
+    b"PV1|2|I\r"
+)
+INVALID_MSG = (
+    b"MSH|^~\\&|Other||TargetSystem|LabName|2007052713||OML^O21|12345|P|2.4\r"
+    b"PID|1|0000|1234|\r"
+    b"PID|2|0000|1234|\r"
+)
+
+
+@pytest.mark.parametrize("parser", PARSERS)
+def test_rules_lines(parser):
+    profile = Validator(rules=RULES, parser=parser).profile
+    assert [r.line for r in profile.rules] == [6, 7, 8]
+    assert profile.rules[2].test_rule.line == 8
+    root = profile.structure[0]
+    assert root.line == 2
+    assert [s.line for s in root.selector.children] == [3, 4]
+
+
+def test_profiler_stats():
+    profiler = Profiler()
+    validator = Validator(rules=RULES, profiler=profiler)
+    assert validator.validate(VALID_MSG).is_valid
+    assert not validator.validate(INVALID_MSG).is_valid
+
+    stats = {(s.rule.__class__, s.rule.line): s for s in profiler.top()}
+    # 3 field rules, MSH and its 2 children
+    assert len(stats) == 6
+    const = stats[FieldValidationRule, 6]
+    assert (const.calls, const.passed, const.failed) == (2, 1, 1)
+    regexp = stats[FieldValidationRule, 7]
+    assert (regexp.calls, regexp.passed, regexp.failed) == (2, 1, 1)
+    assert regexp.seconds > 0
+    root = stats[SegmentValidationRule, 2]
+    assert (root.calls, root.passed, root.failed) == (2, 1, 1)
+    # each PV1 chunk is validated separately, PID chunks aren't validated when the root fails
+    assert stats[SegmentValidationRule, 4].calls == 2
+    assert stats[SegmentValidationRule, 3].calls == 1
+    # nodes are timed with their subtrees
+    assert root.seconds >= stats[SegmentValidationRule, 4].seconds
+
+    assert profiler.top(2) == profiler.top()[:2]
+    assert profiler.top()[0].seconds >= profiler.top()[-1].seconds
+
+
+def test_profiler_fail_fast():
+    profiler = Profiler()
+    validator = Validator(rules=RULES, profiler=profiler, fail_fast=True)
+    assert validator.validate(INVALID_MSG).partial
+    # stopped at the first structure error, field rules weren't validated
+    assert len(profiler.stats) == 1
+    (root,) = profiler.top()
+    assert (root.calls, root.passed, root.failed) == (1, 0, 1)
+
+
+def test_profiler_disabled():
+    assert Validator(rules=RULES).validate(VALID_MSG).profiler is None
+    profiler = Profiler()
+    ctx = Validator(rules=RULES, profiler=profiler).validate(VALID_MSG)
+    assert ctx.profiler is profiler
+    assert profiler.stats
+    profiler.clear()
+    assert not profiler.stats
+
+
+def test_profiler_report():
+    profiler = Profiler()
+    Validator(rules=RULES, profiler=profiler).validate(VALID_MSG)
+    report = profiler.format_report(2, source="test.rules").splitlines()
+    assert report[0] == "2 slowest of 6 rules:"
+    assert len(report) == 4
+    assert all(" test.rules:" in line for line in report[2:])
+
+
+def test_profiler_cli():
+    this_dir = os.path.dirname(__file__)
+    tmsg = os.path.join(this_dir, "resources", "test.message.hl7")
+    trules = os.path.join(this_dir, "resources", "test.correct.rules")
+    runner = CliRunner()
+    out = runner.invoke(main, ["-q", "--profile", "--profile-top", "1", trules, tmsg])
+    assert out.exit_code == 0
+    lines = out.output.splitlines()
+    assert lines[0].startswith("1 slowest of ")
+    assert f" {trules}:" in lines[2]
+
+    out = runner.invoke(main, ["--profile", "-j", "2", trules, tmsg])
+    assert out.exit_code == 2
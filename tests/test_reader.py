@@ -0,0 +1,55 @@
+import io
+
+import pytest
+from click.testing import CliRunner
+
+from hl7validator.cli import main
+from hl7validator.reader import read_messages
+
+MSG1 = b"MSH|^~\\&|SrcSystem||TargetSystem|LabName|200705271331||OML^O21|1|P|2.4\rPID|1\r"
+MSG2 = b"MSH|^~\\&|Other||TargetSystem|LabName|200705271331||OML^O21|2|P|2.4\rPID|2\rOBX|1\r"
+
+BATCH = (
+    b"FHS|^~\\&|SrcSystem\n"
+    b"BHS|^~\\&|SrcSystem\n"
+    + MSG1.replace(b"\r", b"\n")
+    + MSG2.replace(b"\r", b"\r\n")
+    + b"BTS|2\nFTS|1\n"
+)
+MLLP = b"\x0b" + MSG1 + b"\x1c\r" + b"\x0b" + MSG2 + b"\x1c\r"
+
+
+@pytest.mark.parametrize("buffer_size", [1, 5, 64, 1024])
+@pytest.mark.parametrize("data", [BATCH, MLLP, MSG1 + MSG2], ids=["batch", "mllp", "plain"])
+def test_read_messages(data, buffer_size):
+    assert list(read_messages(io.BytesIO(data), buffer_size)) == [MSG1, MSG2]
+
+
+def test_read_messages_is_lazy():
+    stream = io.BytesIO(MSG1 * 1000)
+    messages = read_messages(stream, buffer_size=256)
+    assert next(messages) == MSG1
+    assert stream.tell() <= 256 * 2
+
+
+def test_read_messages_segments_before_header():
+    assert list(read_messages(io.BytesIO(b"PID|0\r" + MSG1))) == [b"PID|0\r", MSG1]
+
+
+def test_read_messages_whitespace_kept():
+    msg = b"MSH|^~\\&|SrcSystem||TargetSystem|LabName|200705271331||OML^O21|1|P|2.4\rNTE|1||  text \r"
+    data = b"\n  \n" + msg.replace(b"\r", b"\r\n") + b" \n"
+    assert list(read_messages(io.BytesIO(data), buffer_size=7)) == [msg]
+
+
+def test_batch_cli(tmp_path):
+    batch = tmp_path / "batch.hl7"
+    batch.write_bytes(BATCH)
+    rules = tmp_path / "rules.txt"
+    rules.write_text('\n"MSH.3.1" must be "SrcSystem"\n')
+    out = CliRunner().invoke(main, [str(rules), str(batch)])
+    assert out.exit_code == 1
+    lines = out.output.splitlines()
+    assert lines[0] == f"{batch}:1: Message is valid."
+    assert lines[1] == f"{batch}:2: Message is invalid:"
+    assert lines[-1] == "2 messages, 1 valid, 1 invalid"
@@ -0,0 +1,100 @@
+import hl7
+import pytest
+
+from hl7validator.context import Context
+from hl7validator.exceptions import MessageMalformedError
+from hl7validator.predicates import MustBe
+from hl7validator.profile import compile_profile
+from hl7validator.rules import FieldValidationRule
+from hl7validator.ruleset import CompiledRules
+from hl7validator.selectors import FieldSelector
+from hl7validator.values import INVALID, IntValue
+
+RULES = """
+ "PID.3.1" must be "123"
+ "OBR.2.1" must be int if "PID.1.1" is of value "1"
+ "PID.5.1" must be "Other"
+ "MSH.9.1.1" must be one of "ORU", "OML"
+ "PID.3.1.2" may be "x" if "OBR.1.1" is not empty
+"""
+
+MSG = hl7.parse(
+    b"MSH|^~\\&|A||B|C|200705271331||ORU^R01|1|P|2.4\r"
+    b"PID|1||123^x||Name\r"
+    b"OBR|1|abc\r"
+)
+
+
+def _log(ctx):
+    return [(m.msg, m.is_error, str(m.rule)) for m in ctx.log]
+
+
+def test_rules_grouped_by_segment():
+    profile = compile_profile(RULES, parser="lalr")
+    groups = {g.segment_key: len(g.rules) for g in profile.compiled_rules.groups}
+    assert groups == {("PID", 1): 4, ("OBR", 1): 2, ("MSH", 1): 1}
+
+
+def test_grouped_rules_same_as_rules():
+    profile = compile_profile(RULES, parser="lalr")
+    expected = Context(message=MSG)
+    for rule in profile.rules:
+        rule.set_context(expected).validate()
+    ctx = profile.compiled_rules.validate(Context(message=MSG))
+    assert _log(ctx) == _log(expected)
+    assert len(ctx.get_errors()) == 2
+
+
+def test_grouped_rules_missing_segment():
+    profile = compile_profile('"NTE.1.1" must be "1"\n', parser="lalr")
+    with pytest.raises(MessageMalformedError):
+        profile.compiled_rules.validate(Context(message=MSG))
+
+
+SHARED_RULES = """
+ "PID.3.1" must be int
+ "PID.5.1" must be "Name" if "PID.3.1" is of type int
+ "PID.2.1" may be int if "PID.3.1" is of type int
+ "PID.3.1" must be "123"
+ "OBR.2.1" must be string if "PID.1.1" is of value "1"
+ "OBR.3.1" must be string if "PID.1.1" is of value "1"
+"""
+
+
+def test_shared_checks():
+    profile = compile_profile(SHARED_RULES, parser="lalr")
+    compiled = profile.compiled_rules
+    # PID.3.1 is read once, and its int check done once for the rule and both conditions
+    assert (compiled.value_count, compiled.result_count) == (6, 7)
+    checks = compiled.checks
+    assert len(checks) == len(profile.rules)
+    assert checks[1].test.value_slot == checks[0].value_slot == checks[3].value_slot
+    assert checks[1].test.result_slot == checks[0].result_slot
+    assert checks[2].test.result_slot == checks[0].result_slot
+    assert checks[3].result_slot != checks[0].result_slot
+    assert checks[4].test.result_slot == checks[5].test.result_slot
+
+
+class EvenMustBe(MustBe):
+    def check(self, in_value):
+        return in_value if int(in_value) % 2 == 0 else INVALID
+
+
+@pytest.mark.parametrize("log_level", ["all", "errors"])
+def test_shared_checks_same_as_rules(log_level):
+    rules = compile_profile(SHARED_RULES, parser="lalr").rules + (
+        FieldValidationRule(FieldSelector("PID.3.1"), EvenMustBe(IntValue())),
+        FieldValidationRule(FieldSelector("PID.3.1"), EvenMustBe(IntValue())),
+    )
+    compiled = CompiledRules(rules)
+    # custom predicates share the selected value, but not the check
+    assert compiled.checks[-1].value_slot == compiled.checks[0].value_slot
+    assert compiled.checks[-1].result_slot is None
+
+    expected = Context(message=MSG, log_level=log_level)
+    for rule in rules:
+        rule.set_context(expected).validate()
+    ctx = compiled.validate(Context(message=MSG, log_level=log_level))
+    assert _log(ctx) == _log(expected)
+    assert ctx.passed == expected.passed
+    assert len(ctx.get_errors()) == 2
@@ -0,0 +1,54 @@
+import hl7
+import pytest
+
+from hl7validator.exceptions import MessageMalformedError
+from hl7validator.index import SegmentIndex
+from hl7validator.selectors import FieldPath, FieldSelector
+
+MSG = hl7.parse(
+    b"MSH|^~\\&|A||B|C|200705271331||ORU^R01|1|P|2.4\r"
+    b"PID|1||123^^^X\\F\\Y~456|A&B^C||\r"
+    b"OBX|1|ST|||val\r"
+)
+
+SELECTORS = [
+    "MSH.1",
+    "MSH.2",
+    "MSH.9.1.1",
+    "MSH.9.1.2",
+    "MSH.9.1.3",
+    "PID.3",
+    "PID.3.1.4",
+    "PID.3.2.1",
+    "PID.3.2",
+    "PID.4.1.1.2",
+    "PID.4.1.1.3",
+    "PID.4.1.2",
+    "PID.5",
+    "PID.20",
+    "OBX.5.1.1",
+    "OBX.0",
+]
+
+MALFORMED = ["PID.20.1.2", "PID.1.1.1.2", "PID.3.3", "OBX.5.1.2.2", "NTE.1"]
+
+
+@pytest.mark.parametrize("sel", SELECTORS)
+def test_field_selector_same_as_hl7(sel):
+    selector = FieldSelector(sel)
+    assert isinstance(selector.path, FieldPath)
+    expected = MSG[sel]
+    assert selector.get_value(MSG) == expected
+    assert selector.get_value(MSG, SegmentIndex(MSG)) == expected
+
+
+@pytest.mark.parametrize("sel", MALFORMED)
+def test_field_selector_malformed(sel):
+    selector = FieldSelector(sel)
+    with pytest.raises((KeyError, IndexError)) as expected:
+        MSG[sel]
+    for index in (None, SegmentIndex(MSG)):
+        with pytest.raises(MessageMalformedError) as err:
+            selector.get_value(MSG, index)
+        assert type(err.value.original_error) is expected.type
+        assert str(err.value.original_error) == str(expected.value)
@@ -0,0 +1,70 @@
+import asyncio
+
+import hl7
+
+from hl7validator.server import MLLPServer, send_message
+from hl7validator.validator import Validator
+
+RULES = """
+ MSH
+ "MSH.3.1" must be "SrcSystem"
+"""
+
+VALID_MSG = b"MSH|^~\\&|SrcSystem||TargetSystem|LabName|200705271331||OML^O21|12345|P|2.4\r"
+INVALID_MSG = b"MSH|^~\\&|Other||TargetSystem|LabName|200705271331||OML^O21|12346|P|2.4\r"
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+async def _with_server(func, engine):
+    server = MLLPServer(Validator(rules=RULES, engine=engine), port=0, jobs=1)
+    await server.start()
+    try:
+        return await func(server)
+    finally:
+        await server.close()
+
+
+def test_server_ack(engine):
+    async def _check(server):
+        return await asyncio.gather(
+            send_message(VALID_MSG, port=server.port),
+            send_message(INVALID_MSG, port=server.port),
+            send_message(b"not a message", port=server.port),
+        )
+
+    acks = _run(_with_server(_check, engine))
+    valid, invalid, garbage = [hl7.parse(ack) for ack in acks]
+
+    assert str(valid["MSH.9.1.1"]) == "ACK"
+    assert str(valid["MSH.5.1"]) == "SrcSystem"
+    assert str(valid["MSA.1"]) == "AA"
+    assert str(valid["MSA.2"]) == "12345"
+    assert "ERR" not in [seg[0][0] for seg in valid]
+
+    assert str(invalid["MSA.1"]) == "AE"
+    assert str(invalid["MSA.2"]) == "12346"
+    errors = invalid.segments("ERR")
+    assert len(errors) == 1
+    assert "MSH.3.1" in invalid.unescape(str(errors[0](8)))
+
+    assert str(garbage["MSA.1"]) == "AE"
+    assert len(garbage.segments("ERR")) == 1
+
+
+def test_server_many_messages_per_connection(engine):
+    async def _check(server):
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        acks = []
+        for msg in (VALID_MSG, INVALID_MSG, VALID_MSG):
+            writer.write(b"\x0b" + msg + b"\x1c\r")
+            await writer.drain()
+            acks.append(await reader.readuntil(b"\x1c\r"))
+        writer.close()
+        return acks
+
+    acks = _run(_with_server(_check, engine))
+    codes = [str(hl7.parse(ack[1:-2])["MSA.1"]) for ack in acks]
+    assert codes == ["AA", "AE", "AA"]
@@ -0,0 +1,44 @@
+import hl7
+import pytest
+
+from hl7validator.context import Context
+from hl7validator.profile import compile_profile
+
+RULES = """
+ MSH
+  PID 1
+  [PV1]
+  OBR 1..n
+    OBX 0..n
+      NTE 0..n
+"""
+
+MESSAGES = [
+    b"MSH|^~\\&|A||B|C|200705271331||ORU^R01|1|P|2.4\rPID|1\rOBR|1\rOBX|1\rNTE|1\rOBX|2\r",
+    b"MSH|^~\\&|A||B|C|200705271331||ORU^R01|1|P|2.4\rPID|1\rPV1|1\rOBR|1\rOBX|1\rOBR|2\rOBX|1\rNTE|1\r",
+    b"MSH|^~\\&|A||B|C|200705271331||ORU^R01|1|P|2.4\rPID|1\rPID|2\rOBX|1\r",
+    b"MSH|^~\\&|A||B|C|200705271331||ORU^R01|1|P|2.4\rOBR|1\rNTE|1\rOBX|1\r",
+]
+
+
+def _validate_with_rules(profile, msg):
+    # reference engine: recursive SegmentValidationRule objects
+    ctx = Context(message=msg)
+    for seg in profile.structure:
+        ctx.message = msg
+        seg.set_context(ctx).validate()
+    return ctx
+
+
+@pytest.mark.parametrize("message", MESSAGES)
+def test_compiled_structure_same_as_rules(message):
+    profile = compile_profile(RULES, parser="lalr")
+    msg = hl7.parse(message)
+    expected = _validate_with_rules(profile, msg)
+    ctx = profile.compiled_structure.validate(Context(message=msg))
+
+    def _log(c):
+        return [(m.msg, m.is_error, str(m.selector)) for m in c.log]
+
+    assert _log(ctx) == _log(expected)
+    assert ctx.is_valid == expected.is_valid
@@ -0,0 +1,56 @@
+import concurrent.futures
+import sys
+
+import pytest
+
+from hl7validator.validator import Validator
+
+RULES = """
+ MSH
+  PID 1
+  OBR 1..n
+    OBX 0..n
+ "MSH.3.1" must be "SrcSystem"
+ "PID.3.1" must be int if "PID.1.1" is not empty
+ "OBX.5.1" must be int if "OBX.2.1" is of value "NM"
+ "OBR.4.1" must be one of "A", "B"
+"""
+
+HEADER = b"MSH|^~\\&|SrcSystem||TargetSystem|LabName|200705271331||ORU^R01|1|P|2.4\r"
+MESSAGES = [
+    HEADER + b"PID|1||123\rOBR|1|||A\rOBX|1|NM|||5\r",
+    HEADER.replace(b"SrcSystem", b"Other") + b"PID|1||abc\rOBR|1|||C\rOBX|1|NM|||x\r",
+    HEADER + b"PID|1||123\rPID|2\rOBR|1|||B\rOBX|1|ST|||x\r",
+    HEADER + b"PID|1||123\rOBR|1|||A\rOBX|1|ST|||x\rOBR|2|||B\r",
+]
+
+
+def _log(ctx):
+    return [(m.msg, m.is_error, str(m.rule)) for m in ctx.log]
+
+
+@pytest.fixture
+def contention():
+    # switch threads as often as possible
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+@pytest.mark.parametrize("parser", ["earley", "lalr"])
+def test_validator_shared_between_threads(parser, contention, engine):
+    validator = Validator(rules=RULES, parser=parser, engine=engine)
+    single = Validator(rules=RULES, parser=parser, engine=engine)
+    expected = [_log(single.validate(m)) for m in MESSAGES]
+    assert [len([e for e in log if e[1]]) for log in expected] == [0, 4, 3, 2]
+
+    def _validate(idx):
+        ctx = validator.validate(MESSAGES[idx % len(MESSAGES)])
+        return idx, _log(ctx)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(_validate, range(400)))
+    for idx, log in results:
+        assert log == expected[idx % len(MESSAGES)]
+    assert validator.context is None